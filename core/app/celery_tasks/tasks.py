@@ -1,5 +1,6 @@
 import asyncio
 import logging
+from typing import Optional
 from celery.exceptions import MaxRetriesExceededError
 import os
 import sys
@@ -32,7 +33,14 @@ class AsyncTaskBase(Task):
             raise
 
 @app.task(bind=True, base=AsyncTaskBase)
-async def run_file_data_processing(self, user_id: str, collection_id: str, filename: str, task_id: str):
+async def run_file_data_processing(
+    self,
+    user_id: str,
+    collection_id: str,
+    filename: str,
+    task_id: str,
+    previous_file_id: Optional[str] = None,
+):
     """
     Process data from an uploaded file asynchronously as a Celery task.
     
@@ -51,6 +59,8 @@ async def run_file_data_processing(self, user_id: str, collection_id: str, filen
         The name of the file that needs to be processed.
     task_id : str
         A unique identifier for tracking this specific processing task.
+    previous_file_id : str, optional
+        The ID of a previous revision of the same document, only changed pages are parsed.
         
     Returns:
     --------
@@ -71,6 +81,7 @@ async def run_file_data_processing(self, user_id: str, collection_id: str, filen
             collection_id=collection_id,
             filename=filename,
             task_id=task_id,
+            previous_file_id=previous_file_id,
         )
     except Exception as e:
         print(f"Something went wrong during file processing: {e}")
@@ -82,3 +93,30 @@ async def run_file_data_processing(self, user_id: str, collection_id: str, filen
         })
         
         raise e
+
+
+@app.task(bind=True)
+def finalize_collection(self, results, collection_id: str):
+    """
+    Fan-in of a collection, runs as the chord callback once all file tasks are done.
+
+    Parameters:
+    -----------
+    results : list
+        The return values of the file tasks, the outcome is read from MongoDB instead.
+    collection_id : str
+        The ID of the collection to finalize.
+    """
+    logger.info(f"All file tasks of collection {collection_id} are done, merging the results")
+    return pipelines.finalize_collection(collection_id)
+
+
+@app.task
+def on_collection_error(request, exc, traceback, collection_id: str):
+    """
+    Error callback of the collection chord, a file task raised instead of
+    reporting its failure. The files that did finish are still merged.
+    `request` is the request of the chord callback, not of the failed file task.
+    """
+    logger.error(f"A file task of collection {collection_id} raised {type(exc).__name__}: {exc}")
+    return pipelines.finalize_collection(collection_id)
@@ -0,0 +1,106 @@
+import logging
+from uuid import UUID
+from fastapi import APIRouter, HTTPException, Depends, Path, status
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+from app.services.async_mongo_db import AsyncMongoDBService, get_db_service
+from app.models.models import CollectionModel, CollectionProgress, TaskStatus
+
+
+logger = logging.getLogger(__name__)
+
+collectionRouter = APIRouter(
+    prefix="/collections",
+    tags=["collections"],
+    dependencies=[],
+    responses={404: {"description": "Not found"}},
+)
+
+
+# Response models for consistent API
+class CollectionResponse(BaseModel):
+    collection: CollectionModel
+    message: str
+
+
+@collectionRouter.get("/{collection_id}", response_model=CollectionResponse)
+async def get_collection(
+    collection_id: UUID = Path(..., description="UUID of the collection to retrieve"),
+    db: AsyncMongoDBService = Depends(get_db_service),
+):
+    """
+    Get a collection with the merged items of all its files once it is finalized
+    """
+    try:
+        collection = await db.get_collection_by_id(collection_id, with_items=True)
+        return CollectionResponse(collection=collection, message="Collection retrieved successfully")
+    except Exception as e:
+        logger.error(f"Error retrieving collection {collection_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Collection not found: {str(e)}"
+        )
+
+
+@collectionRouter.get("/{collection_id}/progress", response_model=CollectionProgress)
+async def get_collection_progress(
+    collection_id: UUID = Path(..., description="UUID of the collection to check"),
+    db: AsyncMongoDBService = Depends(get_db_service),
+):
+    """
+    Get the progress of all file tasks of a collection
+    """
+    try:
+        collection = await db.get_collection_by_id(collection_id)
+        tasks = await db.get_tasks_by_collection(collection_id)
+    except Exception as e:
+        logger.error(f"Error retrieving collection {collection_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Collection not found: {str(e)}"
+        )
+
+    counts = {task_status: 0 for task_status in TaskStatus}
+    for task in tasks:
+        counts[task.status] += 1
+
+    collection_status = collection.status
+    if collection_status == TaskStatus.pending and len(tasks) > counts[TaskStatus.pending]:
+        # Finalized collections carry their own status, until then it follows the files
+        collection_status = TaskStatus.in_progress
+
+    return CollectionProgress(
+        collection_id=collection_id,
+        status=collection_status,
+        total=len(collection.task_ids),
+        pending=counts[TaskStatus.pending],
+        in_progress=counts[TaskStatus.in_progress] + counts[TaskStatus.updating],
+        completed=counts[TaskStatus.completed],
+        failed=counts[TaskStatus.failed] + counts[TaskStatus.canceled],
+        tasks=tasks,
+    )
+
+
+@collectionRouter.get("/{collection_id}/xml")
+async def get_collection_xml(
+    collection_id: UUID = Path(..., description="UUID of the collection"),
+    db: AsyncMongoDBService = Depends(get_db_service),
+):
+    """
+    Get the catalog XML of the merged items of a finalized collection
+    """
+    try:
+        collection = await db.get_collection_by_id(collection_id)
+    except Exception as e:
+        logger.error(f"Error retrieving collection {collection_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Collection not found: {str(e)}"
+        )
+    if collection.xml_file_id:
+        return StreamingResponse(db.iter_collection_xml(collection.xml_file_id), media_type="application/xml")
+    if not collection.xml_content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Collection {collection_id} has no XML yet, status: {collection.status}",
+        )
+    # Collections finalized before the XML moved to GridFS
+    return Response(content=collection.xml_content, media_type="application/xml")
@@ -1,21 +1,26 @@
+import asyncio
+import os
 import uuid
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 import logging
 
 from app.models.base_dto import FileAlreadyExists
-from app.models.models import TaskDto, TaskStatus
+from app.models.models import CollectionModel, TaskDto, TaskStatus
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 import pika
-from fastapi import APIRouter, Form, UploadFile, File, Query
+from celery import chord
+from fastapi import APIRouter, Depends, Form, UploadFile, File, Query
 from app.celery_tasks.tasks import (
+    finalize_collection,
+    on_collection_error,
     run_file_data_processing,
 )
 from app.constants import ALLOWED_EXTENSIONS
 from app.envirnoment import config
 from app.models.validator import return_generic_http_error, return_http_error
-from app.services.mongo_db import MongoDBService
+from app.services.async_mongo_db import AsyncMongoDBService, get_db_service
 from app.utils.file_utils import get_current_time_in_timezone, save_file
 
 logger = logging.getLogger(__name__)
@@ -43,9 +48,10 @@ def generate_collection_id():
 )
 async def load_data(
     files: List[UploadFile] = File(...),
-    customer_id: str = Form(...) # Add this line
+    customer_id: str = Form(...), # Add this line
+    previous_file_id: Optional[str] = Form(None),
+    db: AsyncMongoDBService = Depends(get_db_service),
 ):
-    db = MongoDBService()
     for f in files:
         logger.info(f"received {f.filename} ")
     try:
@@ -54,21 +60,41 @@ async def load_data(
                 code="B0010", message="At least one file must be uploaded."
             )
         try:
-            test_rabbitmq_connection()
+            # Blocking connect, kept off the event loop
+            await asyncio.to_thread(test_rabbitmq_connection)
         except Exception as rabbitmq_error:
             logger.error(f"RabbitMQ connection error: {rabbitmq_error}")
             return return_http_error(
                 code="R0010", message="Unable to establish RabbitMQ connection."
             )
-        collection_id = generate_collection_id()
-
-        tasks = []
+        if previous_file_id:
+            # A revision of an earlier upload, only its changed pages are parsed again
+            if len(files) > 1:
+                return return_http_error(
+                    code="B0022", message="A previous file can only be given for a single uploaded file."
+                )
+            try:
+                previous_file = await db.get_file_by_id(uuid.UUID(previous_file_id))
+            except Exception:
+                return return_http_error(
+                    code="B0020", message="Previous file not found."
+                )
+            if previous_file.customer_number != customer_id:
+                return return_http_error(
+                    code="B0021", message="Previous file belongs to another customer."
+                )
         for file in files:
             if not (Path(file.filename).suffix in ALLOWED_EXTENSIONS):
                 return return_http_error(
                     code="B0015", message="File format not supported"
                 )
-            file_path = save_file(file)
+        collection_id = generate_collection_id()
+
+        tasks = []
+        file_sizes = {}
+        for file in files:
+            # Writing the upload to disk blocks, kept off the event loop
+            file_path = await asyncio.to_thread(save_file, file)
             task_id = str(uuid.uuid4())
             task_dto = TaskDto(
                 id=task_id,
@@ -78,18 +104,38 @@ async def load_data(
                 created_at=get_current_time_in_timezone(),
             )
             logger.info(f"Saving file {file.filename} to {file_path}")
-            db.insert_task(task=task_dto)
+            await db.insert_task(task=task_dto)
             logger.info(f"in collection: {collection_id}")
-            run_file_data_processing.apply_async(
-                args=[
-                    customer_id,
-                    collection_id,
-                    file.filename,
-                    task_id,
-                ],
-                task_id=task_id,
-            )
             tasks.append(task_dto)
+            file_sizes[task_id] = os.path.getsize(file_path)
+
+        await db.insert_collection(
+            CollectionModel(
+                id=collection_id,
+                customer_number=customer_id,
+                task_ids=[task.id for task in tasks],
+                status=TaskStatus.pending,
+                created_at=get_current_time_in_timezone(),
+            )
+        )
+        # Largest file first, so a long file does not start last and stretch the collection
+        by_size = sorted(tasks, key=lambda task: file_sizes[str(task.id)], reverse=True)
+        header = [
+            run_file_data_processing.s(
+                customer_id,
+                collection_id,
+                task.file_name,
+                str(task.id),
+                previous_file_id,
+            ).set(task_id=str(task.id))
+            for task in by_size
+        ]
+        # Fan-in once every file task is done, the merged result is stored on the collection
+        callback = finalize_collection.s(collection_id=collection_id).on_error(
+            on_collection_error.s(collection_id=collection_id)
+        )
+        # Publishing to the broker blocks as well
+        await asyncio.to_thread(chord(header), callback)
         return tasks
     except FileAlreadyExists as e:
         logger.error(f"Tried Uploading File that already exists")
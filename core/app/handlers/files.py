@@ -1,12 +1,13 @@
 import logging
 from multiprocessing.pool import AsyncResult
-from typing import List, Optional
+from typing import List, Literal, Optional
 from uuid import UUID
 from fastapi import APIRouter, Body, HTTPException, Depends, Query, Path, status
 from pydantic import BaseModel
 
-from app.services.mongo_db import MongoDBService
-from app.models.models import FileModel
+from app.services.async_mongo_db import AsyncMongoDBService, get_db_service
+from app.models.models import FileModel, ItemDto
+from app.utils.xml_utils import build_items_xml
 
 
 logger = logging.getLogger(__name__)
@@ -29,6 +30,8 @@ class FilesListResponse(BaseModel):
     files: List[FileModel]
     count: int
     message: str
+    # Cursor of the next page of a paginated listing, None on the last page
+    next_cursor: Optional[str] = None
 
 
 class ClassificationUpdateRequest(BaseModel):
@@ -36,21 +39,26 @@ class ClassificationUpdateRequest(BaseModel):
     relevant: bool
 
 
-# Dependency for MongoDB service
-def get_db_service():
-    return MongoDBService()
-
-
 @fileRouter.get("/", response_model=FilesListResponse)
-async def get_all_files(db: MongoDBService = Depends(get_db_service)):
+async def get_all_files(
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of files on the page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    customer_number: Optional[str] = Query(None, description="Only files of this customer"),
+    view: Literal["summary", "full"] = Query("summary", description="summary leaves out items, XML content and page hashes"),
+    db: AsyncMongoDBService = Depends(get_db_service),
+):
     """
-    Get all files in the system
+    Get one page of files, newest first
     """
     try:
-        files = db.get_files()
+        files, next_cursor = await db.list_files(
+            limit, cursor=cursor, customer_number=customer_number, summary=view == "summary"
+        )
         return FilesListResponse(
-            files=files, count=len(files), message="Files retrieved successfully"
+            files=files, count=len(files), message="Files retrieved successfully", next_cursor=next_cursor
         )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving files: {str(e)}")
         raise HTTPException(
@@ -62,15 +70,15 @@ async def get_all_files(db: MongoDBService = Depends(get_db_service)):
 @fileRouter.get("/task/{task_id}", response_model=FilesListResponse)
 async def get_files_by_task(
     task_id: UUID = Path(..., description="UUID of the task to filter files by"),
-    db: MongoDBService = Depends(get_db_service),
+    db: AsyncMongoDBService = Depends(get_db_service),
 ):
     """
     Get all files associated with a specific task
     """
     try:
         # First check if the task exists
-        task = db.get_task_by_id(task_id)
-        files = db.get_files_by_task(task_id)
+        task = await db.get_task_by_id(task_id)
+        files = await db.get_files_by_task(task_id)
 
         return FilesListResponse(
             files=files,
@@ -89,14 +97,14 @@ async def get_files_by_task(
 @fileRouter.get("/{file_id}", response_model=FileResponse)
 async def get_file_by_id(
     file_id: UUID = Path(..., description="UUID of the file to retrieve"),
-    db: MongoDBService = Depends(get_db_service),
+    db: AsyncMongoDBService = Depends(get_db_service),
 ):
     """
     Get a file by its ID
     """
     try:
         logger.info(f"Retrieving file with ID: {file_id}")
-        file = db.get_file_by_id(file_id)
+        file = await db.get_file_by_id(file_id)
         return FileResponse(file=file, message="File retrieved successfully")
     except Exception as e:
         logger.error(f"Error retrieving file {file_id}: {str(e)}")
@@ -108,13 +116,13 @@ async def get_file_by_id(
 @fileRouter.get("/customer/{customer_number}", response_model=FilesListResponse)
 async def get_files_by_customer(
     customer_number: str = Path(..., description="Customer number to filter files by"),
-    db: MongoDBService = Depends(get_db_service),
+    db: AsyncMongoDBService = Depends(get_db_service),
 ):
     """
     Get all files for a specific customer
     """
     try:
-        files = db.get_files_by_customer(customer_number)
+        files = await db.get_files_by_customer(customer_number)
         return FilesListResponse(
             files=files,
             count=len(files),
@@ -127,6 +135,30 @@ async def get_files_by_customer(
             detail=f"Error retrieving files: {str(e)}",
         )
 
+class ItemResponse(BaseModel):
+    item: ItemDto
+    message: str
+
+
+@fileRouter.put("/{file_id}/items/{position}", response_model=ItemResponse)
+async def update_file_item(
+    file_id: UUID = Path(..., description="UUID of the file the item belongs to"),
+    position: int = Path(..., ge=0, description="Position of the item in the file"),
+    item: ItemDto = Body(..., description="New content of the item"),
+    db: AsyncMongoDBService = Depends(get_db_service),
+):
+    """
+    Update a single item of a file without rewriting the others
+    """
+    try:
+        updated_item = await db.update_file_item(file_id, position, item)
+        return ItemResponse(item=updated_item, message="Item updated successfully")
+    except Exception as e:
+        logger.error(f"Error updating item {position} of file {file_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Item not found: {str(e)}"
+        )
+
 class ItemIDs(BaseModel):
     ids: List[str]
 
@@ -134,14 +166,14 @@ class ItemIDs(BaseModel):
 async def generate_xml(
     file_id: UUID = Path(..., description="UUID of the file to generate XML for"),
     item_ids: ItemIDs = Body(..., description="List of item str to include in the XML"),
-    db: MongoDBService = Depends(get_db_service),
+    db: AsyncMongoDBService = Depends(get_db_service),
 ):
     """
     Generate XML content for a file based on a subset of its classified items
     """
     try:
         # Fetch the file and its items
-        file = db.get_file_by_id(file_id)
+        file = await db.get_file_by_id(file_id)
         selected_ids = set(item_ids.ids)
 
         # Filter items to only those requested
@@ -152,23 +184,10 @@ async def generate_xml(
                 detail="No matching items found for the provided IDs."
             )
 
-        # Build XML
-        xml_content = '<?xml version="1.0" encoding="UTF-8"?>\n<catalog>\n'
-        for item in items_to_generate:
-            xml_content += "  <item>\n"
-            xml_content += f"    <sku>{item.sku}</sku>\n"
-            xml_content += f"    <name>{item.name}</name>\n"
-            xml_content += f"    <text>{item.text}</text>\n"
-            xml_content += f"    <quantity>{item.quantity}</quantity>\n"
-            xml_content += f"    <quantityUnit>{item.quantityunit}</quantityUnit>\n"
-            xml_content += f"    <price>{item.price}</price>\n"
-            xml_content += f"    <priceUnit>{item.priceunit}</priceUnit>\n"
-            xml_content += f"    <commission>{item.commission}</commission>\n"
-            xml_content += "  </item>\n"
-        xml_content += "</catalog>"
+        xml_content = build_items_xml(items_to_generate)
 
         # Persist the XML
-        updated_file = db.update_xml_content(file_id, xml_content)
+        updated_file = await db.update_xml_content(file_id, xml_content)
 
         return FileResponse(
             file=updated_file,
@@ -189,14 +208,14 @@ async def generate_xml(
 @fileRouter.delete("/{file_id}")
 async def delete_file(
     file_id: UUID = Path(..., description="UUID of the file to delete"),
-    db: MongoDBService = Depends(get_db_service),
+    db: AsyncMongoDBService = Depends(get_db_service),
 ):
     """
     Delete a file by its ID
     """
     try:
         logger.info(f"Deleting file with ID: {file_id}")
-        file = db.get_file_by_id(file_id)  # Check if file exists
+        file = await db.get_file_by_id(file_id)  # Check if file exists
         if not file:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="File not found"
@@ -204,13 +223,13 @@ async def delete_file(
         if file.task_id:
             try:
             # Delete the associated task if it exists
-                task = db.get_task_by_id(file.task_id)
+                task = await db.get_task_by_id(file.task_id)
                 if task:
-                    db.delete_task(task.id)
+                    await db.delete_task(task.id)
             except Exception as e:
                 logger.error(f"Error deleting task {file.task_id}: {str(e)}")
 
-        db.delete_file(file_id)
+        await db.delete_file(file_id)
     except Exception as e:
         logger.error(f"Error deleting file {file_id}: {str(e)}")
         raise HTTPException(
@@ -1,10 +1,10 @@
 import logging
 from typing import List, Optional
 from uuid import UUID
-from fastapi import APIRouter, HTTPException, Depends, Query, Path, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Path, Response, status
 from pydantic import BaseModel
 
-from app.services.mongo_db import MongoDBService
+from app.services.async_mongo_db import AsyncMongoDBService, get_db_service
 from app.models.models import FileModel, TaskDto, TaskStatus
 from app.celery_tasks.tasks import run_file_data_processing
 from app.models.validator import return_generic_http_error
@@ -37,24 +37,28 @@ class TaskResponse(BaseModel):
     task: TaskDto
     message: str
 
-# Dependency for MongoDB service
-def get_db_service():
-    return MongoDBService()
-
 
 #  get all tasks
 @taskRouter.get("/", response_model=List[TaskDto])
 async def get_all_tasks(
-    db: MongoDBService = Depends(get_db_service),
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of tasks on the page"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    task_status: Optional[TaskStatus] = Query(None, alias="status", description="Only tasks with this status"),
+    db: AsyncMongoDBService = Depends(get_db_service),
 ):
     """
-    Get all tasks in the system
+    Get one page of tasks, newest first. The cursor of the next page is
+    returned in the X-Next-Cursor header, which is missing on the last page.
     """
     try:
-        logger.info("Retrieving all tasks")
-        tasks = db.get_all_tasks()
+        tasks, next_cursor = await db.list_tasks(limit, cursor=cursor, status=task_status)
         logger.info(f"Retrieved {len(tasks)} tasks")
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return tasks
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving tasks: {str(e)}")
         raise HTTPException(
@@ -65,13 +69,13 @@ async def get_all_tasks(
 @taskRouter.get("/task/{task_id}/status", response_model=TaskResponse)
 async def get_task_status(
     task_id: UUID = Path(..., description="UUID of the task to check status"),
-    db: MongoDBService = Depends(get_db_service),
+    db: AsyncMongoDBService = Depends(get_db_service),
 ):
     """
     Get the status of a specific task
     """
     try:
-        task = db.get_task_by_id(task_id)
+        task = await db.get_task_by_id(task_id)
         return TaskResponse(task=task, message=f"Task status: {task.status}")
     except Exception as e:
         logger.error(f"Error retrieving task {task_id}: {str(e)}")
@@ -87,14 +91,14 @@ async def update_task_status(
     additional_info: Optional[str] = Query(
         None, description="Optional additional information"
     ),
-    db: MongoDBService = Depends(get_db_service),
+    db: AsyncMongoDBService = Depends(get_db_service),
 ):
     """
     Update the status of a task
     """
     try:
-        updated_task = db.update_task_status(
-            task_id=task_id, status=status, additional_info=additional_info
+        updated_task = await db.update_task_status(
+            task_id=task_id, status=status, description=additional_info
         )
 
         return TaskResponse(
@@ -117,7 +121,7 @@ async def delete_file(
     """
     try:
         db = get_db_service()
-        db.delete_task(taskt_id)
+        await db.delete_task(taskt_id)
         task_result = AsyncResult(taskt_id, app=run_file_data_processing.app)
         task_result.revoke(terminate=True)
     except Exception as e:
@@ -4,6 +4,12 @@ from typing import Any, Dict, List, Optional, Union
 from uuid import UUID
 
 from openai import BaseModel
+from pydantic import Field
+
+
+def now_ms() -> int:
+    """Current time in milliseconds since the epoch"""
+    return int(datetime.now().timestamp() * 1000)
 
 
 class TaskStatus(str, Enum):
@@ -23,6 +29,11 @@ class TaskDto(BaseModel):
     status: TaskStatus
     created_at: Optional[int] = None
     updated_at: Optional[int] = None
+    # Peak resident memory of the worker while processing the task
+    peak_rss_mb: Optional[float] = None
+    # Units of work done of the current processing stage, e.g. windows parsed or items categorized
+    progress_done: Optional[int] = None
+    progress_total: Optional[int] = None
 
     def to_dict(self):
         return {
@@ -33,6 +44,9 @@ class TaskDto(BaseModel):
             "status": self.status,
             "createdAt": self.created_at,
             "updatedAt": self.updated_at,
+            "peakRssMb": self.peak_rss_mb,
+            "progressDone": self.progress_done,
+            "progressTotal": self.progress_total,
         }
 
 
@@ -41,6 +55,8 @@ class ItemChunkDto(BaseModel):
     description: str
     quantity: float
     unit: str
+    references_id: Optional[str] = None
+    source_pages: List[int] = []
 
     def from_dict(cls, data: dict):
         return cls(
@@ -61,6 +77,8 @@ class ItemDto(BaseModel):
     priceunit: str
     commission: str
     confidence: float
+    # 1-based pages of the source document the item was parsed from
+    source_pages: List[int] = []
 
     @classmethod
     def from_dict(cls, data: dict):
@@ -74,6 +92,7 @@ class ItemDto(BaseModel):
             priceunit=data.get("priceunit"),
             commission=data.get("commission"),
             confidence=data.get("confidence"),
+            source_pages=data.get("source_pages") or [],
         )
 
 
@@ -88,5 +107,40 @@ class FileModel(BaseModel):
     items: List[ItemDto] = []
     is_xml_generated: bool = False
     xml_content: Optional[str] = None
-    created_at: int = int(datetime.now().timestamp() * 1000)
+    # File this one is a revision of, and the text hash of every extracted page
+    previous_file_id: Optional[UUID] = None
+    page_hashes: List[str] = []
+    created_at: int = Field(default_factory=now_ms)
     updated_at: Optional[int] = None
+
+
+class CollectionModel(BaseModel):
+    """A multi-file upload, aggregated once all of its file tasks are done"""
+
+    id: UUID
+    customer_number: str
+    # Task per uploaded file, in upload order
+    task_ids: List[UUID] = []
+    status: TaskStatus = TaskStatus.pending
+    description: Optional[str] = None
+    # The merged result is kept by reference: the processed files in upload order,
+    # whose items are in the items collection, and the catalog XML in GridFS
+    file_ids: List[UUID] = []
+    item_count: int = 0
+    xml_file_id: Optional[str] = None
+    # Filled in from the items collection when read, embedded in collections finalized before
+    items: List[ItemDto] = []
+    xml_content: Optional[str] = None
+    created_at: int = Field(default_factory=now_ms)
+    updated_at: Optional[int] = None
+
+
+class CollectionProgress(BaseModel):
+    collection_id: UUID
+    status: TaskStatus
+    total: int
+    pending: int
+    in_progress: int
+    completed: int
+    failed: int
+    tasks: List[TaskDto] = []
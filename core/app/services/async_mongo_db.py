@@ -0,0 +1,496 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from bson import ObjectId
+from gridfs import AsyncGridFSBucket
+from gridfs.errors import NoFile
+from pymongo import AsyncMongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from app.envirnoment import config
+from app.models.models import CollectionModel, FileModel, ItemChunkDto, ItemDto, TaskDto, TaskStatus
+from app.services.mongo_client import get_async_mongo_client
+from app.services.mongo_db import MongoDocumentMapper
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMongoDBService(MongoDocumentMapper):
+    """
+    Non-blocking variant of MongoDBService for the API, on the pymongo async driver.
+
+    Every method of MongoDBService is here as a coroutine with the same
+    arguments, results and errors, so a handler only has to await the call.
+    Celery workers keep using the sync MongoDBService.
+    """
+
+    def __init__(self, client: Optional[AsyncMongoClient] = None):
+        """
+        Args:
+            client: AsyncMongoClient to use, the shared async client of the process by default
+        """
+        self._client = client
+        self.database_name = config.get("MONGODB_DATABASE", "specwise")
+
+    @property
+    def client(self) -> AsyncMongoClient:
+        return self._client if self._client is not None else get_async_mongo_client()
+
+    @property
+    def db(self):
+        return self.client[self.database_name]
+
+    @property
+    def tasks_collection(self):
+        return self.db["tasks"]
+
+    @property
+    def files_collection(self):
+        return self.db["files"]
+
+    @property
+    def parsed_items_collection(self):
+        return self.db["parsed_items"]
+
+    @property
+    def collections_collection(self):
+        return self.db["collections"]
+
+    @property
+    def items_collection(self):
+        return self.db["items"]
+
+    @property
+    def collection_xml_bucket(self) -> AsyncGridFSBucket:
+        return AsyncGridFSBucket(self.db, bucket_name=self.COLLECTION_XML_BUCKET)
+
+    async def _setup_indexes(self):
+        """Set up required indexes for collections"""
+        for collection_name, keys, options in self._index_specs():
+            await self.db[collection_name].create_index(keys, **options)
+
+    async def insert_task(self, task: TaskDto) -> UUID:
+        """Insert a new task, see MongoDBService.insert_task"""
+        try:
+            result = await self.tasks_collection.insert_one(self._task_to_document(task))
+            if result.acknowledged:
+                return task.id
+            raise Exception("Task insertion not acknowledged")
+        except DuplicateKeyError:
+            raise DuplicateKeyError(f"Task with ID {task.id} already exists")
+        except Exception as e:
+            raise Exception(f"Failed to insert task: {str(e)}")
+
+    async def update_task_status(self, task_id: UUID, status: TaskStatus, description: Optional[str] = None) -> TaskDto:
+        """Update the status of a task, see MongoDBService.update_task_status"""
+        try:
+            update_dict = {
+                "status": status,
+                "updatedAt": int(datetime.now().timestamp() * 1000)
+            }
+            if description is not None:
+                update_dict["description"] = description
+
+            result = await self.tasks_collection.find_one_and_update(
+                {"id": str(task_id)},
+                {"$set": update_dict},
+                return_document=ReturnDocument.AFTER
+            )
+            if not result:
+                raise Exception(f"Task with ID {task_id} not found")
+            return self._document_to_task_dto(result)
+        except Exception as e:
+            raise Exception(f"Failed to update task status: {str(e)}")
+
+    async def update_task_progress(self, task_id: UUID, done: int, total: int, description: Optional[str] = None) -> None:
+        """Store the progress of a running task, see MongoDBService.update_task_progress"""
+        try:
+            update_dict = {
+                "progressDone": done,
+                "progressTotal": total,
+                "updatedAt": int(datetime.now().timestamp() * 1000),
+            }
+            if description is not None:
+                update_dict["description"] = description
+            result = await self.tasks_collection.update_one({"id": str(task_id)}, {"$set": update_dict})
+            if result.matched_count == 0:
+                raise Exception(f"Task with ID {task_id} not found")
+        except Exception as e:
+            raise Exception(f"Failed to update task progress: {str(e)}")
+
+    async def update_task_peak_rss(self, task_id: UUID, peak_rss_mb: float) -> None:
+        """Store the peak resident memory of a task, see MongoDBService.update_task_peak_rss"""
+        try:
+            result = await self.tasks_collection.update_one(
+                {"id": str(task_id)},
+                {"$set": {"peakRssMb": peak_rss_mb}},
+            )
+            if result.matched_count == 0:
+                raise Exception(f"Task with ID {task_id} not found")
+        except Exception as e:
+            raise Exception(f"Failed to update task peak RSS: {str(e)}")
+
+    async def get_all_tasks(self) -> List[TaskDto]:
+        """Get all tasks in the database"""
+        return [self._document_to_task_dto(doc) async for doc in self.tasks_collection.find()]
+
+    async def list_tasks(
+        self, limit: int, cursor: Optional[str] = None, status: Optional[TaskStatus] = None
+    ) -> Tuple[List[TaskDto], Optional[str]]:
+        """One page of tasks newest first and the cursor of the next one, see MongoDBService.list_tasks"""
+        query = self._page_query({"status": status} if status else {}, "createdAt", cursor)
+        docs = await self.tasks_collection.find(query).sort([("createdAt", -1), ("id", -1)]).limit(limit + 1).to_list()
+        docs, next_cursor = self._page(docs, limit, "createdAt")
+        return [self._document_to_task_dto(doc) for doc in docs], next_cursor
+
+    async def get_task_by_id(self, task_id: UUID) -> TaskDto:
+        """Get a task by its ID, raises if it is not found"""
+        task_doc = await self.tasks_collection.find_one({"id": str(task_id)})
+        if not task_doc:
+            raise Exception(f"Task with ID {task_id} not found")
+        return self._document_to_task_dto(task_doc)
+
+    async def delete_task(self, task_id: UUID) -> bool:
+        """Delete a task by its ID, raises if it is not found"""
+        result = await self.tasks_collection.delete_one({"id": str(task_id)})
+        if result.deleted_count == 0:
+            raise Exception(f"Task with ID {task_id} not found")
+        return True
+
+    async def get_tasks_by_status(self, status: TaskStatus) -> List[TaskDto]:
+        """Get all tasks with a specific status"""
+        return [self._document_to_task_dto(doc) async for doc in self.tasks_collection.find({"status": status})]
+
+    async def get_tasks_by_collection(self, collection_id: UUID) -> List[TaskDto]:
+        """Get all tasks for a specific collection"""
+        cursor = self.tasks_collection.find({"collectionId": str(collection_id)})
+        return [self._document_to_task_dto(doc) async for doc in cursor]
+
+    async def insert_file(self, file_model: FileModel) -> UUID:
+        """Insert a new file document, see MongoDBService.insert_file"""
+        try:
+            result = await self.files_collection.insert_one(self._file_to_document(file_model))
+            if not result.acknowledged:
+                raise Exception("File insertion not acknowledged")
+            if file_model.items:
+                await self.items_collection.bulk_write(
+                    self._file_item_operations(file_model.id, file_model.items), ordered=False
+                )
+            return file_model.id
+        except DuplicateKeyError:
+            raise DuplicateKeyError(f"File with ID {file_model.id} already exists")
+        except Exception as e:
+            raise Exception(f"Failed to insert file: {str(e)}")
+
+    async def update_file_items(self, file_id: UUID, items: List[ItemDto]) -> FileModel:
+        """Replace the items of a file, see MongoDBService.update_file_items"""
+        try:
+            result = await self.files_collection.find_one_and_update(
+                {"id": str(file_id)},
+                {"$set": {"updated_at": int(datetime.now().timestamp() * 1000)}, "$unset": {"items": ""}},
+                return_document=ReturnDocument.AFTER
+            )
+            if not result:
+                raise Exception(f"File with ID {file_id} not found")
+
+            if items:
+                await self.items_collection.bulk_write(self._file_item_operations(file_id, items), ordered=False)
+            await self.items_collection.delete_many({"file_id": str(file_id), "position": {"$gte": len(items)}})
+
+            file = self._document_to_file_model(result)
+            file.items = items
+            return file
+        except Exception as e:
+            raise Exception(f"Failed to update file items: {str(e)}")
+
+    async def append_file_items(self, file_id: UUID, items: List[ItemDto]) -> None:
+        """Append categorized items to a file, see MongoDBService.append_file_items"""
+        try:
+            result = await self.files_collection.update_one(
+                {"id": str(file_id)},
+                {"$set": {"updated_at": int(datetime.now().timestamp() * 1000)}},
+            )
+            if result.matched_count == 0:
+                raise Exception(f"File with ID {file_id} not found")
+            if not items:
+                return
+            last = await self.items_collection.find_one({"file_id": str(file_id)}, sort=[("position", -1)])
+            first_position = last["position"] + 1 if last else 0
+            await self.items_collection.bulk_write(
+                self._file_item_operations(file_id, items, first_position), ordered=False
+            )
+        except Exception as e:
+            raise Exception(f"Failed to append file items: {str(e)}")
+
+    async def update_file_item(self, file_id: UUID, position: int, item: ItemDto) -> ItemDto:
+        """Update a single item of a file, see MongoDBService.update_file_item"""
+        try:
+            result = await self.items_collection.find_one_and_update(
+                {"file_id": str(file_id), "position": position},
+                {"$set": {**self._item_to_document(item), "updated_at": int(datetime.now().timestamp() * 1000)}},
+                return_document=ReturnDocument.AFTER
+            )
+            if not result:
+                raise Exception(f"Item {position} of file {file_id} not found")
+            return self._document_to_item(result)
+        except Exception as e:
+            raise Exception(f"Failed to update file item: {str(e)}")
+
+    async def iter_file_items(self, file_id: UUID, batch_size: int = 500) -> AsyncIterator[ItemDto]:
+        """Stream the items of a file in document order over a cursor"""
+        cursor = self.items_collection.find({"file_id": str(file_id)}).sort("position", 1).batch_size(batch_size)
+        async for doc in cursor:
+            yield self._document_to_item(doc)
+
+    async def count_file_items(self, file_id: UUID) -> int:
+        """Count the items of a file"""
+        return await self.items_collection.count_documents({"file_id": str(file_id)})
+
+    async def get_file_items(self, file_id: UUID) -> List[ItemDto]:
+        """Get all items of a file in document order"""
+        return [item async for item in self.iter_file_items(file_id)]
+
+    async def migrate_embedded_items(self) -> int:
+        """Move items embedded in file documents into the items collection, see MongoDBService.migrate_embedded_items"""
+        migrated = 0
+        async for doc in self.files_collection.find({"items.0": {"$exists": True}}, {"id": 1, "items": 1}):
+            items = [ItemDto.from_dict(item) for item in doc["items"]]
+            await self.items_collection.bulk_write(self._file_item_operations(doc["id"], items), ordered=False)
+            await self.files_collection.update_one({"id": doc["id"]}, {"$unset": {"items": ""}})
+            migrated += 1
+        if migrated:
+            logger.info(f"Moved the embedded items of {migrated} files to the items collection")
+        return migrated
+
+    async def _with_items(self, doc: Dict[str, Any]) -> FileModel:
+        """FileModel of a file document with its items"""
+        file = self._document_to_file_model(doc)
+        if not file.items:
+            file.items = await self.get_file_items(file.id)
+        return file
+
+    async def _files_with_items(self, docs: List[Dict[str, Any]]) -> List[FileModel]:
+        """FileModels of file documents with their items, loaded in one query"""
+        files = [self._document_to_file_model(doc) for doc in docs]
+        items: Dict[str, List[ItemDto]] = {str(file.id): [] for file in files if not file.items}
+        if items:
+            cursor = self.items_collection.find({"file_id": {"$in": list(items)}}).sort([("file_id", 1), ("position", 1)])
+            async for doc in cursor:
+                items[doc["file_id"]].append(self._document_to_item(doc))
+        for file in files:
+            if not file.items:
+                file.items = items[str(file.id)]
+        return files
+
+    async def upsert_parsed_items(
+        self,
+        file_id: UUID,
+        items: List[ItemChunkDto],
+        orders: Optional[List[int]] = None,
+    ) -> None:
+        """Insert or update parsed items of a file by ref_no, see MongoDBService.upsert_parsed_items"""
+        try:
+            operations = self._parsed_item_operations(file_id, items, orders)
+            if operations:
+                await self.parsed_items_collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            raise Exception(f"Failed to upsert parsed items: {str(e)}")
+
+    async def iter_parsed_items(self, file_id: UUID, batch_size: int = 200) -> AsyncIterator[List[ItemChunkDto]]:
+        """Stream the parsed items of a file in document order, see MongoDBService.iter_parsed_items"""
+        last_order = -1
+        while True:
+            cursor = (
+                self.parsed_items_collection.find({"file_id": str(file_id), "order": {"$gt": last_order}})
+                .sort("order", 1)
+                .limit(batch_size)
+            )
+            docs = await cursor.to_list()
+            if not docs:
+                return
+            last_order = docs[-1]["order"]
+            yield [self._document_to_item_chunk(doc) for doc in docs]
+            if len(docs) < batch_size:
+                return
+
+    async def get_parsed_item(self, file_id: UUID, ref_no: str) -> Optional[ItemChunkDto]:
+        """Get a single parsed item of a file by its ref_no, None if not found"""
+        doc = await self.parsed_items_collection.find_one({"file_id": str(file_id), "ref_no": ref_no.strip()})
+        return self._document_to_item_chunk(doc) if doc else None
+
+    async def count_parsed_items(self, file_id: UUID) -> int:
+        """Count the parsed items of a file, see MongoDBService.count_parsed_items"""
+        return await self.parsed_items_collection.count_documents({"file_id": str(file_id)})
+
+    async def update_file_page_hashes(self, file_id: UUID, page_hashes: List[str]) -> None:
+        """Store the text hash of every page of a file, see MongoDBService.update_file_page_hashes"""
+        try:
+            result = await self.files_collection.update_one(
+                {"id": str(file_id)},
+                {"$set": {"page_hashes": page_hashes, "updated_at": int(datetime.now().timestamp() * 1000)}},
+            )
+            if result.matched_count == 0:
+                raise Exception(f"File with ID {file_id} not found")
+        except Exception as e:
+            raise Exception(f"Failed to update page hashes: {str(e)}")
+
+    async def update_xml_content(self, file_id: UUID, xml_content: str) -> FileModel:
+        """Update the XML content for a file, see MongoDBService.update_xml_content"""
+        try:
+            update_dict = {
+                "xml_content": xml_content,
+                "is_xml_generated": True,
+                "updated_at": int(datetime.now().timestamp() * 1000)
+            }
+            result = await self.files_collection.find_one_and_update(
+                {"id": str(file_id)},
+                {"$set": update_dict},
+                return_document=ReturnDocument.AFTER
+            )
+            if not result:
+                raise Exception(f"File with ID {file_id} not found")
+            return await self._with_items(result)
+        except Exception as e:
+            raise Exception(f"Failed to update XML content: {str(e)}")
+
+    async def get_file_by_id(self, file_id: UUID) -> FileModel:
+        """Get a file by its ID, raises if it is not found"""
+        try:
+            file_doc = await self.files_collection.find_one({"id": str(file_id)})
+            if not file_doc:
+                raise Exception(f"File with ID {file_id} not found")
+            return await self._with_items(file_doc)
+        except PyMongoError as e:
+            raise Exception(f"Failed to retrieve file: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Failed to retrieve file: {str(e)}")
+
+    async def get_files_by_customer(self, customer_number: str) -> List[FileModel]:
+        """Get all files for a specific customer"""
+        cursor = self.files_collection.find({"customer_number": customer_number})
+        return await self._files_with_items(await cursor.to_list())
+
+    async def get_files_by_task(self, task_id: UUID) -> List[FileModel]:
+        """Get all files associated with a specific task"""
+        cursor = self.files_collection.find({"task_id": str(task_id)})
+        return await self._files_with_items(await cursor.to_list())
+
+    async def get_file_ids_by_task(self, task_id: UUID) -> List[UUID]:
+        """Get the IDs of the files of a task, without loading the files"""
+        cursor = self.files_collection.find({"task_id": str(task_id)}, {"id": 1})
+        return [UUID(doc["id"]) async for doc in cursor]
+
+    async def get_files(self) -> List[FileModel]:
+        """Get all files in the database"""
+        return await self._files_with_items(await self.files_collection.find().to_list())
+
+    async def list_files(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        customer_number: Optional[str] = None,
+        summary: bool = True,
+    ) -> Tuple[List[FileModel], Optional[str]]:
+        """One page of files newest first and the cursor of the next one, see MongoDBService.list_files"""
+        query = self._page_query({"customer_number": customer_number} if customer_number else {}, "created_at", cursor)
+        projection = self.FILE_SUMMARY_PROJECTION if summary else None
+        docs = await self.files_collection.find(query, projection).sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list()
+        docs, next_cursor = self._page(docs, limit, "created_at")
+        if summary:
+            return [self._document_to_file_model(doc) for doc in docs], next_cursor
+        return await self._files_with_items(docs), next_cursor
+
+    async def delete_file(self, file_id: UUID) -> bool:
+        """Delete a file by its ID, raises if it is not found"""
+        result = await self.files_collection.delete_one({"id": str(file_id)})
+        if result.deleted_count == 0:
+            raise Exception(f"File with ID {file_id} not found")
+        await self.items_collection.delete_many({"file_id": str(file_id)})
+        return True
+
+    async def insert_collection(self, collection: CollectionModel) -> UUID:
+        """Insert a new collection document, see MongoDBService.insert_collection"""
+        try:
+            result = await self.collections_collection.insert_one(self._collection_to_document(collection))
+            if result.acknowledged:
+                return collection.id
+            raise Exception("Collection insertion not acknowledged")
+        except DuplicateKeyError:
+            raise DuplicateKeyError(f"Collection with ID {collection.id} already exists")
+        except Exception as e:
+            raise Exception(f"Failed to insert collection: {str(e)}")
+
+    async def get_collection_by_id(self, collection_id: UUID, with_items: bool = False) -> CollectionModel:
+        """
+        Get a collection by its ID, raises if it is not found.
+        With `with_items` the items of its files are loaded in upload order.
+        """
+        doc = await self.collections_collection.find_one({"id": str(collection_id)})
+        if not doc:
+            raise Exception(f"Collection with ID {collection_id} not found")
+        collection = self._document_to_collection_model(doc)
+        if with_items and not collection.items:
+            for file_id in collection.file_ids:
+                collection.items.extend(await self.get_file_items(file_id))
+        return collection
+
+    async def store_collection_xml(self, collection_id: UUID, chunks: Iterable[str]) -> str:
+        """Write the catalog XML of a collection to GridFS, see MongoDBService.store_collection_xml"""
+        async with self.collection_xml_bucket.open_upload_stream(
+            f"{collection_id}.xml", metadata={"collection_id": str(collection_id)}
+        ) as stream:
+            for chunk in chunks:
+                await stream.write(chunk.encode("utf-8"))
+        return str(stream._id)
+
+    async def iter_collection_xml(self, xml_file_id: str) -> AsyncIterator[bytes]:
+        """Stream the catalog XML of a collection from GridFS, see MongoDBService.iter_collection_xml"""
+        stream = await self.collection_xml_bucket.open_download_stream(ObjectId(xml_file_id))
+        async with stream:
+            while chunk := await stream.readchunk():
+                yield chunk
+
+    async def delete_collection_xml(self, xml_file_id: str) -> None:
+        """Delete the catalog XML of a collection from GridFS, a missing file is ignored"""
+        try:
+            await self.collection_xml_bucket.delete(ObjectId(xml_file_id))
+        except NoFile:
+            pass
+
+    async def update_collection_result(
+        self,
+        collection_id: UUID,
+        status: TaskStatus,
+        file_ids: List[UUID],
+        item_count: int,
+        xml_file_id: Optional[str],
+        description: Optional[str] = None,
+    ) -> None:
+        """Store the merged result of a collection by reference, see MongoDBService.update_collection_result"""
+        try:
+            result = await self.collections_collection.update_one(
+                {"id": str(collection_id)},
+                {
+                    "$set": {
+                        "status": status.value,
+                        "file_ids": [str(file_id) for file_id in file_ids],
+                        "item_count": item_count,
+                        "xml_file_id": xml_file_id,
+                        "description": description,
+                        "updated_at": int(datetime.now().timestamp() * 1000),
+                    },
+                    "$unset": {"items": "", "xml_content": ""},
+                },
+            )
+            if result.matched_count == 0:
+                raise Exception(f"Collection with ID {collection_id} not found")
+        except Exception as e:
+            raise Exception(f"Failed to update collection result: {str(e)}")
+
+
+def get_db_service() -> AsyncMongoDBService:
+    """FastAPI dependency of the handlers, the services share the async client of the process"""
+    return AsyncMongoDBService()
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import redis
+
+from app.envirnoment import config
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """Key/value store used by the LLM response cache"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        ...
+
+
+class DiskCacheBackend(CacheBackend):
+    """
+    Stores every entry as a small JSON file in a local directory.
+
+    The modification time of a file is refreshed on every hit, so evicting
+    the files with the oldest modification time is a least recently used policy.
+    The directory is only scanned once the entries written since the last scan
+    may have taken it `evict_headroom` over `max_entries`, so a write does not
+    cost a scan of the whole directory. Every process counts only its own
+    writes, with several processes sharing the directory it can grow to about
+    `evict_headroom` over `max_entries` per process before one of them scans.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 10000, evict_headroom: float = 0.1):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.evict_headroom = max(1, int(max_entries * evict_headroom))
+        os.makedirs(self.directory, exist_ok=True)
+        # Entries on disk at the last scan plus the ones this process wrote since. Not an upper
+        # bound, other processes may have written to the directory too, each scan recounts it
+        self._entry_count = self._evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        expires_at = entry.get("expires_at")
+        if expires_at is not None and expires_at < time.time():
+            self._remove(path)
+            return None
+
+        self._touch(path)
+        return entry["value"]
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        entry = {
+            "expires_at": time.time() + ttl if ttl else None,
+            "value": value,
+        }
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._touch(path)
+        self._entry_count += 1
+        if self._entry_count > self.max_entries + self.evict_headroom:
+            self._entry_count = self._evict()
+
+    def _evict(self) -> int:
+        """Drop the least recently used entries over the limit, returns the entries left"""
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+        overflow = len(entries) - self.max_entries
+        if overflow <= 0:
+            return len(entries)
+        entries.sort(key=lambda e: e.stat().st_mtime_ns)
+        for entry in entries[:overflow]:
+            self._remove(entry.path)
+        return self.max_entries
+
+    def _touch(self, path: str):
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Stores entries in Redis with a per key expiry.
+
+    Size based eviction is left to Redis itself, configure the instance with
+    `maxmemory` and `maxmemory-policy allkeys-lru` (or `volatile-lru`).
+    """
+
+    def __init__(self, url: str, prefix: str = "specwise:llm:"):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(f"{self.prefix}{key}")
+        if value is None:
+            return None
+        return value.decode("utf-8")
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        self.client.set(f"{self.prefix}{key}", value.encode("utf-8"), ex=ttl or None)
+
+
+class LlmResponseCache:
+    """
+    Content addressed cache for LLM responses.
+
+    Entries are keyed on the model, the prompt version and a hash of the input
+    text, so a changed prompt or model never returns a stale answer. Backend
+    errors are logged and treated as a miss, the cache never fails a task.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: Optional[int] = None):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, prompt_version: str, text: str) -> str:
+        digest = hashlib.sha256()
+        for part in (model, prompt_version, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def get(self, model: str, prompt_version: str, text: str) -> Optional[Any]:
+        if self.backend is None:
+            return None
+        try:
+            value = self.backend.get(self.make_key(model, prompt_version, text))
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, model: str, prompt_version: str, text: str, value: Any) -> None:
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(
+                self.make_key(model, prompt_version, text),
+                json.dumps(value, ensure_ascii=False),
+                ttl=self.ttl,
+            )
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def create_llm_cache() -> LlmResponseCache:
+    """
+    Build the LLM cache from the environment.
+
+    LLM_CACHE_BACKEND selects `disk`, `redis` or `none` (the default).
+    """
+    backend_name = config.get("LLM_CACHE_BACKEND", "none").lower()
+    ttl = int(config.get("LLM_CACHE_TTL", 60 * 60 * 24 * 30))
+
+    backend: Optional[CacheBackend] = None
+    if backend_name == "disk":
+        backend = DiskCacheBackend(
+            directory=config.get("LLM_CACHE_DIR", "/tmp/specwise_llm_cache"),
+            max_entries=int(config.get("LLM_CACHE_MAX_ENTRIES", 10000)),
+        )
+    elif backend_name == "redis":
+        backend = RedisCacheBackend(
+            url=config.get("LLM_CACHE_REDIS_URL", config.get("REDIS_CONNECTION_STRING")),
+        )
+    elif backend_name != "none":
+        raise ValueError(f"Unknown LLM_CACHE_BACKEND: {backend_name}")
+
+    return LlmResponseCache(backend=backend, ttl=ttl)
@@ -5,14 +5,29 @@ from uuid import UUID
 
 from agents import Agent, FunctionTool, ModelSettings, RunContextWrapper, Runner
 from langchain_qdrant import Qdrant
-from app.services.llm.prompts import CATEGORIZATION_PROMPT, SYSTEM_PROMPT_LLM_CHUNKING, append_to_prompt
-from app.models.models import ItemDto, ItemChunkDto, TaskStatus
-from openai import OpenAI
+from app.services.llm.cache import create_llm_cache
+from app.services.llm.prompts import (
+    CATEGORIZATION_BATCH_INSTRUCTIONS,
+    CATEGORIZATION_PROMPT_VERSION,
+    SYSTEM_PROMPT_LLM_CHUNKING,
+    SYSTEM_PROMPT_LLM_CHUNKING_VERSION,
+    append_to_prompt,
+    build_categorization_prompt,
+)
+from app.models.models import ItemDto, ItemChunkDto
+from openai import AsyncOpenAI, OpenAI
 from app.envirnoment import config
 
 import logging
 
 from app.services.mongo_db import MongoDBService
+from app.services.progress_reporter import ProgressReporter
+from app.services.processing.sku_classifier import (
+    DEFAULT_CATALOG_PATH,
+    SkuClassifier,
+    load_catalog,
+    render_sku_offer_list,
+)
 from app.services.processing.vectore_client import VectoreDatabaseClient
 
 logger = logging.getLogger(__name__)
@@ -27,52 +42,181 @@ class OpenAILlmService:
             base_url="https://openrouter.ai/api/v1",
             api_key=config["OPENROUTE_API_KEY"],
         )
+        self.asyncOpenaiClient = AsyncOpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=config["OPENROUTE_API_KEY"],
+        )
         self.model= "openai/gpt-4o-mini"
+        self.max_concurrency = int(config.get("LLM_CONCURRENCY", 4))
+        self.max_output_tokens = int(config.get("LLM_MAX_OUTPUT_TOKENS", 4096))
+        self.cache = create_llm_cache()
+        self.categorization_batch_size = int(config.get("CATEGORIZATION_BATCH_SIZE", 20))
+        catalog_path = config.get("SKU_CATALOG_PATH") or DEFAULT_CATALOG_PATH
+        catalog = load_catalog(catalog_path)
+        # The service offer list of the prompt comes from the same catalog as the pre-classifier
+        self.categorization_prompt = append_to_prompt(
+            build_categorization_prompt(render_sku_offer_list(catalog)), CATEGORIZATION_BATCH_INSTRUCTIONS
+        )
+        self.categorization_prompt_version = f"{CATEGORIZATION_PROMPT_VERSION}-catalog{catalog['version']}"
+        self.sku_classifier = None
+        if config.get("SKU_PRECLASSIFIER_ENABLED", "true").lower() == "true":
+            self.sku_classifier = SkuClassifier(catalog_path)
         self.mongo_db_service = MongoDBService()
         self.vector_db_service = VectoreDatabaseClient()
 
-    def categorize(self, json_list: List[ItemChunkDto], task_id) -> List[ItemDto]:
+    def categorize(
+        self,
+        json_list: List[ItemChunkDto],
+        task_id,
+        file_id: Optional[UUID] = None,
+        progress: Optional[ProgressReporter] = None,
+        progress_offset: int = 0,
+        progress_total: Optional[int] = None,
+    ) -> List[ItemDto]:
+        """
+        Categorize parsed items, locally where the SKU catalog is unambiguous.
+
+        Items the SkuClassifier cannot decide are sent to the LLM in batches of
+        `categorization_batch_size` items per request. "wie Pos." references are
+        resolved beforehand by the ReferenceResolver, so a batch carries only its
+        own items and the prompt size no longer grows with the number of items
+        already done. The answers are mapped back to the input items by their
+        commission (ref_no) and the result keeps the input order. Items an
+        answer misses are logged and asked for again one by one.
+
+        When a `file_id` is given, the locally classified items and every
+        categorized batch are appended to the file as soon as they are done.
+        The progress goes to `progress`, which the caller flushes, or to a
+        reporter of the task when none is given. It counts categorized items,
+        starting at `progress_offset` out of `progress_total` (the given items
+        by default), for callers that categorize a document in several calls.
+        """
+        if self.sku_classifier is not None:
+            local_items, ambiguous = self.sku_classifier.split(json_list)
+        else:
+            local_items, ambiguous = [None] * len(json_list), list(range(len(json_list)))
+        logger.info(
+            f"Pre-classified {len(json_list) - len(ambiguous)} / {len(json_list)} items locally, "
+            f"{len(ambiguous)} go to the LLM"
+        )
+        if file_id:
+            classified = [item for item in local_items if item is not None]
+            if classified:
+                self.mongo_db_service.append_file_items(file_id=file_id, items=classified)
+
+        own_progress = progress is None
+        progress = progress or ProgressReporter(self.mongo_db_service, task_id)
+        total = progress_total if progress_total is not None else progress_offset + len(json_list)
+        done = progress_offset + len(json_list) - len(ambiguous)
+        progress.report(done, total, description=f"Categorized {done} / {total} items")
+        llm_items: Dict[str, ItemDto] = {}
+        for batch_start in range(0, len(ambiguous), self.categorization_batch_size):
+            batch_indexes = ambiguous[batch_start : batch_start + self.categorization_batch_size]
+            batch = [json_list[i] for i in batch_indexes]
+            batch_items = self._categorize_batch_with_retry(batch)
+            for item in batch_items:
+                llm_items[item.commission] = item
+            if file_id and batch_items:
+                self.mongo_db_service.append_file_items(file_id=file_id, items=batch_items)
+            done += len(batch_indexes)
+            progress.report(done, total, description=f"Categorized {done} / {total} items")
+        if own_progress:
+            progress.flush()
+
         items: List[ItemDto] = []
-        for entry in enumerate(json_list):
-            logger.info(f"entry: {entry}")
-            self.mongo_db_service.update_task_status(
-                task_id=UUID(task_id),
-                status=TaskStatus.in_progress,
-                description=f"Categorizing item {entry[0] + 1} / {len(json_list)}",
+        for entry, local_item in zip(json_list, local_items):
+            item = local_item or llm_items.get(entry.ref_no)
+            if item is not None:
+                items.append(item)
+        return items
+
+    def _categorize_batch_with_retry(self, batch: List[ItemChunkDto]) -> List[ItemDto]:
+        """
+        Categorize a batch, asking again one by one for the items the answer
+        left out or returned with an unknown commission or without a SKU
+        """
+        items = self._categorize_batch(batch)
+        answered = {item.commission for item in items}
+        missing = [entry for entry in batch if entry.ref_no not in answered]
+        if missing and len(batch) > 1:
+            logger.warning(
+                f"Categorization answer misses {len(missing)} / {len(batch)} items, retrying them one by one: "
+                f"{[entry.ref_no for entry in missing]}"
             )
-            prmopt = append_to_prompt(CATEGORIZATION_PROMPT, f"This is already parsed items all_items: {items}")
+            for entry in missing:
+                items.extend(self._categorize_batch([entry]))
+            answered = {item.commission for item in items}
+            missing = [entry for entry in missing if entry.ref_no not in answered]
+        if missing:
+            logger.error(f"Could not categorize items: {[entry.ref_no for entry in missing]}")
+        return items
+
+    def _categorize_batch(self, batch: List[ItemChunkDto]) -> List[ItemDto]:
+        payload = {
+            "items": [
+                {
+                    "commission": entry.ref_no,
+                    "description": entry.description,
+                    "quantity": entry.quantity,
+                    "unit": entry.unit,
+                }
+                for entry in batch
+            ],
+        }
+        batch_content = json.dumps(payload, ensure_ascii=False)
+
+        answer_string = self.cache.get(self.model, self.categorization_prompt_version, batch_content)
+        cached = answer_string is not None
+        if not cached:
             completion = self.openaiClient.chat.completions.create(
                 temperature=0.2,
                 response_format={"type": "json_object"},
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": prmopt},
-                    {"role": "system", "content": f" This is the next item content: {entry}"},
+                    {"role": "system", "content": self.categorization_prompt},
+                    {"role": "user", "content": batch_content},
                 ],
             )
             answer_string = completion.choices[0].message.content
-            if answer_string is not None:
-                answer_json = json.loads(answer_string)
-                if answer_json is not None:
-                    logger.info(f"Answer JSON: {answer_json}")
-                    if "items" in answer_json:
-                        for item in answer_json["items"]:
-                            # make the keys lower case
-                            item = {k.lower(): v for k, v in item.items()}
-                            item_dto = ItemDto(
-                                sku=str(item.get("sku")),
-                                name=item.get("name"),
-                                text=item.get("text"),
-                                quantity=item.get("quantity", 0),
-                                quantityunit=item.get("quantityunit", "Sk"),
-                                price=item.get("price", 0),
-                                priceunit=item.get("priceunit", "EURO"),
-                                commission=item.get("commission"),
-                                confidence=item.get("confidence"),
-                            )
-                            items.append(item_dto)
+        if answer_string is None:
+            return []
+
+        answer_json = json.loads(answer_string)
+        logger.info(f"Answer JSON: {answer_json}")
+        if not answer_json or "items" not in answer_json:
+            return []
+
+        answers_by_commission: Dict[str, dict] = {}
+        for item in answer_json["items"]:
+            # make the keys lower case
+            item = {k.lower(): v for k, v in item.items()}
+            commission = str(item.get("commission") or "").strip()
+            if commission and commission not in answers_by_commission:
+                answers_by_commission[commission] = item
+
+        items: List[ItemDto] = []
+        for entry in batch:
+            item = answers_by_commission.get(entry.ref_no.strip())
+            if item is None or not item.get("sku"):
+                continue
+            item_dto = ItemDto(
+                sku=str(item.get("sku")),
+                name=item.get("name"),
+                text=item.get("text"),
+                quantity=item.get("quantity", 0),
+                quantityunit=item.get("quantityunit", "Sk"),
+                price=item.get("price", 0),
+                priceunit=item.get("priceunit", "EURO"),
+                commission=entry.ref_no,
+                confidence=item.get("confidence"),
+                source_pages=entry.source_pages,
+            )
+            items.append(item_dto)
+        if not cached and len(items) == len(batch):
+            # Incomplete answers are not cached, a retry has to ask the LLM again
+            self.cache.set(self.model, self.categorization_prompt_version, batch_content, answer_string)
         return items
-    
+
     async def query_collection(self, ctx: RunContextWrapper[AgentContext], query: str) -> List[ItemChunkDto]:
         results = self.vector_db_service.query_collection(
             query=query,
@@ -96,6 +240,11 @@ class OpenAILlmService:
         Returns:
             List of parsed ItemDto objects
         """
+        cached_items = self.cache.get(self.model, SYSTEM_PROMPT_LLM_CHUNKING_VERSION, page_text)
+        if cached_items is not None:
+            logger.info(f"Loaded {len(cached_items)} parsed items from cache")
+            return [ItemChunkDto(**item) for item in cached_items]
+
         retry_count = 0
         last_error = None
         error_context = ""
@@ -121,9 +270,9 @@ class OpenAILlmService:
                 logger.info(
                     f"Sending request to LLM (attempt {retry_count + 1}/{max_retries + 1})"
                 )
-                completion = self.openaiClient.chat.completions.create(
+                completion = await self.asyncOpenaiClient.chat.completions.create(
                     model=self.model,
-                    max_tokens=4096,
+                    max_tokens=self.max_output_tokens,
                     temperature=0,
                     response_format={"type": "json_object"},
                     messages=messages,
@@ -167,6 +316,12 @@ class OpenAILlmService:
                 logger.info(
                     f"Successfully parsed {len(parsed_items)} items after {retry_count + 1} attempts"
                 )
+                self.cache.set(
+                    self.model,
+                    SYSTEM_PROMPT_LLM_CHUNKING_VERSION,
+                    page_text,
+                    [item.model_dump() for item in parsed_items],
+                )
                 return parsed_items
 
             except json.JSONDecodeError as e:
@@ -5,6 +5,14 @@ def append_to_prompt(prompt: str, text: str) -> str:
     """
     return f"{prompt}\n{text}"
 
+# Bump these whenever the matching prompt changes, they are part of the LLM cache key.
+# The categorization key also carries the SKU catalog version, its offer list is part of the prompt
+CATEGORIZATION_PROMPT_VERSION = "4"
+SYSTEM_PROMPT_LLM_CHUNKING_VERSION = "2"
+
+# Replaced by the service offer list rendered from the SKU catalog
+SKU_OFFER_LIST_MARKER = "{sku_offer_list}"
+
 CATEGORIZATION_PROMPT = """"
 ### You are a helpful assistant that categorizes each JSON item into the following categories, only if the item exists also in our service offer list.
 
@@ -15,17 +23,8 @@ CATEGORIZATION_PROMPT = """"
 4. **Safely populate the JSON with consideration of mentioned bellow**
 
 
-If you find text with a value starting with **"wie Pos."**, it indicates a reference to another item. In this case, you must populate the current item's **description only** with the description of the matching referenced item from the `all_already_parsed_items` list provided.
-
-#### Reference Matching Logic:
-
-* Look for the **most recent previous item** in the `all_items` list whose `commission` ends with the referenced number (e.g., `.10` or `10`) and is in the **same parent group**.
-
-  * **Example (i):**
-    `1.2.30: Wie Pos. 10.` → should match `1.2.10`, **not** `1.1.10`.
-  * **Example (ii):**
-    `1.4.40: Wie Pos. 25.` → should match `1.4.25`, **not** `1.2.25`.
-* Only copy the **description** from the referenced item and append it. Keep all other values (quantity, price, etc.) from the current item.
+Position references like **"wie Pos. 10"** or **"wie Vorposition"** are already resolved before you see the items,
+the description of the referenced position is appended to the description of the referencing item.
 
 ---
 
@@ -57,27 +56,12 @@ Avoid false matches based on keywords that only describe the mounting or accesso
 ---
 
 ### IMPORTANT:
-* **If the item is referenced like "wie Pos. 10" then you must only append the description of the referensed title, nothing else**
 * **If a wooden door is referenced with a steel frame, or still small part, use the SKU for wooden doors.**
 
 
 ### Service Offer List with SKU Numbers:
 
-* **Holztüren, Holzzargen**: `620001`
-* **Stahltüren, Stahlzargen, Rohrrahmentüren**: `670001`
-* **Haustüren**: `660001`
-* **Glastüren**: `610001`
-* **Tore**: `680001`
-* If the description includes combinations like **“Holztürblatt mit Stahlzarge”**, then use `620001`.
-* If the description includes **“Verglasung mit Stahlzarge”**, then use `670001`.
-* **Beschläge**: `240001`
-* **Türstopper**: `330001`
-* **Lüftungsgitter**: `450001`
-* **Türschließer**: `290001`
-* **Schlösser / E-Öffner**: `360001`
-* **Wartung**: `DL8110016`
-* **Stundenlohnarbeiten**: `DL5010008`
-* **Sonstige Arbeiten (e.g., Baustelleneinrichtung, Aufmaß, Mustertürblatt, etc.)**: `DL5019990`
+{sku_offer_list}
 
 ---
 
@@ -104,7 +88,22 @@ Return your result in the following JSON structure. Use lowercase keys exactly a
 
 """
 
+def build_categorization_prompt(sku_offer_list: str) -> str:
+    """
+    The categorization prompt with the service offer list, see sku_classifier.render_sku_offer_list.
+    """
+    return CATEGORIZATION_PROMPT.replace(SKU_OFFER_LIST_MARKER, sku_offer_list)
+
+
+CATEGORIZATION_BATCH_INSTRUCTIONS = """
+### Batch input:
 
+You receive a JSON object with an `items` list. Each entry has a `commission`, a `description`, a `quantity` and a `unit`.
+
+* Return **exactly one** result per entry of `items`, in the same order.
+* Copy the `commission` of the input entry unchanged into the result, it is used to map the result back.
+* If an entry does not match the service offer list, return it with `"sku": null` and `"confidence": 0` instead of skipping it.
+"""
 
 
 SYSTEM_PROMPT_LLM_CHUNKING = """
@@ -139,6 +138,10 @@ Pay special attention to German number formatting:
 Units are usually abbreviated and may include:
 - "Stk", "St", "h", "m²", "kg", etc.
 
+Position tables are usually given with one position per line, the columns separated by `|`:
+`ref_no | description | quantity unit | further numbers such as unit or total price`
+The quantity column holds the quantity and unit of the item, ignore the further numbers.
+
 - In cases like `"wie Pos. 10"` (without a full `ref_no`), match the closest item in `all_items` **above** the target_item whose `ref_no` ends in `.10` or `10`. 
   Examples:
 
@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from pymongo import AsyncMongoClient, MongoClient
+
+from app.envirnoment import config
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_client: Optional[MongoClient] = None
+_client_pid: Optional[int] = None
+# The API serves requests on one event loop with its own async client
+_async_client: Optional[AsyncMongoClient] = None
+
+
+def _optional_int(key: str) -> Optional[int]:
+    value = config.get(key)
+    return int(value) if value not in (None, "") else None
+
+
+def mongo_client_options() -> Dict[str, Any]:
+    """
+    Pool size and timeouts of the shared client, from the MONGO_* settings.
+
+    Options that are not set keep the pymongo default, except the server
+    selection timeout, which is shortened so a missing database fails a
+    request within seconds instead of half a minute.
+    """
+    options = {
+        "maxPoolSize": _optional_int("MONGO_MAX_POOL_SIZE"),
+        "minPoolSize": _optional_int("MONGO_MIN_POOL_SIZE"),
+        "maxIdleTimeMS": _optional_int("MONGO_MAX_IDLE_TIME_MS"),
+        "waitQueueTimeoutMS": _optional_int("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+        "connectTimeoutMS": _optional_int("MONGO_CONNECT_TIMEOUT_MS"),
+        "socketTimeoutMS": _optional_int("MONGO_SOCKET_TIMEOUT_MS"),
+        "serverSelectionTimeoutMS": int(config.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)),
+    }
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def mongo_connection_string() -> str:
+    return config.get("MONGO_DB_CONNECTION", "mongodb://localhost:27018")
+
+
+def open_mongo_client() -> MongoClient:
+    """
+    Open the process-wide client, or return it when it is already open.
+
+    A client must not be shared across fork: one inherited from the parent
+    process (e.g. the celery prefork master) is dropped and a new one opened.
+    """
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            return _client
+        if _client is not None:
+            logger.info("MongoDB client inherited from the parent process, opening a new one")
+        options = mongo_client_options()
+        _client = MongoClient(mongo_connection_string(), **options)
+        _client_pid = os.getpid()
+        logger.info(f"MongoDB client opened in process {_client_pid} with {options}")
+        return _client
+
+
+def get_mongo_client() -> MongoClient:
+    """The shared client of this process, opened on first use outside of the app and worker start up"""
+    client = _client
+    if client is not None and _client_pid == os.getpid():
+        return client
+    return open_mongo_client()
+
+
+def close_mongo_client():
+    """Close the shared client of this process, e.g. on application or worker shutdown"""
+    global _client, _client_pid
+    with _lock:
+        if _client is None:
+            return
+        if _client_pid == os.getpid():
+            _client.close()
+            logger.info(f"MongoDB client closed in process {_client_pid}")
+        _client = None
+        _client_pid = None
+
+
+def open_async_mongo_client() -> AsyncMongoClient:
+    """
+    Open the async client of the API process, or return it when it is already open.
+
+    It uses the same pool size and timeouts as the sync client. The client
+    binds to the event loop it is first used on, so it is opened in the
+    FastAPI lifespan and only used from request handlers.
+    """
+    global _async_client
+    if _async_client is None:
+        options = mongo_client_options()
+        _async_client = AsyncMongoClient(mongo_connection_string(), **options)
+        logger.info(f"Async MongoDB client opened with {options}")
+    return _async_client
+
+
+def get_async_mongo_client() -> AsyncMongoClient:
+    """The async client of this process, opened on first use"""
+    return _async_client if _async_client is not None else open_async_mongo_client()
+
+
+async def close_async_mongo_client():
+    """Close the async client, on application shutdown"""
+    global _async_client
+    if _async_client is None:
+        return
+    await _async_client.close()
+    _async_client = None
+    logger.info("Async MongoDB client closed")
@@ -1,11 +1,15 @@
-from typing import List, Dict, Any, Optional, Union
+import base64
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple, Union
 from uuid import UUID
 from datetime import datetime
 from bson import ObjectId
-from app.models.models import FileModel, ItemDto, TaskDto, TaskStatus
-from pymongo import MongoClient, ReturnDocument
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+from app.models.models import CollectionModel, FileModel, ItemChunkDto, ItemDto, TaskDto, TaskStatus
+from pymongo import MongoClient, ReplaceOne, ReturnDocument, UpdateOne
 from pymongo.errors import DuplicateKeyError, PyMongoError
 from app.envirnoment import config
+from app.services.mongo_client import get_mongo_client
 
 import logging
 
@@ -23,37 +27,316 @@ class PyObjectId(ObjectId):
         return ObjectId(v)
 
 
-class MongoDBService:
+class MongoDocumentMapper:
+    """Conversion between the models and the documents stored in MongoDB, shared by the sync and async services"""
+
+    def _index_specs(self) -> List[tuple]:
+        """(collection name, keys, options) of every required index"""
+        return [
+            # Tasks collection indexes
+            ("tasks", "id", {"unique": True}),
+            ("tasks", "collection_id", {}),
+            ("tasks", "collectionId", {}),
+            ("tasks", "status", {}),
+            # Keyset pagination of the task list, newest first, optionally by status
+            ("tasks", [("createdAt", -1), ("id", -1)], {}),
+            ("tasks", [("status", 1), ("createdAt", -1), ("id", -1)], {}),
+            # Files collection indexes
+            ("files", "id", {"unique": True}),
+            ("files", "customer_number", {}),
+            ("files", "task_id", {}),
+            ("files", "filename", {}),
+            # Keyset pagination of the file list, newest first, optionally by customer
+            ("files", [("created_at", -1), ("id", -1)], {}),
+            ("files", [("customer_number", 1), ("created_at", -1), ("id", -1)], {}),
+            # Parsed items collection indexes
+            ("parsed_items", [("file_id", 1), ("ref_no", 1)], {"unique": True}),
+            ("parsed_items", [("file_id", 1), ("order", 1)], {}),
+            # Collections indexes
+            ("collections", "id", {"unique": True}),
+            # Items collection indexes, items are kept in document order by position
+            ("items", [("file_id", 1), ("position", 1)], {"unique": True}),
+            ("items", [("file_id", 1), ("commission", 1)], {}),
+        ]
+
+    # GridFS bucket of the catalog XML of finalized collections
+    COLLECTION_XML_BUCKET = "collection_xml"
+
+    # Fields left out of the file documents of a summary listing
+    FILE_SUMMARY_PROJECTION = {"items": 0, "xml_content": 0, "page_hashes": 0}
+
+    def _encode_page_cursor(self, created_at: Optional[int], doc_id: str) -> str:
+        """Opaque cursor of the last document of a page, documents without a created time leave it empty"""
+        created = "" if created_at is None else created_at
+        return base64.urlsafe_b64encode(f"{created}:{doc_id}".encode()).decode()
+
+    def _page_query(self, query: Dict[str, Any], created_field: str, cursor: Optional[str]) -> Dict[str, Any]:
+        """
+        Query for the page after `cursor` in (created, id) descending order.
+
+        Documents without a created time (stored before it was set) sort after
+        all others, they are paged by id alone once the dated ones are through.
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        if not cursor:
+            return query
+        try:
+            created_at, doc_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 1)
+            created_at = int(created_at) if created_at else None
+        except ValueError:
+            raise ValueError(f"Invalid page cursor {cursor!r}")
+        if created_at is None:
+            return {**query, created_field: None, "id": {"$lt": doc_id}}
+        return {
+            **query,
+            "$or": [
+                {created_field: {"$lt": created_at}},
+                {created_field: created_at, "id": {"$lt": doc_id}},
+                {created_field: None},
+            ],
+        }
+
+    def _page(self, docs: List[Dict[str, Any]], limit: int, created_field: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Split `limit` + 1 fetched documents into the page and the cursor of the next one, None on the last page"""
+        if len(docs) <= limit:
+            return docs, None
+        docs = docs[:limit]
+        return docs, self._encode_page_cursor(docs[-1].get(created_field), docs[-1]["id"])
+
+    def _parsed_item_operations(
+        self,
+        file_id: UUID,
+        items: List[ItemChunkDto],
+        orders: Optional[List[int]] = None,
+    ) -> List[UpdateOne]:
+        """Bulk upserts of parsed items by ref_no, the order is only set when an item is first inserted"""
+        updated_at = int(datetime.now().timestamp() * 1000)
+        operations = []
+        for index, item in enumerate(items):
+            update = {
+                "$set": {
+                    "description": item.description,
+                    "quantity": item.quantity,
+                    "unit": item.unit,
+                    "references_id": item.references_id,
+                    "source_pages": item.source_pages,
+                    "updated_at": updated_at,
+                }
+            }
+            if orders is not None:
+                update["$setOnInsert"] = {"order": orders[index]}
+            operations.append(
+                UpdateOne({"file_id": str(file_id), "ref_no": item.ref_no.strip()}, update, upsert=True)
+            )
+        return operations
+
+    def _task_to_document(self, task: TaskDto) -> Dict[str, Any]:
+        """Convert a TaskDto to the document stored in MongoDB"""
+        task_dict = task.to_dict()
+        task_dict["id"] = str(task_dict["id"])  # Convert UUID to string for MongoDB
+        task_dict["collectionId"] = str(task_dict["collectionId"])  # Convert UUID to string
+        return task_dict
+
+    def _file_to_document(self, file_model: FileModel) -> Dict[str, Any]:
+        """Convert a FileModel to the document stored in MongoDB"""
+        file_dict = file_model.dict()
+        file_dict["id"] = str(file_dict["id"])  # Convert UUID to string for MongoDB
+        
+        if file_dict.get("task_id"):
+            file_dict["task_id"] = str(file_dict["task_id"])
+        if file_dict.get("previous_file_id"):
+            file_dict["previous_file_id"] = str(file_dict["previous_file_id"])
+        
+        # Items are stored in the items collection, see _file_item_operations
+        file_dict.pop("items", None)
+        return file_dict
+
+    def _collection_to_document(self, collection: CollectionModel) -> Dict[str, Any]:
+        """Convert a CollectionModel to the document stored in MongoDB"""
+        collection_dict = collection.dict()
+        collection_dict["id"] = str(collection.id)
+        collection_dict["task_ids"] = [str(task_id) for task_id in collection.task_ids]
+        collection_dict["file_ids"] = [str(file_id) for file_id in collection.file_ids]
+        # Items of a collection live in the items collection, by file
+        collection_dict.pop("items")
+        collection_dict["status"] = collection.status.value
+        return collection_dict
+
+    def _item_to_document(self, item: ItemDto) -> Dict[str, Any]:
+        """Convert an ItemDto to the document stored in MongoDB"""
+        return {
+            "sku": item.sku,
+            "name": item.name,
+            "text": item.text,
+            "quantity": item.quantity,
+            "quantityunit": item.quantityunit,
+            "price": item.price,
+            "priceunit": item.priceunit,
+            "commission": item.commission,
+            "confidence": item.confidence,
+            "source_pages": item.source_pages,
+        }
+
+    def _file_item_operations(self, file_id: UUID, items: List[ItemDto], first_position: int = 0) -> List[ReplaceOne]:
+        """Bulk writes of the items of a file at consecutive positions, replacing what is stored there"""
+        operations = []
+        for offset, item in enumerate(items):
+            position = first_position + offset
+            document = {**self._item_to_document(item), "file_id": str(file_id), "position": position}
+            operations.append(ReplaceOne({"file_id": str(file_id), "position": position}, document, upsert=True))
+        return operations
+
+    def _document_to_item(self, doc: Dict[str, Any]) -> ItemDto:
+        """Convert an items collection document to an ItemDto object"""
+        return ItemDto(
+            sku=doc["sku"],
+            name=doc["name"],
+            text=doc["text"],
+            quantity=doc["quantity"],
+            quantityunit=doc["quantityunit"],
+            price=doc["price"],
+            priceunit=doc["priceunit"],
+            commission=doc["commission"],
+            confidence=doc["confidence"],
+            source_pages=doc.get("source_pages", []),
+        )
+
+    def _document_to_item_chunk(self, doc: Dict[str, Any]) -> ItemChunkDto:
+        """Convert a parsed items document to an ItemChunkDto object"""
+        return ItemChunkDto(
+            ref_no=doc["ref_no"],
+            description=doc["description"],
+            quantity=doc["quantity"],
+            unit=doc["unit"],
+            references_id=doc.get("references_id"),
+            source_pages=doc.get("source_pages", []),
+        )
+
+    def _document_to_collection_model(self, doc: Dict[str, Any]) -> CollectionModel:
+        """Convert a MongoDB document to a CollectionModel object"""
+        if "_id" in doc:
+            doc.pop("_id")
+        doc["id"] = UUID(doc["id"])
+        doc["task_ids"] = [UUID(task_id) for task_id in doc.get("task_ids", [])]
+        doc["file_ids"] = [UUID(file_id) for file_id in doc.get("file_ids", [])]
+        doc["status"] = TaskStatus(doc["status"])
+        doc["items"] = [
+            ItemDto(**{**item, "source_pages": item.get("source_pages", [])}) for item in doc.get("items", [])
+        ]
+        return CollectionModel(**doc)
+
+    def _document_to_task_dto(self, doc: Dict[str, Any]) -> TaskDto:
+        """Convert a MongoDB document to a TaskDto object"""
+        # Convert MongoDB's _id to string if needed
+        if "_id" in doc:
+            doc.pop("_id")
+            
+        # Handle specific field mappings between MongoDB and TaskDto
+        task_dict = {
+            "id": UUID(doc["id"]),
+            "collection_id": UUID(doc["collectionId"]),
+            "description": doc["description"],
+            "file_name": doc.get("fileName"),
+            "status": TaskStatus(doc["status"]),
+            "created_at": doc["createdAt"],
+            "updated_at": doc.get("updatedAt"),
+            "peak_rss_mb": doc.get("peakRssMb"),
+            "progress_done": doc.get("progressDone"),
+            "progress_total": doc.get("progressTotal"),
+        }
+        
+        return TaskDto(**task_dict)
+    
+    def _document_to_file_model(self, doc: Dict[str, Any]) -> FileModel:
+        """Convert a MongoDB document to a FileModel object"""
+        # Convert MongoDB's _id to string if needed
+        if "_id" in doc:
+            doc.pop("_id")
+            
+        # Convert string IDs back to UUID
+        doc["id"] = UUID(doc["id"])
+        if doc.get("task_id"):
+            doc["task_id"] = UUID(doc["task_id"])
+        if doc.get("previous_file_id"):
+            doc["previous_file_id"] = UUID(doc["previous_file_id"])
+            
+        # Convert items if they exist
+        if "items" in doc and doc["items"]:
+            items = []
+            for item_dict in doc["items"]:
+                item = {
+                    "sku": item_dict["sku"],
+                    "name": item_dict["name"],
+                    "text": item_dict["text"],
+                    "quantity": item_dict["quantity"],
+                    "quantityunit": item_dict["quantityunit"],
+                    "price": item_dict["price"],
+                    "priceunit": item_dict["priceunit"],
+                    "commission": item_dict["commission"],
+                    "confidence": item_dict["confidence"],
+                    "source_pages": item_dict.get("source_pages", []),
+                }
+                items.append(ItemDto(**item))
+            
+            doc["items"] = items
+            
+        return FileModel(**doc)
+
+
+class MongoDBService(MongoDocumentMapper):
     """Service for handling MongoDB operations related to tasks and files"""
     
-    def __init__(self):
+    def __init__(self, client: Optional[MongoClient] = None):
         """
         Initialize the MongoDB service
-        
+
         Args:
-            connection_string: MongoDB connection string
-            db_name: Database name to use
+            client: MongoClient to use, the process-wide shared client by default.
+                The shared client is only looked up on first use, so services
+                constructed at import time (e.g. in the celery prefork master)
+                do not open a connection before the worker processes fork.
         """
-        mongodb_connection_string =config.get("MONGO_DB_CONNECTION", "mongodb://localhost:27018")
-        mongodb_database_name =config.get("MONGODB_DATABASE", "specwise")
-    
-        self.client = MongoClient(mongodb_connection_string)
-        self.db = self.client[mongodb_database_name]
-        self.tasks_collection = self.db["tasks"]
-        self.files_collection = self.db["files"]
-    
+        self._client = client
+        self.database_name = config.get("MONGODB_DATABASE", "specwise")
+
+    @property
+    def client(self) -> MongoClient:
+        return self._client if self._client is not None else get_mongo_client()
+
+    @property
+    def db(self):
+        return self.client[self.database_name]
+
+    @property
+    def tasks_collection(self):
+        return self.db["tasks"]
+
+    @property
+    def files_collection(self):
+        return self.db["files"]
+
+    @property
+    def parsed_items_collection(self):
+        return self.db["parsed_items"]
+
+    @property
+    def collections_collection(self):
+        return self.db["collections"]
+
+    @property
+    def items_collection(self):
+        return self.db["items"]
+
+    @property
+    def collection_xml_bucket(self) -> GridFSBucket:
+        return GridFSBucket(self.db, bucket_name=self.COLLECTION_XML_BUCKET)
+
     def _setup_indexes(self):
         """Set up required indexes for collections"""
-        # Tasks collection indexes
-        self.tasks_collection.create_index("id", unique=True)
-        self.tasks_collection.create_index("collection_id")
-        self.tasks_collection.create_index("status")
-        
-        # Files collection indexes
-        self.files_collection.create_index("id", unique=True)
-        self.files_collection.create_index("customer_number")
-        self.files_collection.create_index("task_id")
-        self.files_collection.create_index("filename")
+        for collection_name, keys, options in self._index_specs():
+            self.db[collection_name].create_index(keys, **options)
     
     def insert_task(self, task: TaskDto) -> UUID:
         """
@@ -69,11 +352,7 @@ class MongoDBService:
             DuplicateKeyError: If a task with the same ID already exists
         """
         try:
-            task_dict = task.to_dict()
-            task_dict["id"] = str(task_dict["id"])  # Convert UUID to string for MongoDB
-            task_dict["collectionId"] = str(task_dict["collectionId"])  # Convert UUID to string
-            
-            result = self.tasks_collection.insert_one(task_dict)
+            result = self.tasks_collection.insert_one(self._task_to_document(task))
             if result.acknowledged:
                 return task.id
             raise Exception("Task insertion not acknowledged")
@@ -120,6 +399,54 @@ class MongoDBService:
         except Exception as e:
             raise Exception(f"Failed to update task status: {str(e)}")
     
+    def update_task_progress(self, task_id: UUID, done: int, total: int, description: Optional[str] = None) -> None:
+        """
+        Store the progress of a running task, without reading the task back
+
+        Args:
+            task_id: UUID of the task to update
+            done: Units of work done of the current stage
+            total: Units of work of the current stage
+            description: Optional text of the progress
+
+        Raises:
+            Exception: If task not found or update fails
+        """
+        try:
+            update_dict = {
+                "progressDone": done,
+                "progressTotal": total,
+                "updatedAt": int(datetime.now().timestamp() * 1000),
+            }
+            if description is not None:
+                update_dict["description"] = description
+            result = self.tasks_collection.update_one({"id": str(task_id)}, {"$set": update_dict})
+            if result.matched_count == 0:
+                raise Exception(f"Task with ID {task_id} not found")
+        except Exception as e:
+            raise Exception(f"Failed to update task progress: {str(e)}")
+
+    def update_task_peak_rss(self, task_id: UUID, peak_rss_mb: float) -> None:
+        """
+        Store the peak resident memory of the worker while it processed a task
+        
+        Args:
+            task_id: UUID of the task to update
+            peak_rss_mb: Peak resident set size in MB
+            
+        Raises:
+            Exception: If task not found or update fails
+        """
+        try:
+            result = self.tasks_collection.update_one(
+                {"id": str(task_id)},
+                {"$set": {"peakRssMb": peak_rss_mb}},
+            )
+            if result.matched_count == 0:
+                raise Exception(f"Task with ID {task_id} not found")
+        except Exception as e:
+            raise Exception(f"Failed to update task peak RSS: {str(e)}")
+
     def get_all_tasks(self) -> List[TaskDto]:
         """
         Get all tasks in the database
@@ -129,6 +456,28 @@ class MongoDBService:
         cursor = self.tasks_collection.find()
         return [self._document_to_task_dto(doc) for doc in cursor]
 
+    def list_tasks(
+        self, limit: int, cursor: Optional[str] = None, status: Optional[TaskStatus] = None
+    ) -> Tuple[List[TaskDto], Optional[str]]:
+        """
+        Get one page of tasks, newest first
+
+        Args:
+            limit: Maximum number of tasks on the page
+            cursor: Cursor returned with the previous page, None for the first page
+            status: Only tasks with this status
+
+        Returns:
+            The tasks of the page and the cursor of the next page, None on the last page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        query = self._page_query({"status": status} if status else {}, "createdAt", cursor)
+        docs = list(self.tasks_collection.find(query).sort([("createdAt", -1), ("id", -1)]).limit(limit + 1))
+        docs, next_cursor = self._page(docs, limit, "createdAt")
+        return [self._document_to_task_dto(doc) for doc in docs], next_cursor
+
     def get_task_by_id(self, task_id: UUID) -> TaskDto:
         """
         Get a task by its ID
@@ -207,36 +556,12 @@ class MongoDBService:
             DuplicateKeyError: If a file with the same ID already exists
         """
         try:
-            file_dict = file_model.dict()
-            file_dict["id"] = str(file_dict["id"])  # Convert UUID to string for MongoDB
-            
-            if file_dict.get("task_id"):
-                file_dict["task_id"] = str(file_dict["task_id"])
-            
-            # Convert items to dictionaries with proper serialization
-            if "items" in file_dict and file_dict["items"]:
-                items_dict = []
-                for item in file_dict["items"]:
-                    item_dict = {
-                        "sku": item["sku"],
-                        "name": item["name"],
-                        "text": item["text"],
-                        "quantity": item["quantity"],
-                        "quantityunit": item["quantityunit"],
-                        "price": item["price"],
-                        "priceunit": item["priceunit"],
-                        "commission": item["commission"],
-                        "confidence": item["confidence"]
-                    }
-                    
-                    items_dict.append(item_dict)
-                
-                file_dict["items"] = items_dict
-            
-            result = self.files_collection.insert_one(file_dict)
-            if result.acknowledged:
-                return file_model.id
-            raise Exception("File insertion not acknowledged")
+            result = self.files_collection.insert_one(self._file_to_document(file_model))
+            if not result.acknowledged:
+                raise Exception("File insertion not acknowledged")
+            if file_model.items:
+                self.items_collection.bulk_write(self._file_item_operations(file_model.id, file_model.items), ordered=False)
+            return file_model.id
         except DuplicateKeyError:
             raise DuplicateKeyError(f"File with ID {file_model.id} already exists")
         except Exception as e:
@@ -244,11 +569,11 @@ class MongoDBService:
     
     def update_file_items(self, file_id: UUID, items: List[ItemDto]) -> FileModel:
         """
-        Update the items for a file
+        Replace the items of a file
         
         Args:
             file_id: UUID of the file to update
-            items: List of ItemDto objects
+            items: List of ItemDto objects in document order
             
         Returns:
             Updated FileModel
@@ -257,42 +582,252 @@ class MongoDBService:
             Exception: If file not found or update fails
         """
         try:
-            # Convert items to dictionaries
-            items_dict = []
-            for item in items:
-                item_dict = {
-                    "sku": item.sku,
-                    "name": item.name,
-                    "text": item.text,
-                    "quantity": item.quantity,
-                    "quantityunit": item.quantityunit,
-                    "price": item.price,
-                    "priceunit": item.priceunit,
-                    "commission": item.commission,
-                    "confidence": item.confidence
-                }
-                
-                items_dict.append(item_dict)
-            
-            update_dict = {
-                "items": items_dict,
-                "updated_at": int(datetime.now().timestamp() * 1000)
-            }
-            
             result = self.files_collection.find_one_and_update(
                 {"id": str(file_id)},
-                {"$set": update_dict},
+                {"$set": {"updated_at": int(datetime.now().timestamp() * 1000)}, "$unset": {"items": ""}},
                 return_document=ReturnDocument.AFTER
             )
-            
             if not result:
                 raise Exception(f"File with ID {file_id} not found")
-            
-            # Convert the MongoDB document back to FileModel
-            return self._document_to_file_model(result)
+
+            if items:
+                self.items_collection.bulk_write(self._file_item_operations(file_id, items), ordered=False)
+            self.items_collection.delete_many({"file_id": str(file_id), "position": {"$gte": len(items)}})
+
+            file = self._document_to_file_model(result)
+            file.items = items
+            return file
         except Exception as e:
             raise Exception(f"Failed to update file items: {str(e)}")
 
+    def append_file_items(self, file_id: UUID, items: List[ItemDto]) -> None:
+        """
+        Append categorized items to a file without rewriting the existing ones
+        
+        Args:
+            file_id: UUID of the file to update
+            items: List of ItemDto objects to append
+            
+        Raises:
+            Exception: If file not found or update fails
+        """
+        try:
+            result = self.files_collection.update_one(
+                {"id": str(file_id)},
+                {"$set": {"updated_at": int(datetime.now().timestamp() * 1000)}},
+            )
+            if result.matched_count == 0:
+                raise Exception(f"File with ID {file_id} not found")
+            if not items:
+                return
+            # One task writes the items of a file, so the next free position is not raced for
+            last = self.items_collection.find_one({"file_id": str(file_id)}, sort=[("position", -1)])
+            first_position = last["position"] + 1 if last else 0
+            self.items_collection.bulk_write(self._file_item_operations(file_id, items, first_position), ordered=False)
+        except Exception as e:
+            raise Exception(f"Failed to append file items: {str(e)}")
+
+    def update_file_item(self, file_id: UUID, position: int, item: ItemDto) -> ItemDto:
+        """
+        Update a single item of a file without touching the others
+        
+        Args:
+            file_id: UUID of the file the item belongs to
+            position: 0-based position of the item in document order
+            item: New values of the item
+            
+        Returns:
+            Updated ItemDto
+            
+        Raises:
+            Exception: If the item is not found or the update fails
+        """
+        try:
+            result = self.items_collection.find_one_and_update(
+                {"file_id": str(file_id), "position": position},
+                {"$set": {**self._item_to_document(item), "updated_at": int(datetime.now().timestamp() * 1000)}},
+                return_document=ReturnDocument.AFTER
+            )
+            if not result:
+                raise Exception(f"Item {position} of file {file_id} not found")
+            return self._document_to_item(result)
+        except Exception as e:
+            raise Exception(f"Failed to update file item: {str(e)}")
+
+    def iter_file_items(self, file_id: UUID, batch_size: int = 500) -> Iterator[ItemDto]:
+        """
+        Stream the items of a file in document order
+        
+        Args:
+            file_id: UUID of the file the items belong to
+            batch_size: Number of items the cursor fetches per round trip
+            
+        Returns:
+            Iterator over ItemDto objects
+        """
+        cursor = self.items_collection.find({"file_id": str(file_id)}).sort("position", 1).batch_size(batch_size)
+        for doc in cursor:
+            yield self._document_to_item(doc)
+
+    def count_file_items(self, file_id: UUID) -> int:
+        """
+        Count the items of a file
+        
+        Args:
+            file_id: UUID of the file the items belong to
+            
+        Returns:
+            Number of items
+        """
+        return self.items_collection.count_documents({"file_id": str(file_id)})
+
+    def get_file_items(self, file_id: UUID) -> List[ItemDto]:
+        """
+        Get all items of a file in document order
+        
+        Args:
+            file_id: UUID of the file the items belong to
+            
+        Returns:
+            List of ItemDto objects
+        """
+        return list(self.iter_file_items(file_id))
+
+    def migrate_embedded_items(self) -> int:
+        """
+        Move items embedded in file documents, as stored before the items collection, into it
+        
+        Returns:
+            Number of migrated files
+        """
+        migrated = 0
+        for doc in self.files_collection.find({"items.0": {"$exists": True}}, {"id": 1, "items": 1}):
+            items = [ItemDto.from_dict(item) for item in doc["items"]]
+            self.items_collection.bulk_write(self._file_item_operations(doc["id"], items), ordered=False)
+            self.files_collection.update_one({"id": doc["id"]}, {"$unset": {"items": ""}})
+            migrated += 1
+        if migrated:
+            logger.info(f"Moved the embedded items of {migrated} files to the items collection")
+        return migrated
+
+    def _with_items(self, doc: Dict[str, Any]) -> FileModel:
+        """FileModel of a file document with its items"""
+        file = self._document_to_file_model(doc)
+        if not file.items:
+            # Files stored before the items collection keep theirs embedded until migrated
+            file.items = self.get_file_items(file.id)
+        return file
+
+    def _files_with_items(self, docs: List[Dict[str, Any]]) -> List[FileModel]:
+        """FileModels of file documents with their items, loaded in one query"""
+        files = [self._document_to_file_model(doc) for doc in docs]
+        items: Dict[str, List[ItemDto]] = {str(file.id): [] for file in files if not file.items}
+        if items:
+            cursor = self.items_collection.find({"file_id": {"$in": list(items)}}).sort([("file_id", 1), ("position", 1)])
+            for doc in cursor:
+                items[doc["file_id"]].append(self._document_to_item(doc))
+        for file in files:
+            if not file.items:
+                file.items = items[str(file.id)]
+        return files
+
+    def upsert_parsed_items(
+        self,
+        file_id: UUID,
+        items: List[ItemChunkDto],
+        orders: Optional[List[int]] = None,
+    ) -> None:
+        """
+        Insert or update parsed (not yet categorized) items of a file by ref_no
+        
+        Args:
+            file_id: UUID of the file the items belong to
+            items: List of ItemChunkDto objects
+            orders: Optional document order of every item, set when the item is first inserted
+            
+        Raises:
+            Exception: If the bulk write fails
+        """
+        try:
+            operations = self._parsed_item_operations(file_id, items, orders)
+            if operations:
+                self.parsed_items_collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            raise Exception(f"Failed to upsert parsed items: {str(e)}")
+
+    def iter_parsed_items(self, file_id: UUID, batch_size: int = 200) -> Iterator[List[ItemChunkDto]]:
+        """
+        Stream the parsed items of a file in document order
+        
+        Args:
+            file_id: UUID of the file the items belong to
+            batch_size: Number of items per yielded list and per cursor batch
+            
+        Returns:
+            Iterator over lists of at most batch_size ItemChunkDto objects
+        """
+        # Pages by order instead of one long lived cursor, the consumer may take minutes per batch
+        last_order = -1
+        while True:
+            docs = list(
+                self.parsed_items_collection.find({"file_id": str(file_id), "order": {"$gt": last_order}})
+                .sort("order", 1)
+                .limit(batch_size)
+            )
+            if not docs:
+                return
+            last_order = docs[-1]["order"]
+            yield [self._document_to_item_chunk(doc) for doc in docs]
+            if len(docs) < batch_size:
+                return
+
+    def get_parsed_item(self, file_id: UUID, ref_no: str) -> Optional[ItemChunkDto]:
+        """
+        Get a single parsed item of a file by its ref_no
+        
+        Args:
+            file_id: UUID of the file the item belongs to
+            ref_no: ref_no of the item
+            
+        Returns:
+            ItemChunkDto object or None if not found
+        """
+        doc = self.parsed_items_collection.find_one({"file_id": str(file_id), "ref_no": ref_no.strip()})
+        return self._document_to_item_chunk(doc) if doc else None
+
+    def count_parsed_items(self, file_id: UUID) -> int:
+        """
+        Count the parsed items of a file
+        
+        Args:
+            file_id: UUID of the file the items belong to
+            
+        Returns:
+            Number of parsed items
+        """
+        return self.parsed_items_collection.count_documents({"file_id": str(file_id)})
+
+    def update_file_page_hashes(self, file_id: UUID, page_hashes: List[str]) -> None:
+        """
+        Store the text hash of every extracted page of a file, used to diff later revisions
+        
+        Args:
+            file_id: UUID of the file to update
+            page_hashes: SHA-256 of every page text in page order
+            
+        Raises:
+            Exception: If file not found or update fails
+        """
+        try:
+            result = self.files_collection.update_one(
+                {"id": str(file_id)},
+                {"$set": {"page_hashes": page_hashes, "updated_at": int(datetime.now().timestamp() * 1000)}},
+            )
+            if result.matched_count == 0:
+                raise Exception(f"File with ID {file_id} not found")
+        except Exception as e:
+            raise Exception(f"Failed to update page hashes: {str(e)}")
+
     def update_xml_content(self, file_id: UUID, xml_content: str) -> FileModel:
         """
         Update the XML content for a file
@@ -324,7 +859,7 @@ class MongoDBService:
                 raise Exception(f"File with ID {file_id} not found")
             
             # Convert the MongoDB document back to FileModel
-            return self._document_to_file_model(result)
+            return self._with_items(result)
         except Exception as e:
             raise Exception(f"Failed to update XML content: {str(e)}")
     
@@ -345,7 +880,7 @@ class MongoDBService:
             file_doc = self.files_collection.find_one({"id": str(file_id)})
             if not file_doc:
                 raise Exception(f"File with ID {file_id} not found")
-            return self._document_to_file_model(file_doc)
+            return self._with_items(file_doc)
         except PyMongoError as e:
             raise Exception(f"Failed to retrieve file: {str(e)}")
         except Exception as e:
@@ -363,7 +898,7 @@ class MongoDBService:
             List of FileModel objects
         """
         cursor = self.files_collection.find({"customer_number": customer_number})
-        return [self._document_to_file_model(doc) for doc in cursor]
+        return self._files_with_items(list(cursor))
     
     def get_files_by_task(self, task_id: UUID) -> List[FileModel]:
         """
@@ -376,7 +911,19 @@ class MongoDBService:
             List of FileModel objects
         """
         cursor = self.files_collection.find({"task_id": str(task_id)})
-        return [self._document_to_file_model(doc) for doc in cursor]
+        return self._files_with_items(list(cursor))
+    
+    def get_file_ids_by_task(self, task_id: UUID) -> List[UUID]:
+        """
+        Get the IDs of the files of a task, without loading the files
+        
+        Args:
+            task_id: UUID of the task to filter by
+            
+        Returns:
+            List of file UUIDs
+        """
+        return [UUID(doc["id"]) for doc in self.files_collection.find({"task_id": str(task_id)}, {"id": 1})]
     
     def get_files(self) -> List[FileModel]:
         """
@@ -386,7 +933,37 @@ class MongoDBService:
             List of FileModel objects
         """
         cursor = self.files_collection.find()
-        return [self._document_to_file_model(doc) for doc in cursor]
+        return self._files_with_items(list(cursor))
+
+    def list_files(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        customer_number: Optional[str] = None,
+        summary: bool = True,
+    ) -> Tuple[List[FileModel], Optional[str]]:
+        """
+        Get one page of files, newest first
+
+        Args:
+            limit: Maximum number of files on the page
+            cursor: Cursor returned with the previous page, None for the first page
+            customer_number: Only files of this customer
+            summary: Leave out the items, XML content and page hashes
+
+        Returns:
+            The files of the page and the cursor of the next page, None on the last page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        query = self._page_query({"customer_number": customer_number} if customer_number else {}, "created_at", cursor)
+        projection = self.FILE_SUMMARY_PROJECTION if summary else None
+        docs = list(self.files_collection.find(query, projection).sort([("created_at", -1), ("id", -1)]).limit(limit + 1))
+        docs, next_cursor = self._page(docs, limit, "created_at")
+        if summary:
+            return [self._document_to_file_model(doc) for doc in docs], next_cursor
+        return self._files_with_items(docs), next_cursor
 
     def delete_file(self, file_id: UUID) -> bool:
         """
@@ -404,56 +981,139 @@ class MongoDBService:
         result = self.files_collection.delete_one({"id": str(file_id)})
         if result.deleted_count == 0:
             raise Exception(f"File with ID {file_id} not found")
+        self.items_collection.delete_many({"file_id": str(file_id)})
             
         return True
     
-    def _document_to_task_dto(self, doc: Dict[str, Any]) -> TaskDto:
-        """Convert a MongoDB document to a TaskDto object"""
-        # Convert MongoDB's _id to string if needed
-        if "_id" in doc:
-            doc.pop("_id")
+    def insert_collection(self, collection: CollectionModel) -> UUID:
+        """
+        Insert a new collection document into the database
+        
+        Args:
+            collection: CollectionModel object to insert
             
-        # Handle specific field mappings between MongoDB and TaskDto
-        task_dict = {
-            "id": UUID(doc["id"]),
-            "collection_id": UUID(doc["collectionId"]),
-            "description": doc["description"],
-            "file_name": doc.get("fileName"),
-            "status": TaskStatus(doc["status"]),
-            "created_at": doc["createdAt"],
-            "updated_at": doc.get("updatedAt")
-        }
+        Returns:
+            UUID of the inserted collection
+            
+        Raises:
+            DuplicateKeyError: If a collection with the same ID already exists
+        """
+        try:
+            result = self.collections_collection.insert_one(self._collection_to_document(collection))
+            if result.acknowledged:
+                return collection.id
+            raise Exception("Collection insertion not acknowledged")
+        except DuplicateKeyError:
+            raise DuplicateKeyError(f"Collection with ID {collection.id} already exists")
+        except Exception as e:
+            raise Exception(f"Failed to insert collection: {str(e)}")
+
+    def get_collection_by_id(self, collection_id: UUID) -> CollectionModel:
+        """
+        Get a collection by its ID
         
-        return TaskDto(**task_dict)
-    
-    def _document_to_file_model(self, doc: Dict[str, Any]) -> FileModel:
-        """Convert a MongoDB document to a FileModel object"""
-        # Convert MongoDB's _id to string if needed
-        if "_id" in doc:
-            doc.pop("_id")
+        Args:
+            collection_id: UUID of the collection to retrieve
             
-        # Convert string IDs back to UUID
-        doc["id"] = UUID(doc["id"])
-        if doc.get("task_id"):
-            doc["task_id"] = UUID(doc["task_id"])
+        Returns:
+            CollectionModel object
             
-        # Convert items if they exist
-        if "items" in doc and doc["items"]:
-            items = []
-            for item_dict in doc["items"]:
-                item = {
-                    "sku": item_dict["sku"],
-                    "name": item_dict["name"],
-                    "text": item_dict["text"],
-                    "quantity": item_dict["quantity"],
-                    "quantityunit": item_dict["quantityunit"],
-                    "price": item_dict["price"],
-                    "priceunit": item_dict["priceunit"],
-                    "commission": item_dict["commission"],
-                    "confidence": item_dict["confidence"]
-                }
-                items.append(ItemDto(**item))
+        Raises:
+            Exception: If collection not found
+        """
+        doc = self.collections_collection.find_one({"id": str(collection_id)})
+        if not doc:
+            raise Exception(f"Collection with ID {collection_id} not found")
+        return self._document_to_collection_model(doc)
+
+    def store_collection_xml(self, collection_id: UUID, chunks: Iterable[str]) -> str:
+        """
+        Write the catalog XML of a collection to GridFS as it is produced
+        
+        Args:
+            collection_id: UUID of the collection the XML belongs to
+            chunks: Parts of the XML document in order
             
-            doc["items"] = items
+        Returns:
+            ID of the GridFS file
+        """
+        with self.collection_xml_bucket.open_upload_stream(
+            f"{collection_id}.xml", metadata={"collection_id": str(collection_id)}
+        ) as stream:
+            for chunk in chunks:
+                stream.write(chunk.encode("utf-8"))
+        return str(stream._id)
+
+    def iter_collection_xml(self, xml_file_id: str) -> Iterator[bytes]:
+        """
+        Stream the catalog XML of a collection from GridFS
+        
+        Args:
+            xml_file_id: ID of the GridFS file, see store_collection_xml
             
-        return FileModel(**doc)
+        Returns:
+            Iterator over the chunks of the UTF-8 encoded XML
+        """
+        with self.collection_xml_bucket.open_download_stream(ObjectId(xml_file_id)) as stream:
+            while chunk := stream.readchunk():
+                yield chunk
+
+    def delete_collection_xml(self, xml_file_id: str) -> None:
+        """
+        Delete the catalog XML of a collection from GridFS, a missing file is ignored
+        
+        Args:
+            xml_file_id: ID of the GridFS file, see store_collection_xml
+        """
+        try:
+            self.collection_xml_bucket.delete(ObjectId(xml_file_id))
+        except NoFile:
+            pass
+
+    def update_collection_result(
+        self,
+        collection_id: UUID,
+        status: TaskStatus,
+        file_ids: List[UUID],
+        item_count: int,
+        xml_file_id: Optional[str],
+        description: Optional[str] = None,
+    ) -> None:
+        """
+        Store the merged result of a collection once all of its file tasks are done
+        
+        The items stay in the items collection and the XML in GridFS, the
+        collection document only references them, so it does not grow with
+        the size of the files.
+        
+        Args:
+            collection_id: UUID of the collection to update
+            status: Final TaskStatus of the collection
+            file_ids: Processed files in upload order, their items make up the result
+            item_count: Number of items of all files
+            xml_file_id: GridFS file of the catalog XML, see store_collection_xml
+            description: Optional summary, e.g. the number of failed files
+            
+        Raises:
+            Exception: If collection not found or update fails
+        """
+        try:
+            result = self.collections_collection.update_one(
+                {"id": str(collection_id)},
+                {
+                    "$set": {
+                        "status": status.value,
+                        "file_ids": [str(file_id) for file_id in file_ids],
+                        "item_count": item_count,
+                        "xml_file_id": xml_file_id,
+                        "description": description,
+                        "updated_at": int(datetime.now().timestamp() * 1000),
+                    },
+                    # Embedded result of an earlier finalization
+                    "$unset": {"items": "", "xml_content": ""},
+                },
+            )
+            if result.matched_count == 0:
+                raise Exception(f"Collection with ID {collection_id} not found")
+        except Exception as e:
+            raise Exception(f"Failed to update collection result: {str(e)}")
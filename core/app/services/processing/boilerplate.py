@@ -0,0 +1,164 @@
+import logging
+import re
+from collections import Counter
+from typing import Callable, List, Optional, Set, Tuple
+
+from app.services.processing.segmenter import ORDINAL_PATTERN, QUANTITY_PATTERN
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+DIGITS_PATTERN = re.compile(r"\d+")
+# Fill-in fields for the bidder, e.g. "Einheitspreis ........" or "Fabrikat: ________"
+FILL_IN_PATTERN = re.compile(r"[._]{4,}")
+# "Türzar-" at the end of a line, continued by "gen" on the next
+HYPHENATED_PATTERN = re.compile(r"[A-Za-zÄÖÜäöüß]-$")
+# A trailing hyphen before these words is part of an elision, e.g. "Stahl- und Holztüren"
+CONJUNCTIONS = ("und", "oder", "bzw", "sowie")
+
+
+def page_lines(page: str) -> List[str]:
+    """Non-empty lines of a page with the whitespace collapsed"""
+    lines = []
+    for line in page.splitlines():
+        line = WHITESPACE_PATTERN.sub(" ", line).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def line_key(line: str) -> str:
+    """Lines that only differ in numbers (page numbers, dates) share a key"""
+    return DIGITS_PATTERN.sub("#", line.lower())
+
+
+def join_hyphenated(lines: List[str]) -> List[str]:
+    """Rejoin words hyphenated over a line break, the elision in "Stahl- und" is kept"""
+    joined: List[str] = []
+    for line in lines:
+        if joined and HYPHENATED_PATTERN.search(joined[-1]) and line[0].islower():
+            first_word = line.split(" ", 1)[0].rstrip(".,")
+            if first_word in CONJUNCTIONS:
+                joined[-1] = f"{joined[-1]} {line}"
+            else:
+                joined[-1] = f"{joined[-1][:-1]}{line}"
+        else:
+            joined.append(line)
+    return joined
+
+
+class BoilerplateFilter:
+    """
+    Removes repeated headers, footers and boilerplate lines from page text.
+
+    Fed page by page like the window builders. When `fit` was called with
+    pages spread over the document beforehand, every page is cleaned and
+    returned right away. Otherwise the first `sample_pages` pages are kept
+    back until the filter is fitted on them. A line (numbers ignored, so "Seite 3 von
+    40" matches every page) is boilerplate when it shows up within the first
+    or last `edge_lines` lines on at least `edge_ratio` of the sampled pages.
+    Bidder fill-in fields are removed anywhere on the page when they show up
+    on at least `body_ratio` of the sampled pages, other repeated body lines
+    are description text and stay. Lines starting with an Ordnungszahl or
+    holding a quantity are never removed (a date at the start of a footer
+    is not an Ordnungszahl, see segmenter.ORDINAL_PATTERN). Cleaned pages also get hyphenated
+    words rejoined and whitespace collapsed.
+    """
+
+    def __init__(
+        self,
+        sample_pages: int = 8,
+        min_pages: int = 3,
+        edge_lines: int = 4,
+        edge_ratio: float = 0.5,
+        body_ratio: float = 0.8,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ):
+        self.sample_pages = sample_pages
+        self.min_pages = min_pages
+        self.edge_lines = edge_lines
+        self.edge_ratio = edge_ratio
+        self.body_ratio = body_ratio
+        self.count_tokens = count_tokens
+        self.buffered_pages: List[Tuple[int, str]] = []
+        self.fitted = False
+        self.edge_keys: Set[str] = set()
+        self.body_keys: Set[str] = set()
+        self.removed_lines = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def feed(self, page_index: int, page: str) -> List[Tuple[int, str]]:
+        """Add a page and return the (page_index, cleaned text) pairs that are ready"""
+        if self.fitted:
+            return [(page_index, self.clean(page))]
+        self.buffered_pages.append((page_index, page))
+        if len(self.buffered_pages) < self.sample_pages:
+            return []
+        return self._release()
+
+    def flush(self) -> List[Tuple[int, str]]:
+        return [] if self.fitted else self._release()
+
+    def _release(self) -> List[Tuple[int, str]]:
+        self.fit([page for _, page in self.buffered_pages])
+        released = [(page_index, self.clean(page)) for page_index, page in self.buffered_pages]
+        self.buffered_pages = []
+        return released
+
+    def fit(self, pages: List[str]):
+        self.fitted = True
+        if len(pages) < self.min_pages:
+            return
+        edge_counts: Counter = Counter()
+        body_counts: Counter = Counter()
+        for page in pages:
+            lines = page_lines(page)
+            edge = set()
+            body = set()
+            for index, line in enumerate(lines):
+                if self._protected(line):
+                    continue
+                key = line_key(line)
+                if FILL_IN_PATTERN.search(line):
+                    body.add(key)
+                if index < self.edge_lines or index >= len(lines) - self.edge_lines:
+                    edge.add(key)
+            edge_counts.update(edge)
+            body_counts.update(body)
+
+        self.edge_keys = {key for key, count in edge_counts.items() if count >= self.edge_ratio * len(pages)}
+        self.body_keys = {key for key, count in body_counts.items() if count >= self.body_ratio * len(pages)}
+        logger.info(
+            f"Boilerplate fitted on {len(pages)} pages: "
+            f"{len(self.edge_keys)} header/footer lines, {len(self.body_keys)} fill-in field lines"
+        )
+
+    def _protected(self, line: str) -> bool:
+        return bool(ORDINAL_PATTERN.match(line) or QUANTITY_PATTERN.search(line))
+
+    def clean(self, page: str) -> str:
+        lines = page_lines(page)
+        kept = []
+        for index, line in enumerate(lines):
+            key = line_key(line)
+            is_edge = index < self.edge_lines or index >= len(lines) - self.edge_lines
+            if not self._protected(line) and (key in self.body_keys or (is_edge and key in self.edge_keys)):
+                self.removed_lines += 1
+                continue
+            kept.append(line)
+        cleaned = "\n".join(join_hyphenated(kept))
+        if self.count_tokens is not None:
+            self.tokens_before += self.count_tokens(page)
+            self.tokens_after += self.count_tokens(cleaned)
+        return cleaned
+
+    def stats(self) -> dict:
+        saved = self.tokens_before - self.tokens_after
+        return {
+            "removed_lines": self.removed_lines,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": saved,
+            "saved_ratio": round(saved / self.tokens_before, 3) if self.tokens_before else 0.0,
+        }
@@ -1,75 +1,351 @@
-from typing import List
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Union
 from uuid import UUID
-from app.models.models import ItemDto, ItemChunkDto, TaskStatus
+from app.models.models import ItemDto, ItemChunkDto
 from app.services.llm.llm import OpenAILlmService
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LTTextContainer
 
 from app.services.mongo_db import MongoDBService
+from app.services.progress_reporter import ProgressReporter
+from app.services.processing.boilerplate import BoilerplateFilter
+from app.services.processing.extraction_cache import ExtractionMetadata, create_extraction_cache, file_sha256
+from app.services.processing.item_merger import ItemMerger
+from app.services.processing.pdf_extraction import (
+    choose_extraction_mode,
+    count_pdf_pages,
+    iter_pages,
+    iter_pages_parallel,
+    sample_page_numbers,
+)
+from app.services.processing.windowing import (
+    PageCountWindowBuilder,
+    PageWindow,
+    SegmentWindowBuilder,
+    TokenBudgetWindowBuilder,
+    WindowBuilder,
+    build_windows,
+)
+from app.envirnoment import config
+from app.utils.token_utils import count_tokens
 
 import logging
 logger = logging.getLogger(__name__)
 
+
 class DataProcessingService:
     def __init__(self):
         self.llm_service = OpenAILlmService()
         self.mongoDbService = MongoDBService()
+        self.window_size = int(config.get("PAGE_WINDOW_SIZE", 10))
+        self.window_overlap = int(config.get("PAGE_WINDOW_OVERLAP", 1))
+        # "tokens" packs pages up to a token budget, "pages" uses a fixed page count
+        self.window_mode = config.get("PAGE_WINDOW_MODE", "tokens").lower()
+        self.window_token_budget = int(config.get("WINDOW_TOKEN_BUDGET", 6000))
+        # Output tokens the parser produces per input token, used to keep room for the answer
+        self.expected_output_ratio = float(config.get("EXPECTED_OUTPUT_RATIO", 0.7))
+        self.presegment_positions = config.get("PRESEGMENT_POSITIONS", "true").lower() == "true"
+        self.extraction_workers = int(config.get("PDF_EXTRACTION_WORKERS", 1))
+        # Below this page count the process pool start up costs more than it saves
+        self.parallel_extraction_min_pages = int(config.get("PDF_PARALLEL_MIN_PAGES", 20))
+        self.extraction_cache = create_extraction_cache()
+        # "layout", "fast" or "auto", see pdf_extraction.EXTRACTION_MODES
+        self.extraction_mode = config.get("PDF_EXTRACTION_MODE", "auto").lower()
+        self.extraction_sample_pages = int(config.get("PDF_EXTRACTION_SAMPLE_PAGES", 3))
+        self.fast_extraction_min_similarity = float(config.get("PDF_FAST_MIN_SIMILARITY", 0.97))
+        # Modes chosen for the boilerplate sample, taken over by the extraction of the same file
+        self._resolved_modes: Dict[str, str] = {}
+        # Rebuild position table rows from the text positions, one position per line
+        self.table_extraction = config.get("PDF_TABLE_EXTRACTION", "true").lower() == "true"
+        self.remove_boilerplate = config.get("BOILERPLATE_REMOVAL", "true").lower() == "true"
+        # Pages the boilerplate filter is fitted on before the first page is released to the parser
+        self.boilerplate_sample_pages = int(config.get("BOILERPLATE_SAMPLE_PAGES", 8))
+        # Windows waiting for the parser before extraction is held back, in the memory bounded mode
+        self.max_pending_windows = int(
+            config.get("MAX_PENDING_WINDOWS", 2 * self.llm_service.max_concurrency)
+        )
     
     def extract_pages_as_text(self, pdf_path: str):
-        pages = []
-        for page_layout in extract_pages(pdf_path):
-            lines = []
-            for element in page_layout:
-                if isinstance(element, LTTextContainer):
-                    lines.append(element.get_text())
-            pages.append("\n".join(lines))
-        return pages
-
-    def get_page_windows(self, pages, window_size=2):
+        return list(self.iter_pages(pdf_path))
+
+    def iter_pages(self, pdf_path: str) -> Iterator[str]:
         """
-        Yields joined page text in overlapping windows, with page headers.
-        For example: [Page 1 + Page 2], [Page 2 + Page 3], ...
+        Extract the pages in order.
+
+        Documents are looked up in the extraction cache by the SHA-256 of
+        their bytes, so a re-uploaded PDF skips pdfminer entirely. On a miss
+        the pages are written to the cache while they are yielded.
         """
-        for i in range(len(pages) - window_size + 1):
-            chunk = ""
-            for j in range(window_size):
-                page_num = i + j + 1
-                chunk += f"\n\n### PAGE {page_num}\n{pages[i + j]}"
-            yield (i, chunk)
-
-    async def process_data(self, pages, collection_id, task_id):
-        parsed_items: List[ItemChunkDto] = []
-        
-        for i, page_window in self.get_page_windows(pages, window_size=10):
-            print(f"🧠 Parsing pages {i+1}-{i+2} / {len(pages)}")
-            if task_id:
-                self.mongoDbService.update_task_status(
-                    task_id=UUID(task_id),
-                    status=TaskStatus.in_progress,
-                    description=f"Parsing pages {i+1}-{i+2} / {len(pages)}",
-                )
-                response: List[ItemChunkDto] = await self.llm_service.parse_page_with_llm(
-                    page_window,
-                )
+        if self.extraction_cache is None:
+            yield from self._extract_pages(pdf_path, self._take_resolved_mode(pdf_path))
+            return
+
+        pdf_sha256 = file_sha256(pdf_path)
+        metadata = self._get_cached_metadata(pdf_sha256)
+        if metadata is not None:
+            self._resolved_modes.pop(pdf_path, None)
+            logger.info(f"Extraction cache hit for {pdf_path}, {metadata.page_count} pages")
+            yield from self.extraction_cache.iter_pages(pdf_sha256)
+            return
+        mode = self._take_resolved_mode(pdf_path)
+        yield from self.extraction_cache.store(
+            pdf_sha256, self._extract_pages(pdf_path, mode), mode, self.table_extraction
+        )
+
+    def _get_cached_metadata(self, pdf_sha256: str) -> Optional[ExtractionMetadata]:
+        """Metadata of a cached extraction that matches the configured mode and table setting"""
+        metadata = self.extraction_cache.get_metadata(pdf_sha256)
+        if (
+            metadata is not None
+            and self.extraction_mode in ("auto", metadata.extraction_mode)
+            and metadata.tables == self.table_extraction
+        ):
+            return metadata
+        return None
+
+    def _take_resolved_mode(self, pdf_path: str) -> str:
+        """The mode already chosen for the boilerplate sample, else resolve it now"""
+        return self._resolved_modes.pop(pdf_path, None) or self.resolve_extraction_mode(pdf_path)
+
+    def resolve_extraction_mode(self, pdf_path: str) -> str:
+        if self.extraction_mode != "auto":
+            return self.extraction_mode
+        return choose_extraction_mode(
+            pdf_path,
+            sample_pages=self.extraction_sample_pages,
+            min_similarity=self.fast_extraction_min_similarity,
+            tables=self.table_extraction,
+        )
+
+    def _extract_pages(self, pdf_path: str, mode: str) -> Iterator[str]:
+        """Extract the pages in order, over a process pool for large documents when configured"""
+        if self.extraction_workers > 1 and count_pdf_pages(pdf_path) >= self.parallel_extraction_min_pages:
+            yielded = 0
+            try:
+                for page in iter_pages_parallel(
+                    pdf_path, workers=self.extraction_workers, mode=mode, tables=self.table_extraction
+                ):
+                    yielded += 1
+                    yield page
+                return
+            except AssertionError as e:
+                if yielded:
+                    raise
+                # multiprocessing refuses children of daemonic processes, e.g. without billiard in a celery worker
+                logger.error(f"Parallel PDF extraction unavailable, extracting sequentially: {e}")
+
+        yield from iter_pages(pdf_path, mode=mode, tables=self.table_extraction)
+
+    def extract_boilerplate_sample(self, pdf_path: str) -> Optional[List[str]]:
+        """
+        Pages spread over the document to fit the boilerplate filter on before
+        the pages are streamed, the first pages are mostly cover and preamble
+        pages with a different header and footer than the body
+        """
+        if not self.remove_boilerplate:
+            return None
+        if self.extraction_cache is not None:
+            pdf_sha256 = file_sha256(pdf_path)
+            metadata = self._get_cached_metadata(pdf_sha256)
+            if metadata is not None:
+                # The pages will come from the cache as well, pdfminer is not needed
+                page_numbers = set(sample_page_numbers(metadata.page_count, self.boilerplate_sample_pages))
+                return [
+                    page
+                    for index, page in enumerate(self.extraction_cache.iter_pages(pdf_sha256))
+                    if index in page_numbers
+                ]
+
+        # Sample in the mode the pages are extracted in, iter_pages takes the resolved mode over
+        mode = self.resolve_extraction_mode(pdf_path)
+        self._resolved_modes[pdf_path] = mode
+        page_numbers = sample_page_numbers(count_pdf_pages(pdf_path), self.boilerplate_sample_pages)
+        return list(iter_pages(pdf_path, mode=mode, page_numbers=page_numbers, tables=self.table_extraction))
+
+    async def iter_pages_async(self, pdf_path: str) -> AsyncIterator[str]:
+        """
+        Extract the pages as an async generator.
+
+        pdfminer is CPU bound and synchronous, every page is pulled in a worker
+        thread so the event loop keeps serving the LLM calls in the meantime.
+        """
+        pages = self.iter_pages(pdf_path)
+        done = object()
+        while True:
+            page = await asyncio.to_thread(next, pages, done)
+            if page is done:
+                break
+            yield page
+
+    def get_input_token_budget(self) -> int:
+        """Input budget per window that leaves room for the expected output within max_tokens"""
+        output_bound = int(self.llm_service.max_output_tokens / self.expected_output_ratio)
+        return min(self.window_token_budget, output_bound)
+
+    def create_window_builder(self, first_page: int = 0) -> WindowBuilder:
+        """Window builder for the configured window mode, see app.services.processing.windowing"""
+        if self.window_mode == "pages":
+            stride = max(1, self.window_size - self.window_overlap)
+            builder = PageCountWindowBuilder(window_size=self.window_size, stride=stride, first_page=first_page)
+        else:
+            builder = TokenBudgetWindowBuilder(
+                token_budget=self.get_input_token_budget(),
+                count_tokens=self._count_tokens,
+                overlap=self.window_overlap,
+            )
+        if self.presegment_positions:
+            builder = SegmentWindowBuilder(
+                token_budget=self.get_input_token_budget(),
+                count_tokens=self._count_tokens,
+                fallback=builder,
+            )
+        return builder
+
+    def create_boilerplate_filter(self) -> Optional[BoilerplateFilter]:
+        if not self.remove_boilerplate:
+            return None
+        return BoilerplateFilter(sample_pages=self.boilerplate_sample_pages, count_tokens=self._count_tokens)
+
+    def get_windows(self, pages: List[str]) -> List[PageWindow]:
+        return build_windows(self.create_window_builder(), pages)
+
+    def _count_tokens(self, text: str) -> int:
+        return count_tokens(text, self.llm_service.model)
+
+    async def parse_window(self, window: PageWindow, semaphore: asyncio.Semaphore) -> List[ItemChunkDto]:
+        """
+        Parse a single page window, waiting for a free slot of the semaphore first.
+        Failed windows are logged and yield no items so the other windows still finish.
+        """
+        async with semaphore:
+            print(f"🧠 Parsing pages {window.start + 1}-{window.end}")
             try:
-                parsed_items.extend(response)
+                return await self.llm_service.parse_page_with_llm(window.text)
             except Exception as e:
-                print(f"❌ Failed at pages {i+1}-{i+2}: {e}")
-
-        seen = {}
-        final_items = []
-        logger.info(f"Parsed {len(parsed_items)} items")
-        for item in parsed_items:
-            ref = item.ref_no.strip()
-            desc = item.description.strip()
-
-            if ref not in seen:
-                seen[ref] = item
-                final_items.append(item)
+                print(f"❌ Failed at pages {window.start + 1}-{window.end}: {e}")
+                return []
+
+    async def process_data(
+        self,
+        pages: Union[List[str], AsyncIterator[str]],
+        collection_id,
+        task_id,
+        file_id: Optional[UUID] = None,
+        first_page: int = 0,
+        boilerplate_sample: Optional[List[str]] = None,
+        keep_items: bool = True,
+    ):
+        """
+        Parse the page windows concurrently and merge the items by ref_no.
+
+        `pages` is a list of page texts or an async iterator such as
+        iter_pages_async. Every window is dispatched to the parser as soon as
+        the window builder has its pages, so parsing overlaps with extraction.
+        Windows are merged strictly in page order by the ItemMerger as soon as
+        all earlier windows are done. When a `file_id` is given, the merged
+        items of every window are upserted into the parsed items collection
+        right away, so partial results survive a failing task.
+
+        `first_page` is the 0-based index of the first given page, for parsing a
+        part of a document. The boilerplate filter is fitted on pages spread
+        over `boilerplate_sample` (the pages of the whole document or a sample
+        from extract_boilerplate_sample), or over `pages` when it is a list.
+        Without either it is fitted on the first pages of the stream.
+
+        With `keep_items=False` the call runs in bounded memory: at most
+        `max_pending_windows` windows wait for the parser before extraction is
+        held back, and positions are dropped from memory once they are persisted
+        and no later window can reach them. The items are then only in the
+        parsed items collection (a `file_id` is required) and [] is returned.
+        """
+        if not keep_items and not file_id:
+            raise ValueError("process_data needs a file_id to run without keeping the items")
+        builder = self.create_window_builder(first_page=first_page)
+        boilerplate_filter = self.create_boilerplate_filter()
+        if boilerplate_sample is None and isinstance(pages, list):
+            boilerplate_sample = pages
+        if boilerplate_filter is not None and boilerplate_sample is not None:
+            boilerplate_filter.fit(
+                [boilerplate_sample[i] for i in sample_page_numbers(len(boilerplate_sample), self.boilerplate_sample_pages)]
+            )
+        semaphore = asyncio.Semaphore(self.llm_service.max_concurrency)
+        merger = ItemMerger()
+        windows: List[PageWindow] = []
+        tasks: List[asyncio.Future] = []
+        next_index = 0
+        parsed_count = 0
+        page_count = first_page
+        progress = ProgressReporter(self.mongoDbService, task_id)
+
+        def dispatch(new_windows: List[PageWindow]):
+            for window in new_windows:
+                windows.append(window)
+                tasks.append(asyncio.ensure_future(self.parse_window(window, semaphore)))
+
+        def feed(page_index: int, page: str):
+            if boilerplate_filter is None:
+                dispatch(builder.feed(page_index, page))
+                return
+            for index, cleaned in boilerplate_filter.feed(page_index, page):
+                dispatch(builder.feed(index, cleaned))
+
+        def flush():
+            if boilerplate_filter is not None:
+                for index, cleaned in boilerplate_filter.flush():
+                    dispatch(builder.feed(index, cleaned))
+            dispatch(builder.flush())
+
+        async def merge_ready(wait: bool, keep: int = 0):
+            # Merge in page order, the description merge relies on it. The newest `keep` windows are left pending.
+            nonlocal next_index, parsed_count
+            while next_index < len(tasks) - keep and (wait or tasks[next_index].done()):
+                window = windows[next_index]
+                items = await tasks[next_index]
+                tasks[next_index] = None
+                windows[next_index] = None
+                parsed_count += len(items)
+                touched = merger.add(
+                    items, pages=range(window.start + 1, window.end + 1), item_pages=window.item_pages
+                )
+                if file_id and touched:
+                    self.mongoDbService.upsert_parsed_items(
+                        file_id=file_id,
+                        items=[merger.get(ref) for ref in touched],
+                        orders=[merger.order(ref) for ref in touched],
+                    )
+                if not keep_items:
+                    # Later windows start at or after this one
+                    merger.evict_before(window.start + 1)
+                next_index += 1
+                progress.report(
+                    next_index,
+                    len(tasks),
+                    description=f"Parsed pages {window.start + 1}-{window.end} ({next_index} / {len(tasks)} windows)",
+                )
+
+        try:
+            if isinstance(pages, list):
+                for page_index, page in enumerate(pages, start=first_page):
+                    feed(page_index, page)
+                page_count += len(pages)
             else:
-                existing_desc = seen[ref].description
-                if desc not in existing_desc:
-                    merged = f"{existing_desc.strip()} {desc}".strip()
-                    seen[ref].description = merged
+                async for page in pages:
+                    feed(page_count, page)
+                    page_count += 1
+                    await merge_ready(wait=False)
+                    if not keep_items:
+                        await merge_ready(wait=True, keep=self.max_pending_windows)
+            flush()
+            logger.info(f"Split {page_count - first_page} pages into {len(tasks)} windows")
+            if boilerplate_filter is not None:
+                logger.info(f"Boilerplate removal: {boilerplate_filter.stats()}")
+            await merge_ready(wait=True)
+        finally:
+            progress.flush()
+            for task in tasks:
+                if task is not None and not task.done():
+                    task.cancel()
+
+        final_items = merger.items() if keep_items else []
+        logger.info(f"Parsed {parsed_count} items")
         logger.info(f"Final items: {len(final_items)}")
+        logger.info(f"Parse cache stats: {self.llm_service.cache.stats()}")
         return final_items
@@ -0,0 +1,175 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from app.envirnoment import config
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def page_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ExtractionMetadata:
+    pdf_sha256: str
+    page_count: int
+    page_hashes: List[str]
+    created_at: int
+    extraction_mode: str = "layout"
+    tables: bool = False
+
+
+class ExtractionCache:
+    """
+    Local cache of extracted page text, keyed by the SHA-256 of the PDF bytes.
+
+    Every entry is a gzip compressed JSON lines file with one page per line and
+    a small metadata file holding the page count and per page hashes. Entries
+    are written page by page while the extraction runs and only become visible
+    once the document is complete. The modification time of the metadata file
+    is refreshed on every hit and the least recently used entries are evicted
+    once the directory grows above `max_bytes`. Temporary files of writers
+    that died before committing are removed by the eviction once they are
+    older than `max_tmp_age_s`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_tmp_age_s: int = 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_tmp_age_s = max_tmp_age_s
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def _tmp_path(path: str) -> str:
+        # Unique per writer, several processes and threads may store the same PDF at once
+        return f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+
+    def _pages_path(self, pdf_sha256: str) -> str:
+        return os.path.join(self.directory, f"{pdf_sha256}.pages.jsonl.gz")
+
+    def _meta_path(self, pdf_sha256: str) -> str:
+        return os.path.join(self.directory, f"{pdf_sha256}.meta.json")
+
+    def get_metadata(self, pdf_sha256: str) -> Optional[ExtractionMetadata]:
+        try:
+            with open(self._meta_path(pdf_sha256), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not os.path.exists(self._pages_path(pdf_sha256)):
+            return None
+        return ExtractionMetadata(**meta)
+
+    def iter_pages(self, pdf_sha256: str) -> Iterator[str]:
+        """Read the cached pages in order, check `get_metadata` first"""
+        now = time.time_ns()
+        os.utime(self._meta_path(pdf_sha256), ns=(now, now))
+        with gzip.open(self._pages_path(pdf_sha256), "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def store(
+        self,
+        pdf_sha256: str,
+        pages: Iterator[str],
+        extraction_mode: str = "layout",
+        tables: bool = False,
+    ) -> Iterator[str]:
+        """
+        Pass the pages through while writing them to the cache.
+
+        The entry is committed only when the iterator is exhausted, an
+        interrupted extraction leaves no partial entry behind.
+        """
+        pages_path = self._pages_path(pdf_sha256)
+        tmp_path = self._tmp_path(pages_path)
+        page_hashes: List[str] = []
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                for page in pages:
+                    f.write(json.dumps(page, ensure_ascii=False))
+                    f.write("\n")
+                    page_hashes.append(page_hash(page))
+                    yield page
+            os.replace(tmp_path, pages_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        meta = ExtractionMetadata(
+            pdf_sha256=pdf_sha256,
+            page_count=len(page_hashes),
+            page_hashes=page_hashes,
+            created_at=int(time.time() * 1000),
+            extraction_mode=extraction_mode,
+            tables=tables,
+        )
+        meta_path = self._meta_path(pdf_sha256)
+        meta_tmp_path = self._tmp_path(meta_path)
+        try:
+            with open(meta_tmp_path, "w", encoding="utf-8") as f:
+                json.dump(meta.__dict__, f)
+            os.replace(meta_tmp_path, meta_path)
+        finally:
+            if os.path.exists(meta_tmp_path):
+                os.remove(meta_tmp_path)
+        logger.info(f"Cached extraction of {meta.page_count} pages for {pdf_sha256}")
+        self._evict()
+
+    def _evict(self):
+        """Drop stale temporary files and least recently used entries until the cache fits into `max_bytes`"""
+        entries = {}
+        total = 0
+        stale_before = time.time() - self.max_tmp_age_s
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                # Running writers keep theirs, a file this old was left by a killed worker
+                try:
+                    if entry.stat().st_mtime < stale_before:
+                        os.remove(entry.path)
+                        logger.info(f"Removed stale temporary file {entry.name}")
+                except FileNotFoundError:
+                    pass
+                continue
+            key = entry.name.split(".", 1)[0]
+            size = entry.stat().st_size
+            total += size
+            last_used, entry_size = entries.get(key, (0, 0))
+            if entry.name.endswith(".meta.json"):
+                last_used = entry.stat().st_mtime_ns
+            entries[key] = (last_used, entry_size + size)
+
+        for key, (_, size) in sorted(entries.items(), key=lambda e: e[1][0]):
+            if total <= self.max_bytes:
+                break
+            for path in (self._pages_path(key), self._meta_path(key)):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+            logger.info(f"Evicted cached extraction {key}")
+
+
+def create_extraction_cache() -> Optional[ExtractionCache]:
+    if config.get("EXTRACTION_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    return ExtractionCache(
+        directory=config.get("EXTRACTION_CACHE_DIR", "/tmp/specwise_extraction_cache"),
+        max_bytes=int(config.get("EXTRACTION_CACHE_MAX_MB", 500)) * 1024 * 1024,
+        max_tmp_age_s=int(config.get("EXTRACTION_CACHE_TMP_MAX_AGE_S", 3600)),
+    )
@@ -0,0 +1,168 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from app.models.models import ItemChunkDto
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Collapse whitespace runs to single spaces and strip, like `" ".join(text.split())`.
+
+    Text that is already normalized is returned as is: every whitespace
+    character but the plain space is non-printable, so a printable text
+    without double, leading or trailing spaces has nothing to collapse.
+    """
+    if text.isprintable() and "  " not in text and text[:1] != " " and text[-1:] != " ":
+        return text
+    return " ".join(text.split())
+
+
+def suffix_prefix_overlap(left: str, right: str, min_overlap: int = 1) -> int:
+    """
+    Length of the longest suffix of `left` that is also a prefix of `right`.
+
+    Only overlaps of at least `min_overlap` characters are found. Candidate
+    starts are located with `str.find` on the first `min_overlap` characters
+    of `right` and verified with `startswith`, the earliest candidate is the
+    longest overlap.
+    """
+    if not left or not right or min_overlap > len(right):
+        return 0
+    tail = left[-len(right):]
+    probe = right[:min_overlap]
+    start = tail.find(probe)
+    while start != -1:
+        if right.startswith(tail[start:]):
+            return len(tail) - start
+        start = tail.find(probe, start + 1)
+    return 0
+
+
+@dataclass
+class _MergeState:
+    item: ItemChunkDto
+    order: int
+    pieces: List[str] = field(default_factory=list)
+    # Normalized fragment each piece was cut from
+    piece_fragments: List[str] = field(default_factory=list)
+    fragments: Set[str] = field(default_factory=set)
+    pages: Set[int] = field(default_factory=set)
+    # Description of the last item as parsed, windows that overlap repeat it verbatim
+    last_raw: str = ""
+    # The last of piece_fragments, what the next fragment overlaps
+    last_fragment: str = ""
+
+
+class ItemMerger:
+    """
+    Joins the fragments of positions that were parsed in more than one window.
+
+    Fragments are normalized and kept per ref_no. An exact repeat or a fragment
+    contained in the previous one only adds provenance. A fragment that starts
+    with the end of the previous one is appended without the repeated part, as
+    found by a suffix/prefix overlap of at least `min_overlap` characters.
+    Descriptions are joined once when the items are read, never rebuilt per
+    fragment.
+
+    To keep memory bounded on long documents, `evict_before` drops the
+    positions no later window can reach once they are persisted.
+    """
+
+    def __init__(self, min_overlap: int = 12):
+        self.min_overlap = min_overlap
+        self._states: Dict[str, _MergeState] = {}
+        self._evicted: Set[str] = set()
+        self._next_order = 0
+
+    def __len__(self):
+        return len(self._states)
+
+    def add(
+        self,
+        items: Iterable[ItemChunkDto],
+        pages: Iterable[int],
+        item_pages: Optional[Callable[[str], Iterable[int]]] = None,
+    ) -> List[str]:
+        """
+        Merge the items parsed from a window covering `pages` (1-based).
+
+        `item_pages` gives the pages an item actually sits on by its ref_no,
+        e.g. PageWindow.item_pages, otherwise every item is on all `pages`.
+        Returns the ref_nos that were added or whose description changed.
+        """
+        pages = list(pages)
+        touched: Dict[str, None] = {}
+        states = self._states
+        for item in items:
+            ref = item.ref_no.strip()
+            state = states.get(ref)
+            description = item.description
+
+            if state is None:
+                if ref in self._evicted:
+                    # Already persisted and dropped, e.g. repeated in a summary at the end
+                    continue
+                state = _MergeState(item=item, order=self._next_order, last_raw=description)
+                self._next_order += 1
+                states[ref] = state
+                self._append(state, normalize_whitespace(description))
+                touched[ref] = None
+            elif description != state.last_raw:
+                # Verbatim repeats of the last fragment only add provenance, without normalizing them again
+                state.last_raw = description
+                if self._merge_fragment(state, normalize_whitespace(description)):
+                    touched[ref] = None
+
+            if not state.item.quantity and item.quantity:
+                state.item.quantity = item.quantity
+                state.item.unit = item.unit
+            state.pages.update(pages if item_pages is None else item_pages(ref))
+        return list(touched)
+
+    def _merge_fragment(self, state: _MergeState, fragment: str) -> bool:
+        if not fragment or fragment in state.fragments or fragment in state.last_fragment:
+            return False
+
+        last_fragment = state.last_fragment
+        if last_fragment and last_fragment in fragment:
+            # The new window saw a longer version of the same text, replace it.
+            # The overlap is then taken against the fragment before the replaced one.
+            state.fragments.discard(last_fragment)
+            state.pieces.pop()
+            state.piece_fragments.pop()
+            state.last_fragment = state.piece_fragments[-1] if state.piece_fragments else ""
+
+        self._append(state, fragment)
+        return True
+
+    def _append(self, state: _MergeState, fragment: str):
+        if state.pieces:
+            overlap = suffix_prefix_overlap(state.last_fragment, fragment, self.min_overlap)
+            state.pieces.append(fragment[overlap:] if overlap else f" {fragment}")
+        else:
+            state.pieces.append(fragment)
+        state.piece_fragments.append(fragment)
+        state.fragments.add(fragment)
+        state.last_fragment = fragment
+
+    def get(self, ref_no: str) -> ItemChunkDto:
+        state = self._states[ref_no]
+        state.item.description = "".join(state.pieces).strip()
+        state.item.source_pages = sorted(state.pages)
+        return state.item
+
+    def order(self, ref_no: str) -> int:
+        """Position of the ref_no in the order the positions were first seen"""
+        return self._states[ref_no].order
+
+    def evict_before(self, page: int) -> int:
+        """Drop the positions that lie entirely before `page` (1-based), returns how many"""
+        evicted = [ref for ref, state in self._states.items() if max(state.pages, default=page) < page]
+        for ref in evicted:
+            del self._states[ref]
+            self._evicted.add(ref)
+        return len(evicted)
+
+    def items(self) -> List[ItemChunkDto]:
+        """All merged items in the order their ref_no was first seen"""
+        return [self.get(ref) for ref in self._states]
@@ -0,0 +1,192 @@
+import difflib
+import logging
+import multiprocessing
+from typing import Iterator, List, Optional, Tuple
+
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LAParams, LTTextContainer
+from pdfminer.pdfpage import PDFPage
+
+from app.services.processing.segmenter import segment_positions
+from app.services.processing.table_extraction import page_layout_to_table_text
+
+logger = logging.getLogger(__name__)
+
+# "layout" runs the full pdfminer layout analysis, "fast" skips the grouping of
+# text boxes into a reading order, "auto" picks fast when a sample shows no difference
+EXTRACTION_MODES = ("layout", "fast", "auto")
+
+
+def layout_params(mode: str) -> LAParams:
+    if mode == "fast":
+        # boxes_flow=None drops the hierarchical text box grouping, the most
+        # expensive step of the analysis. Boxes are then ordered top to bottom,
+        # left to right, which is the natural order of born-digital LV exports.
+        return LAParams(boxes_flow=None, detect_vertical=False, all_texts=False)
+    return LAParams()
+
+
+def page_layout_to_text(page_layout) -> str:
+    """Join the text containers of a laid out page, everything else (figures, curves) is skipped"""
+    lines = []
+    for element in page_layout:
+        if isinstance(element, LTTextContainer):
+            lines.append(element.get_text())
+    return "\n".join(lines)
+
+
+def extract_page_range(pdf_path: str, page_numbers: List[int], mode: str = "layout", tables: bool = False) -> List[str]:
+    """Extract the given 0-based pages of a PDF, runs inside the worker processes"""
+    render = page_layout_to_table_text if tables else page_layout_to_text
+    return [
+        render(page_layout)
+        for page_layout in extract_pages(pdf_path, page_numbers=page_numbers, laparams=layout_params(mode))
+    ]
+
+
+def _extract_page_range(task: Tuple[str, List[int], str, bool]) -> List[str]:
+    return extract_page_range(*task)
+
+
+def pool_context():
+    """
+    Process context of the extraction pool.
+
+    The prefork pool of the celery worker runs tasks in daemonic processes,
+    which multiprocessing does not let start children. billiard, the
+    multiprocessing fork celery ships with, does, so it is used when it is
+    installed. Workers are spawned and not forked: the calling process runs
+    threads (asyncio.to_thread workers, the RSS sampler, pymongo monitors)
+    whose locks a forked child would inherit in any state.
+    """
+    try:
+        import billiard
+    except ImportError:
+        return multiprocessing.get_context("spawn")
+    return billiard.get_context("spawn")
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    with open(pdf_path, "rb") as fp:
+        return sum(1 for _ in PDFPage.get_pages(fp))
+
+
+def split_page_ranges(page_count: int, chunks: int) -> List[List[int]]:
+    """Split 0..page_count-1 into at most `chunks` contiguous, evenly sized ranges"""
+    chunks = max(1, min(chunks, page_count))
+    size, remainder = divmod(page_count, chunks)
+    ranges = []
+    start = 0
+    for index in range(chunks):
+        end = start + size + (1 if index < remainder else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def iter_pages(
+    pdf_path: str,
+    mode: str = "layout",
+    page_numbers: Optional[List[int]] = None,
+    tables: bool = False,
+) -> Iterator[str]:
+    """
+    Extract the pages one by one in the current process.
+
+    With `tables` the rows and columns of position tables are rebuilt from the
+    text line positions, see table_extraction.
+    """
+    render = page_layout_to_table_text if tables else page_layout_to_text
+    for page_layout in extract_pages(pdf_path, page_numbers=page_numbers, laparams=layout_params(mode)):
+        yield render(page_layout)
+
+
+def extraction_similarity(reference: List[str], candidate: List[str]) -> float:
+    """Similarity of the word sequences of two extractions, 1.0 means the same words in the same order"""
+    reference_words = " ".join(reference).split()
+    candidate_words = " ".join(candidate).split()
+    if not reference_words and not candidate_words:
+        return 1.0
+    return difflib.SequenceMatcher(None, reference_words, candidate_words, autojunk=False).ratio()
+
+
+def position_signature(pages: List[str]) -> List[tuple]:
+    """The (ref_no, has_quantity) sequence the segmenter finds, what the parser depends on"""
+    return [(segment.ref_no, segment.has_quantity) for segment in segment_positions(pages)]
+
+
+def sample_page_numbers(page_count: int, sample_pages: int) -> List[int]:
+    """
+    0-based pages spread evenly over the document, the cover page only when
+    the document has no more pages than the sample
+    """
+    if page_count <= sample_pages:
+        return list(range(page_count))
+    return sorted({(index + 1) * page_count // (sample_pages + 1) for index in range(sample_pages)})
+
+
+def choose_extraction_mode(
+    pdf_path: str,
+    sample_pages: int = 3,
+    min_similarity: float = 0.97,
+    tables: bool = False,
+) -> str:
+    """
+    Pick the fast mode when it is equivalent to the full layout analysis on a
+    sample of pages spread over the document: the same non-empty sequence of
+    positions with quantities and a word sequence at least `min_similarity`
+    alike. Both modes are rendered as the extraction will be, with `tables`
+    rebuilding the table rows. A sample without positions, e.g. cover and
+    preamble pages only, proves nothing and keeps the layout mode.
+    """
+    page_numbers = sample_page_numbers(count_pdf_pages(pdf_path), sample_pages)
+    reference = list(iter_pages(pdf_path, mode="layout", page_numbers=page_numbers, tables=tables))
+    candidate = list(iter_pages(pdf_path, mode="fast", page_numbers=page_numbers, tables=tables))
+    similarity = extraction_similarity(reference, candidate)
+    signature = position_signature(reference)
+    has_positions = any(has_quantity for _, has_quantity in signature)
+    same_positions = signature == position_signature(candidate)
+    mode = "fast" if has_positions and same_positions and similarity >= min_similarity else "layout"
+    logger.info(
+        f"Extraction sample of pages {[number + 1 for number in page_numbers]}: similarity {similarity:.3f}, "
+        f"{len(signature)} positions, same positions: {same_positions}, using {mode} mode"
+    )
+    return mode
+
+
+def iter_pages_parallel(
+    pdf_path: str,
+    workers: int,
+    chunks_per_worker: int = 4,
+    mode: str = "layout",
+    tables: bool = False,
+) -> Iterator[str]:
+    """
+    Extract all pages with layout analysis spread over a process pool.
+
+    The document is split into contiguous page ranges, a few per worker so a
+    slow range does not hold up the others. Pages are yielded in page order as
+    soon as their range and all earlier ranges are done.
+    """
+    page_count = count_pdf_pages(pdf_path)
+    ranges = split_page_ranges(page_count, workers * chunks_per_worker)
+    logger.info(f"Extracting {page_count} pages in {len(ranges)} ranges with {workers} processes")
+
+    pool = pool_context().Pool(processes=workers)
+    try:
+        for range_pages in pool.imap(_extract_page_range, [(pdf_path, pages, mode, tables) for pages in ranges]):
+            yield from range_pages
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def extract_pages_parallel(
+    pdf_path: str,
+    workers: int,
+    chunks_per_worker: int = 4,
+    mode: str = "layout",
+    tables: bool = False,
+) -> List[str]:
+    return list(iter_pages_parallel(pdf_path, workers, chunks_per_worker, mode, tables))
@@ -1,15 +1,23 @@
 import logging
 import os
-from typing import List
+from typing import List, Optional
 import uuid
 from app.services.processing.data_processing import DataProcessingService
 
 from app.services.processing.data_processing import DataProcessingService
+from app.services.processing.extraction_cache import page_hash
+from app.services.processing.pdf_extraction import count_pdf_pages
+from app.services.processing.reference_resolver import resolve_reference_stream, resolve_references
+from app.services.processing.revision import as_chunk, document_order, plan_revision, record_page_hashes
 from app.services.processing.vectore_client import VectoreDatabaseClient
 from app.constants import PROCESSING_FILE_PATH
+from app.envirnoment import config
 from app.models.models import FileModel, ItemDto, TaskStatus
 from app.services.llm.llm import OpenAILlmService
 from app.services.mongo_db import MongoDBService
+from app.services.progress_reporter import ProgressReporter
+from app.utils.memory_utils import RssSampler, peak_rss_bytes
+from app.utils.xml_utils import iter_items_xml
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +31,13 @@ class Pipelines:
         self.mongoDbService = MongoDBService()
         self.data_processing_service = DataProcessingService()
         self.vectorize = vectorize
+        self.streaming_persistence = config.get("STREAMING_PERSISTENCE", "true").lower() == "true"
+        # "auto" switches to the memory bounded mode from MEMORY_BOUNDED_MIN_PAGES pages on
+        self.memory_bounded_mode = config.get("MEMORY_BOUNDED_MODE", "auto").lower()
+        self.memory_bounded_min_pages = int(config.get("MEMORY_BOUNDED_MIN_PAGES", 300))
+        self.parsed_items_batch_size = int(config.get("PARSED_ITEMS_BATCH_SIZE", 200))
+        # Unchanged pages next to a changed page of a revision that are parsed again
+        self.revision_neighbour_pages = int(config.get("REVISION_NEIGHBOUR_PAGES", 1))
 
     async def process_data_from_file(
         self,
@@ -30,6 +45,7 @@ class Pipelines:
         collection_id: str,
         filename: str,
         task_id: str,
+        previous_file_id: Optional[str] = None,
     ):
         """
         Process data from an uploaded file and store it in the associated collection.
@@ -48,6 +64,9 @@ class Pipelines:
             The name of the file that needs to be processed.
         task_id : str
             A unique identifier for tracking this specific processing task.
+        previous_file_id : str, optional
+            The ID of a previous revision of the same document. Only the pages
+            that changed since then are parsed, the other items are reused.
 
         Returns:
         --------
@@ -60,6 +79,7 @@ class Pipelines:
             Any exception that occurs during processing is logged and re-raised.
         """
         
+        rss_sampler = RssSampler().start()
         try:
             file_path = f"{PROCESSING_FILE_PATH}/{filename}"
             logger.info(f"Starting data processing for file: {file_path}")
@@ -70,27 +90,116 @@ class Pipelines:
             )
             logger.info(f"Task {task_id} marked as in progress")
 
-            pages = self.data_processing_service.extract_pages_as_text(file_path)
-            if self.vectorize:
-                self.vector_db_service.create_collection(
-                    collection_id=collection_id,
-                    items=pages,
-                )
-
-            parsed_items = await self.data_processing_service.process_data(pages, collection_id=collection_id, task_id=task_id)
-
-            items_dto: List[ItemDto] = self.llm_service.categorize(parsed_items, task_id)
-
             file = FileModel(
                 id=uuid.uuid4(),
                 filename=filename,
                 filepath=file_path,
                 customer_number=user_id,
                 task_id=task_id,
-                items=items_dto,
+                items=[],
+                previous_file_id=previous_file_id,
             )
-            self.mongoDbService.insert_file(file_model=file)
-            logger.info(f"Inserted file record into MongoDB: {file.id}")
+            previous_file = self.get_previous_revision(previous_file_id, user_id)
+            memory_bounded = (
+                previous_file is None and not self.vectorize and self.use_memory_bounded_mode(file_path)
+            )
+
+            streaming_file_id = None
+            if self.streaming_persistence or memory_bounded:
+                # Store the file right away, items are added while they are processed
+                self.mongoDbService.insert_file(file_model=file)
+                streaming_file_id = file.id
+                logger.info(f"Inserted file record into MongoDB: {file.id}")
+
+            page_hashes: List[str] = []
+            reused_items: List[ItemDto] = []
+            if memory_bounded:
+                # Pages, windows and items stream through, the items only live in MongoDB
+                pages = record_page_hashes(self.data_processing_service.iter_pages_async(file_path), page_hashes)
+                await self.data_processing_service.process_data(
+                    pages,
+                    collection_id=collection_id,
+                    task_id=task_id,
+                    file_id=file.id,
+                    boilerplate_sample=self.data_processing_service.extract_boilerplate_sample(file_path),
+                    keep_items=False,
+                )
+                item_count = self.categorize_stored_items(file_id=file.id, task_id=task_id)
+                self.mongoDbService.update_file_page_hashes(file_id=file.id, page_hashes=page_hashes)
+                logger.info(f"Stored {item_count} categorized items for file {file.id}")
+            elif previous_file is not None:
+                pages = self.data_processing_service.extract_pages_as_text(file_path)
+                page_hashes = [page_hash(page) for page in pages]
+                plan = plan_revision(
+                    previous_file.page_hashes,
+                    page_hashes,
+                    previous_file.items,
+                    neighbours=self.revision_neighbour_pages,
+                )
+                parsed_items = []
+                for start, end in plan.dirty_runs:
+                    parsed_items.extend(
+                        await self.data_processing_service.process_data(
+                            pages[start:end],
+                            collection_id=collection_id,
+                            task_id=task_id,
+                            file_id=streaming_file_id,
+                            first_page=start,
+                            boilerplate_sample=pages,
+                        )
+                    )
+                # A position parsed again replaces the old one
+                parsed_refs = {item.ref_no.strip() for item in parsed_items}
+                reused_items = [item for item in plan.reused_items if item.commission.strip() not in parsed_refs]
+                if streaming_file_id and reused_items:
+                    self.mongoDbService.append_file_items(file_id=streaming_file_id, items=reused_items)
+
+                # Reused items are resolution context only, their text already holds their references
+                chunks = document_order([as_chunk(item) for item in reused_items] + parsed_items)
+                resolve_references(chunks)
+            else:
+                if self.vectorize:
+                    pages = self.data_processing_service.extract_pages_as_text(file_path)
+                    page_hashes = [page_hash(page) for page in pages]
+                    self.vector_db_service.create_collection(
+                        collection_id=collection_id,
+                        items=pages,
+                    )
+                    boilerplate_sample = None
+                else:
+                    # Pages are parsed while the rest of the document is still being extracted
+                    pages = record_page_hashes(self.data_processing_service.iter_pages_async(file_path), page_hashes)
+                    boilerplate_sample = self.data_processing_service.extract_boilerplate_sample(file_path)
+
+                parsed_items = await self.data_processing_service.process_data(
+                    pages,
+                    collection_id=collection_id,
+                    task_id=task_id,
+                    file_id=streaming_file_id,
+                    boilerplate_sample=boilerplate_sample,
+                )
+                parsed_items = resolve_references(parsed_items)
+
+            if not memory_bounded:
+                if streaming_file_id:
+                    referencing = [item for item in parsed_items if item.references_id]
+                    if referencing:
+                        self.mongoDbService.upsert_parsed_items(file_id=streaming_file_id, items=referencing)
+
+                items_dto: List[ItemDto] = self.llm_service.categorize(parsed_items, task_id, file_id=streaming_file_id)
+                logger.info(f"Categorization cache stats: {self.llm_service.cache.stats()}")
+                if reused_items:
+                    items_dto = document_order(reused_items + items_dto)
+
+                if self.streaming_persistence:
+                    # Batches were appended as they finished, store the final document order once
+                    self.mongoDbService.update_file_items(file_id=file.id, items=items_dto)
+                    self.mongoDbService.update_file_page_hashes(file_id=file.id, page_hashes=page_hashes)
+                else:
+                    file.items = items_dto
+                    file.page_hashes = page_hashes
+                    self.mongoDbService.insert_file(file_model=file)
+                    logger.info(f"Inserted file record into MongoDB: {file.id}")
 
             # self.vector_db_repo.store_data(user_id, collection_id, parsed_items)
             logger.info(f"Stored parsed items in vector database under collection {collection_id}")
@@ -119,6 +228,135 @@ class Pipelines:
                 "status": "error",
                 "message": str(e),
             }
+        finally:
+            rss_sampler.stop()
+            self.record_peak_rss(task_id, rss_sampler)
+
+    def finalize_collection(self, collection_id: str) -> dict:
+        """
+        Merge the results of all files of a collection, the fan-in after the file tasks.
+
+        Items are concatenated in upload order, positions of different files are
+        never merged as their ref_nos may repeat across lots. The collection is
+        completed when at least one file was processed, failed files are named
+        in the description.
+        """
+        collection = self.mongoDbService.get_collection_by_id(uuid.UUID(collection_id))
+        tasks = {task.id: task for task in self.mongoDbService.get_tasks_by_collection(collection.id)}
+
+        # The result references the files, their items are not loaded into the worker
+        file_ids: List[uuid.UUID] = []
+        item_count = 0
+        failed_files = []
+        for task_id in collection.task_ids:
+            task = tasks.get(task_id)
+            if task is None or task.status != TaskStatus.completed:
+                failed_files.append(task.file_name if task else str(task_id))
+                continue
+            for file_id in self.mongoDbService.get_file_ids_by_task(task_id):
+                file_ids.append(file_id)
+                item_count += self.mongoDbService.count_file_items(file_id)
+
+        processed = len(collection.task_ids) - len(failed_files)
+        status = TaskStatus.completed if processed else TaskStatus.failed
+        description = f"{processed} / {len(collection.task_ids)} files processed, {item_count} items"
+        if failed_files:
+            description += f", failed: {', '.join(failed_files)}"
+        xml_file_id = None
+        if item_count:
+            # Streamed from the items collection into GridFS item by item
+            items = (item for file_id in file_ids for item in self.mongoDbService.iter_file_items(file_id))
+            xml_file_id = self.mongoDbService.store_collection_xml(collection.id, iter_items_xml(items))
+        self.mongoDbService.update_collection_result(
+            collection_id=collection.id,
+            status=status,
+            file_ids=file_ids,
+            item_count=item_count,
+            xml_file_id=xml_file_id,
+            description=description,
+        )
+        if collection.xml_file_id and collection.xml_file_id != xml_file_id:
+            # XML of an earlier run of this fan-in
+            self.mongoDbService.delete_collection_xml(collection.xml_file_id)
+        logger.info(f"Collection {collection_id} finalized: {description}")
+        return {
+            "status": "success" if processed else "error",
+            "message": description,
+        }
+
+    def use_memory_bounded_mode(self, file_path: str) -> bool:
+        if self.memory_bounded_mode != "auto":
+            return self.memory_bounded_mode == "true"
+        page_count = count_pdf_pages(file_path)
+        if page_count >= self.memory_bounded_min_pages:
+            logger.info(f"{page_count} pages, processing in memory bounded mode")
+            return True
+        return False
+
+    def categorize_stored_items(self, file_id: uuid.UUID, task_id: str) -> int:
+        """
+        Resolve references and categorize the parsed items of a file batch by batch.
+
+        Items are read from the parsed items collection in document order,
+        `parsed_items_batch_size` at a time, and every categorized batch is
+        appended to the file, so memory does not grow with the document.
+        Returns the number of categorized items.
+        """
+        item_count = 0
+        categorized = 0
+        total = self.mongoDbService.count_parsed_items(file_id)
+        # One reporter over all batches, so the rate stays bounded across categorize calls
+        progress = ProgressReporter(self.mongoDbService, task_id)
+        batches = resolve_reference_stream(
+            self.mongoDbService.iter_parsed_items(file_id, batch_size=self.parsed_items_batch_size),
+            lookup=lambda ref_no: self.mongoDbService.get_parsed_item(file_id, ref_no),
+        )
+        for batch in batches:
+            referencing = [item for item in batch if item.references_id]
+            if referencing:
+                self.mongoDbService.upsert_parsed_items(file_id=file_id, items=referencing)
+            items_dto = self.llm_service.categorize(
+                batch, task_id, progress=progress, progress_offset=categorized, progress_total=total
+            )
+            categorized += len(batch)
+            if items_dto:
+                self.mongoDbService.append_file_items(file_id=file_id, items=items_dto)
+            item_count += len(items_dto)
+        progress.flush()
+        logger.info(f"Categorization cache stats: {self.llm_service.cache.stats()}")
+        return item_count
+
+    def record_peak_rss(self, task_id: str, rss_sampler: RssSampler):
+        logger.info(
+            f"Task {task_id} peak RSS {rss_sampler.peak_mb} MB, "
+            f"worker process peak {round(peak_rss_bytes() / (1024 * 1024), 1)} MB"
+        )
+        try:
+            self.mongoDbService.update_task_peak_rss(task_id=uuid.UUID(task_id), peak_rss_mb=rss_sampler.peak_mb)
+        except Exception as e:
+            logger.warning(f"Could not store peak RSS of task {task_id}: {e}")
+
+    def get_previous_revision(self, previous_file_id: Optional[str], user_id: str) -> Optional[FileModel]:
+        """
+        The previous revision to diff against, or None to process the whole document.
+
+        The previous file has to belong to the same customer and carry page hashes,
+        files processed before page hashes were stored cannot be diffed.
+        """
+        if not previous_file_id:
+            return None
+        try:
+            previous_file = self.mongoDbService.get_file_by_id(uuid.UUID(previous_file_id))
+        except Exception as e:
+            logger.warning(f"Previous revision {previous_file_id} not available, processing the whole file: {e}")
+            return None
+        if previous_file.customer_number != user_id:
+            logger.warning(f"Previous revision {previous_file_id} belongs to another customer, processing the whole file")
+            return None
+        if not previous_file.page_hashes:
+            logger.info(f"Previous revision {previous_file_id} has no page hashes, processing the whole file")
+            return None
+        return previous_file
 
     def clean_up(self, file_path: str):
         """
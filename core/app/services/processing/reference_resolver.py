@@ -0,0 +1,151 @@
+import logging
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.models.models import ItemChunkDto
+
+logger = logging.getLogger(__name__)
+
+POSITION_REFERENCE_PATTERN = re.compile(
+    r"\b(?:wie|siehe|entspricht|analog(?:\s+zu)?)\s+pos(?:ition)?\.?\s*(?:nr\.?\s*)?(\d+(?:\.\d+)*)",
+    re.IGNORECASE,
+)
+# "wie Vorposition" and "wie vorbeschrieben" anywhere. A bare "wie vor" only at the start of
+# a line, before ", jedoch" or at the end of a line, so "Maße wie vor Ort aufgenommen" is no reference
+PREVIOUS_POSITION_PATTERN = re.compile(
+    r"\bwie\s+vor(?:position|beschrieben)\b"
+    r"|^\s*wie\s+vor\b(?!\s+ort\b)"
+    r"|\bwie\s+vor\s*,\s*(?:jedoch|aber)\b"
+    r"|\bwie\s+vor\s*[,.;:]?\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+SUPPLEMENT_PATTERN = re.compile(r"\bzulage\b", re.IGNORECASE)
+
+
+def _segments(ref_no: str) -> Tuple[str, ...]:
+    """Split a ref_no into normalized segments, "01.010" and "1.10" are the same position"""
+    return tuple(part.lstrip("0") or "0" for part in ref_no.strip().strip(".").split("."))
+
+
+class ReferenceResolver:
+    """
+    Resolves "wie Pos. X" and "wie Vorposition" references between positions in linear time.
+
+    Items are scanned in document order while an index of the positions seen so
+    far is kept up to date, keyed both by the full ref_no and by every ref_no
+    suffix within its parent group. A short reference such as "wie Pos. 10" is
+    therefore looked up as the closest preceding position ending in `.10`
+    within the same parent group first, then in the groups above it, then as
+    a full ref_no and last anywhere in the document.
+    Supplements ("Zulage") never get a reference. A resolver holds the index of
+    one document, use a new one per document.
+    """
+
+    def __init__(self):
+        self.by_ref: Dict[Tuple[str, ...], int] = {}
+        self.by_suffix: Dict[Tuple[str, ...], int] = {}
+        self.by_parent_suffix: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], int] = {}
+        self.count = 0
+
+    def resolve(self, entries: Sequence[Tuple[str, str]]) -> List[Optional[int]]:
+        """
+        Find the referenced position for each (ref_no, description) pair.
+
+        Returns, per entry, the index of the referenced entry or None.
+        """
+        return [self.feed(ref_no, description) for ref_no, description in entries]
+
+    def feed(self, ref_no: str, description: str) -> Optional[int]:
+        """Resolve the next position in document order, returns the index of the referenced one or None"""
+        index = self.count
+        segments = _segments(ref_no)
+        reference = self._find(index, segments, description)
+
+        self.by_ref[segments] = index
+        for depth in range(1, len(segments) + 1):
+            suffix = segments[-depth:]
+            self.by_suffix[suffix] = index
+            for parent_depth in range(len(segments) - depth + 1):
+                self.by_parent_suffix[(segments[:parent_depth], suffix)] = index
+        self.count += 1
+        return reference
+
+    def _find(self, index, segments, description) -> Optional[int]:
+        if SUPPLEMENT_PATTERN.search(description):
+            return None
+
+        if PREVIOUS_POSITION_PATTERN.search(description):
+            return index - 1 if index > 0 else None
+
+        found = POSITION_REFERENCE_PATTERN.search(description)
+        if not found:
+            return None
+
+        target = _segments(found.group(1))
+        if target == segments:
+            return None
+
+        # Walk up from the own parent group, the closest group wins
+        parents = segments[:-1]
+        for depth in range(len(parents), 0, -1):
+            match = self.by_parent_suffix.get((parents[:depth], target))
+            if match is not None:
+                return match
+        # A full ref_no, or a top-level position, before any position ending in the target
+        if target in self.by_ref:
+            return self.by_ref[target]
+        return self.by_suffix.get(target)
+
+
+def resolve_references(items: List[ItemChunkDto]) -> List[ItemChunkDto]:
+    """
+    Set `references_id` on items that reference another position and append the
+    referenced description, so categorization sees the full text.
+
+    Items are resolved in document order, so chained references ("wie Pos. 20"
+    where 20 itself is "wie Pos. 10") carry the full description along.
+    """
+    references = ReferenceResolver().resolve([(item.ref_no, item.description) for item in items])
+    resolved = 0
+    for item, reference in zip(items, references):
+        if reference is None:
+            continue
+        referenced = items[reference]
+        item.references_id = referenced.ref_no
+        item.description = f"{item.description.strip()}\n{referenced.description.strip()}"
+        resolved += 1
+    logger.info(f"Resolved {resolved} position references")
+    return items
+
+
+def resolve_reference_stream(
+    batches: Iterable[List[ItemChunkDto]],
+    lookup: Callable[[str], Optional[ItemChunkDto]],
+) -> Iterator[List[ItemChunkDto]]:
+    """
+    Resolve references over batches of items in document order, see resolve_references.
+
+    Only the ref_nos of earlier batches are kept, the description of a
+    referenced position outside the current batch is fetched with `lookup`.
+    The caller has to persist every yielded batch before asking for the next
+    one, so chained references see the resolved description.
+    """
+    resolver = ReferenceResolver()
+    ref_nos: List[str] = []
+    resolved = 0
+    for batch in batches:
+        in_batch: Dict[int, ItemChunkDto] = {}
+        for item in batch:
+            reference = resolver.feed(item.ref_no, item.description)
+            in_batch[len(ref_nos)] = item
+            ref_nos.append(item.ref_no)
+            if reference is None:
+                continue
+            referenced = in_batch.get(reference) or lookup(ref_nos[reference])
+            if referenced is None:
+                continue
+            item.references_id = referenced.ref_no
+            item.description = f"{item.description.strip()}\n{referenced.description.strip()}"
+            resolved += 1
+        yield batch
+    logger.info(f"Resolved {resolved} position references")
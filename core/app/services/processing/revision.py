@@ -0,0 +1,144 @@
+import difflib
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Set, Tuple, TypeVar
+
+from app.models.models import ItemChunkDto, ItemDto
+from app.services.processing.extraction_cache import page_hash
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", ItemDto, ItemChunkDto)
+
+
+@dataclass
+class RevisionPlan:
+    """
+    What to do with a revised document.
+
+    `dirty_runs` are the (start, end) ranges of 0-based new pages that have to
+    be parsed again, `reused_items` the categorized items of the previous
+    revision that are kept, with their `source_pages` moved to the new page
+    numbers.
+    """
+    dirty_runs: List[Tuple[int, int]] = field(default_factory=list)
+    reused_items: List[ItemDto] = field(default_factory=list)
+    page_count: int = 0
+
+    @property
+    def dirty_page_count(self) -> int:
+        return sum(end - start for start, end in self.dirty_runs)
+
+
+def map_unchanged_pages(old_hashes: List[str], new_hashes: List[str]) -> Dict[int, int]:
+    """Map every unchanged new page to its old page (both 0-based) by diffing the page hash sequences"""
+    matcher = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+    page_map: Dict[int, int] = {}
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            for offset in range(new_end - new_start):
+                page_map[new_start + offset] = old_start + offset
+    return page_map
+
+
+def page_runs(pages: Set[int]) -> List[Tuple[int, int]]:
+    """Contiguous (start, end) runs of a set of page indexes"""
+    runs: List[Tuple[int, int]] = []
+    for page in sorted(pages):
+        if runs and runs[-1][1] == page:
+            runs[-1] = (runs[-1][0], page + 1)
+        else:
+            runs.append((page, page + 1))
+    return runs
+
+
+def plan_revision(
+    old_hashes: List[str],
+    new_hashes: List[str],
+    old_items: List[ItemDto],
+    neighbours: int = 1,
+) -> RevisionPlan:
+    """
+    Decide which pages of a revision to parse again and which items to keep.
+
+    Changed and inserted pages are dirty, together with `neighbours` pages on
+    either side for positions running over a page break. An old item that
+    lies on a dirty page in part makes all of its pages dirty, so it is parsed
+    again as a whole, as does one that lost a page. This spreads until no
+    more items are hit, so a chain of items sharing boundary pages is parsed
+    again as a whole. Old items entirely on clean pages are reused. When any old item has no `source_pages` (processed before
+    they were recorded) it cannot be placed, and the whole document is parsed.
+    """
+    page_count = len(new_hashes)
+    page_map = map_unchanged_pages(old_hashes, new_hashes)
+    old_to_new = {old: new for new, old in page_map.items()}
+
+    dirty: Set[int] = set()
+    if any(not item.source_pages for item in old_items):
+        # Items that cannot be placed would be lost, parse everything again
+        dirty.update(range(page_count))
+    for page in range(page_count):
+        if page not in page_map:
+            dirty.update(range(max(0, page - neighbours), min(page_count, page + neighbours + 1)))
+
+    # (item, new 0-based page or None for every old page that is gone)
+    placed = [
+        (item, [old_to_new.get(page - 1) for page in item.source_pages])
+        for item in old_items
+        if item.source_pages
+    ]
+    items_on_page: Dict[int, List[int]] = {}
+    for index, (_, new_pages) in enumerate(placed):
+        for page in new_pages:
+            if page is not None:
+                items_on_page.setdefault(page, []).append(index)
+
+    # Spread the dirty pages over the items on them until nothing changes
+    hit = {index for index, (_, new_pages) in enumerate(placed) if None in new_pages or dirty.intersection(new_pages)}
+    queue = list(hit)
+    while queue:
+        for page in placed[queue.pop()][1]:
+            if page is None or page in dirty:
+                continue
+            dirty.add(page)
+            for index in items_on_page.get(page, []):
+                if index not in hit:
+                    hit.add(index)
+                    queue.append(index)
+
+    reused = []
+    for item, new_pages in placed:
+        if None in new_pages or dirty.intersection(new_pages):
+            continue
+        reused.append(item.model_copy(update={"source_pages": [page + 1 for page in new_pages]}))
+
+    plan = RevisionPlan(dirty_runs=page_runs(dirty), reused_items=reused, page_count=page_count)
+    logger.info(
+        f"Revision: {len(page_map)} / {page_count} pages unchanged, "
+        f"{plan.dirty_page_count} pages in {len(plan.dirty_runs)} runs to parse, "
+        f"{len(reused)} / {len(old_items)} items reused"
+    )
+    return plan
+
+
+def as_chunk(item: ItemDto) -> ItemChunkDto:
+    """A reused item as parser output, to give the reference resolution its description"""
+    return ItemChunkDto(
+        ref_no=item.commission,
+        description=item.text,
+        quantity=item.quantity,
+        unit=item.quantityunit,
+        source_pages=item.source_pages,
+    )
+
+
+def document_order(items: List[T]) -> List[T]:
+    """Sort items by their first source page, items without pages go last"""
+    return sorted(items, key=lambda item: min(item.source_pages) if item.source_pages else float("inf"))
+
+
+async def record_page_hashes(pages: AsyncIterator[str], page_hashes: List[str]) -> AsyncIterator[str]:
+    """Pass the pages through and append the hash of every page to `page_hashes`"""
+    async for page in pages:
+        page_hashes.append(page_hash(page))
+        yield page
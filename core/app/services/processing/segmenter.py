@@ -0,0 +1,97 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+UNITS = (
+    "stk|stck|stück|st|h|std|m²|m2|m³|m3|qm|lfm|lfdm|m|cm|mm|kg|t|l|"
+    "psch|pschl|pauschal|pa|satz|paar|wo|mon|stwo|tg"
+)
+
+# Calendar date like "12.03.2024", e.g. at the start of a header or footer line
+DATE_PATTERN = re.compile(r"(?:0?[1-9]|[12]\d|3[01])\.(?:0?[1-9]|1[0-2])\.(?:19|20)\d{2}(?!\d)")
+# Ordnungszahl at the start of a line, e.g. "01.1", "04.01.2", "1.2.35", "01.02.0010".
+# Dates are not ordinals, and the top level has at most 3 digits, so a year never is one.
+ORDINAL_PATTERN = re.compile(
+    rf"^\s*(?!{DATE_PATTERN.pattern})(\d{{1,3}}(?:\.\d{{1,4}}){{1,5}})\.?(?:\s+|$)"
+)
+QUANTITY_PATTERN = re.compile(
+    rf"(?<![\w.,])\d{{1,3}}(?:\.\d{{3}})*(?:,\d+)?\s*(?:{UNITS})(?![\w])",
+    re.IGNORECASE,
+)
+# A line that starts with a number followed by a unit is a quantity, not an Ordnungszahl
+QUANTITY_LINE_PATTERN = re.compile(
+    rf"^\s*\d{{1,3}}(?:\.\d{{3}})*(?:,\d+)?\s*(?:{UNITS})(?![\w])",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class PositionSegment:
+    """Candidate position, starting at an Ordnungszahl line and running until the next one"""
+    ref_no: str
+    start_page: int
+    end_page: int
+    lines: List[str] = field(default_factory=list)
+    has_quantity: bool = False
+
+    @property
+    def text(self) -> str:
+        if not self.has_quantity:
+            # Group headings carry no item, their title line is enough context
+            return self.lines[0]
+        return "\n".join(self.lines)
+
+
+class PositionSegmenter:
+    """
+    Incremental segmenter, fed page by page.
+
+    A position starts at a line beginning with an Ordnungszahl and ends right
+    before the next one, so it may span pages and is only complete once the
+    next Ordnungszahl (or the end of the document) is seen. Text before the
+    first Ordnungszahl (cover pages, legal preamble) is dropped. Segments
+    without a quantity and unit are kept as group headings with their first
+    line only.
+    """
+
+    def __init__(self):
+        self.current: Optional[PositionSegment] = None
+
+    def feed(self, page_index: int, page: str) -> List[PositionSegment]:
+        """Add a page and return the segments it completed"""
+        completed: List[PositionSegment] = []
+        for line in page.splitlines():
+            if not line.strip():
+                continue
+            match = ORDINAL_PATTERN.match(line)
+            if match and not QUANTITY_LINE_PATTERN.match(line):
+                if self.current is not None:
+                    completed.append(self.current)
+                self.current = PositionSegment(
+                    ref_no=match.group(1),
+                    start_page=page_index,
+                    end_page=page_index,
+                )
+            if self.current is None:
+                continue
+            self.current.lines.append(line.strip())
+            self.current.end_page = page_index
+            if not self.current.has_quantity and QUANTITY_PATTERN.search(line):
+                self.current.has_quantity = True
+        return completed
+
+    def flush(self) -> List[PositionSegment]:
+        """Return the last open segment at the end of the document"""
+        completed = [self.current] if self.current is not None else []
+        self.current = None
+        return completed
+
+
+def segment_positions(pages: List[str]) -> List[PositionSegment]:
+    """Split extracted page text into candidate positions, see PositionSegmenter"""
+    segmenter = PositionSegmenter()
+    segments: List[PositionSegment] = []
+    for page_index, page in enumerate(pages):
+        segments.extend(segmenter.feed(page_index, page))
+    segments.extend(segmenter.flush())
+    return segments
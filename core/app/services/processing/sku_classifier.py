@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.models.models import ItemChunkDto, ItemDto
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(__file__), "sku_catalog.json")
+
+DIMENSIONS_PATTERN = re.compile(
+    r"\d[\d.,]*\s*[x×]\s*\d[\d.,]*(?:\s*[x×]\s*\d[\d.,]*)?\s*(?:mm|cm|m)\b",
+    re.IGNORECASE,
+)
+ALTERNATIVE_PATTERN = re.compile(r"alternativ|wahlposition", re.IGNORECASE)
+NAME_MAX_LENGTH = 80
+# Rules of these kinds name a door product
+PRODUCT_KINDS = {"combination", "primary"}
+# Order of the rule kinds in the service offer list of the categorization prompt
+OFFER_LIST_KIND_ORDER = ("primary", "accessory", "service", "incidental_service")
+
+
+@dataclass
+class SkuRule:
+    sku: str
+    label: str
+    kind: str
+    priority: int
+
+
+@dataclass
+class SkuMatch:
+    sku: str
+    label: str
+    confidence: float
+
+
+class SkuClassifier:
+    """
+    Deterministic keyword classifier in front of the LLM categorization.
+
+    All patterns of the catalog are compiled into one alternation with a named
+    group per rule, so a description is scanned once regardless of the catalog
+    size. The matched rules with the highest priority decide the SKU, which
+    encodes the "primary product wins over Zarge and accessories" rule of the
+    categorization prompt. Incidental services such as "nach Aufmaß" only
+    count when no product matched, and an accessory is not taken for the
+    product when the description names a door it does not classify (e.g.
+    "Innentür mit Türschließer"). Anything without a single winning SKU is
+    ambiguous and left to the LLM.
+    """
+
+    def __init__(self, catalog_path: str = DEFAULT_CATALOG_PATH):
+        catalog = load_catalog(catalog_path)
+
+        self.version = str(catalog["version"])
+        self.rules: List[SkuRule] = []
+        alternatives = []
+        for index, rule in enumerate(catalog["rules"]):
+            self.rules.append(
+                SkuRule(
+                    sku=rule["sku"],
+                    label=rule["label"],
+                    kind=rule["kind"],
+                    priority=int(rule["priority"]),
+                )
+            )
+            alternatives.append(f"(?P<r{index}>{'|'.join(rule['patterns'])})")
+        self.pattern = re.compile("|".join(alternatives), re.IGNORECASE)
+        generic_patterns = catalog.get("generic_product_patterns", [])
+        self.generic_product_pattern = (
+            re.compile("|".join(generic_patterns), re.IGNORECASE) if generic_patterns else None
+        )
+        logger.info(f"Loaded SKU catalog version {self.version} with {len(self.rules)} rules")
+
+    def match(self, text: str) -> Optional[SkuMatch]:
+        """
+        Return the SKU for a description, or None when nothing or more than one SKU wins.
+
+        Confidence is 1.0 when every matched rule agrees on the SKU and 0.9 when
+        the precedence rules had to overrule a lower priority match.
+        """
+        matched = set()
+        for found in self.pattern.finditer(text):
+            matched.add(int(found.lastgroup[1:]))
+        if not matched:
+            return None
+
+        kinds = {self.rules[i].kind for i in matched}
+        if kinds & PRODUCT_KINDS:
+            matched = {i for i in matched if self.rules[i].kind != "incidental_service"}
+        elif kinds == {"accessory"} and self.generic_product_pattern is not None:
+            if self.generic_product_pattern.search(text):
+                return None
+
+        top_priority = max(self.rules[i].priority for i in matched)
+        winners = [self.rules[i] for i in matched if self.rules[i].priority == top_priority]
+        if len({rule.sku for rule in winners}) != 1:
+            return None
+
+        all_skus = {self.rules[i].sku for i in matched}
+        confidence = 1.0 if len(all_skus) == 1 else 0.9
+        return SkuMatch(sku=winners[0].sku, label=winners[0].label, confidence=confidence)
+
+    def classify(self, entry: ItemChunkDto) -> Optional[ItemDto]:
+        sku_match = self.match(entry.description)
+        if sku_match is None:
+            return None
+        return ItemDto(
+            sku=sku_match.sku,
+            name=build_item_name(entry.description),
+            text=entry.description,
+            quantity=int(round(entry.quantity or 0)),
+            quantityunit=entry.unit or "Stk",
+            price=0,
+            priceunit="EUR",
+            commission=entry.ref_no,
+            confidence=sku_match.confidence,
+            source_pages=entry.source_pages,
+        )
+
+    def split(self, entries: List[ItemChunkDto]) -> Tuple[List[Optional[ItemDto]], List[int]]:
+        """
+        Classify what the catalog can decide locally.
+
+        Returns one slot per entry (None where the catalog had no clear answer)
+        and the indexes of the entries that still need the LLM.
+        """
+        results: List[Optional[ItemDto]] = []
+        ambiguous: List[int] = []
+        for index, entry in enumerate(entries):
+            item = self.classify(entry)
+            results.append(item)
+            if item is None:
+                ambiguous.append(index)
+        return results, ambiguous
+
+
+def load_catalog(catalog_path: str = DEFAULT_CATALOG_PATH) -> dict:
+    with open(catalog_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def render_sku_offer_list(catalog: dict) -> str:
+    """
+    Service offer list of the categorization prompt, rendered from the catalog
+    so the prompt and the local classifier share one source of SKUs.
+
+    The labels (and examples) of all rules of one SKU make one line, ordered
+    products, accessories, services. Combination rules follow as "use this SKU" lines.
+    """
+    offers: Dict[str, Tuple[List[str], List[str]]] = {}
+    rank = {kind: index for index, kind in enumerate(OFFER_LIST_KIND_ORDER)}
+    rules = [rule for rule in catalog["rules"] if rule["kind"] in rank]
+    for rule in sorted(rules, key=lambda rule: rank[rule["kind"]]):
+        labels, examples = offers.setdefault(rule["sku"], ([], []))
+        if rule["label"] not in labels:
+            labels.append(rule["label"])
+        examples.extend(example for example in rule.get("examples", []) if example not in examples)
+
+    lines = []
+    for sku, (labels, examples) in offers.items():
+        text = ", ".join(labels)
+        if examples:
+            text += f" (e.g., {', '.join(examples)}, etc.)"
+        lines.append(f"* **{text}**: `{sku}`")
+    for rule in catalog["rules"]:
+        if rule["kind"] == "combination":
+            lines.append(f"* If the description includes combinations like **“{rule['label']}”**, then use `{rule['sku']}`.")
+    return "\n".join(lines)
+
+
+def build_item_name(description: str) -> str:
+    """First line of the description, marked as alternative and with its dimensions appended"""
+    lines = [line.strip() for line in description.splitlines() if line.strip()]
+    name = lines[0] if lines else description.strip()
+    if len(name) > NAME_MAX_LENGTH:
+        name = name[:NAME_MAX_LENGTH].rsplit(" ", 1)[0]
+
+    if ALTERNATIVE_PATTERN.search(description) and not name.lower().startswith("alternative"):
+        name = f"Alternative {name}"
+
+    dimensions = DIMENSIONS_PATTERN.search(description)
+    if dimensions and dimensions.group(0) not in name:
+        name = f"{name} ({dimensions.group(0)})"
+    return name
@@ -0,0 +1,154 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from pdfminer.layout import LTTextContainer, LTTextLine
+
+from app.services.processing.segmenter import ORDINAL_PATTERN, UNITS
+
+NUMBER_CELL_PATTERN = re.compile(r"^\d{1,3}(?:\.\d{3})*(?:,\d+)?(?:\s*(?:€|EUR))?$", re.IGNORECASE)
+UNIT_CELL_PATTERN = re.compile(rf"^(?:{UNITS})\.?$", re.IGNORECASE)
+QUANTITY_CELL_PATTERN = re.compile(
+    rf"^(\d{{1,3}}(?:\.\d{{3}})*(?:,\d+)?)\s*((?:{UNITS})\.?)$",
+    re.IGNORECASE,
+)
+# Empty bidder fields for unit and total price, e.g. "........" or "________"
+PLACEHOLDER_CELL_PATTERN = re.compile(r"^[._\s€]+$")
+
+
+@dataclass
+class TextCell:
+    text: str
+    x0: float
+    x1: float
+    y0: float
+    y1: float
+
+    @property
+    def center(self) -> float:
+        return (self.y0 + self.y1) / 2
+
+    @property
+    def height(self) -> float:
+        return self.y1 - self.y0
+
+
+@dataclass
+class _Position:
+    ref_no: str
+    x0: float
+    description: List[str] = field(default_factory=list)
+    quantity: Optional[str] = None
+    fields: List[str] = field(default_factory=list)
+
+    def render(self) -> str:
+        parts = [f"{self.ref_no} | {' '.join(self.description)}"]
+        if self.quantity:
+            parts.append(self.quantity)
+        parts.extend(self.fields)
+        return " | ".join(parts)
+
+
+def layout_cells(page_layout) -> List[TextCell]:
+    """All text lines of a laid out page with their bounding boxes"""
+    cells = []
+    for element in page_layout:
+        if not isinstance(element, LTTextContainer):
+            continue
+        lines = [element] if isinstance(element, LTTextLine) else [
+            line for line in element if isinstance(line, LTTextLine)
+        ]
+        for line in lines:
+            text = " ".join(line.get_text().split())
+            if text:
+                cells.append(TextCell(text=text, x0=line.x0, x1=line.x1, y0=line.y0, y1=line.y1))
+    return cells
+
+
+def group_rows(cells: List[TextCell]) -> List[List[TextCell]]:
+    """
+    Cluster cells into table rows, top to bottom, each row left to right.
+
+    Cells are taken by their top edge. A cell joins the current row when it
+    overlaps the vertical span of the row's cells by at least half of its
+    own or the row's lowest line height, so cells of one row that pdfminer
+    placed in different text boxes (one per column) end up together again,
+    also next to a description of several lines or a wrapped quantity.
+    """
+    rows: List[List[TextCell]] = []
+    top = bottom = line_height = 0.0
+    for cell in sorted(cells, key=lambda c: (-c.y1, c.x0)):
+        if rows:
+            overlap = min(top, cell.y1) - max(bottom, cell.y0)
+            if overlap >= min(line_height, cell.height) / 2:
+                rows[-1].append(cell)
+                bottom = min(bottom, cell.y0)
+                line_height = min(line_height, cell.height)
+                continue
+        rows.append([cell])
+        top, bottom, line_height = cell.y1, cell.y0, cell.height
+    return [sorted(row, key=lambda c: c.x0) for row in rows]
+
+
+def _add_cells(position: _Position, cells: List[TextCell]):
+    index = 0
+    while index < len(cells):
+        text = cells[index].text
+        following = cells[index + 1].text if index + 1 < len(cells) else ""
+        if PLACEHOLDER_CELL_PATTERN.match(text):
+            pass
+        elif QUANTITY_CELL_PATTERN.match(text) and position.quantity is None:
+            position.quantity = text
+        elif NUMBER_CELL_PATTERN.match(text) and UNIT_CELL_PATTERN.match(following) and position.quantity is None:
+            position.quantity = f"{text} {following}"
+            index += 1
+        elif UNIT_CELL_PATTERN.match(text) and position.quantity is None and position.fields:
+            # The unit wrapped below the number of the quantity column
+            position.quantity = f"{position.fields.pop(0)} {text}"
+        elif NUMBER_CELL_PATTERN.match(text):
+            position.fields.append(text)
+        else:
+            position.description.append(text)
+        index += 1
+
+
+def rows_to_text(rows: List[List[TextCell]]) -> str:
+    """
+    Render table rows as one line per position: `ref_no | description | quantity unit | further fields`.
+
+    A position starts at a row whose first cell begins with an Ordnungszahl.
+    Following rows that start right of the Ordnungszahl (the indented text
+    column, the quantity and price columns) continue the position, a row
+    starting at or left of it (a footer, a heading) closes it and is written
+    as a plain line. Rows of placeholders only are dropped.
+    """
+    lines: List[str] = []
+    position: Optional[_Position] = None
+    for row in rows:
+        if all(PLACEHOLDER_CELL_PATTERN.match(cell.text) for cell in row):
+            # Empty price fields on a row of their own
+            continue
+        first = row[0]
+        match = ORDINAL_PATTERN.match(first.text)
+        if match and not QUANTITY_CELL_PATTERN.match(first.text):
+            if position is not None:
+                lines.append(position.render())
+            position = _Position(ref_no=match.group(1), x0=first.x0)
+            rest = first.text[match.end():].strip()
+            cells = ([TextCell(rest, first.x0, first.x1, first.y0, first.y1)] if rest else []) + row[1:]
+            _add_cells(position, cells)
+        elif position is not None and first.x0 > position.x0 + 1:
+            _add_cells(position, row)
+        else:
+            if position is not None:
+                lines.append(position.render())
+                position = None
+            lines.append(" ".join(cell.text for cell in row))
+    if position is not None:
+        lines.append(position.render())
+    return "\n".join(lines)
+
+
+def page_layout_to_table_text(page_layout) -> str:
+    """Rebuild the rows and columns of a laid out page from the text line bounding boxes"""
+    return rows_to_text(group_rows(layout_cells(page_layout)))
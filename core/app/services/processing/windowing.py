@@ -0,0 +1,253 @@
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.services.processing.segmenter import PositionSegment, PositionSegmenter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PageWindow:
+    """A slice of consecutive pages joined together with `### PAGE n` headers"""
+    start: int
+    end: int
+    text: str
+    # First and last 0-based page of every position the segmenter found in the window
+    position_pages: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+    def item_pages(self, ref_no: str) -> range:
+        """1-based pages an item of the window sits on, the whole window when its position was not found"""
+        start, end = self.position_pages.get(ref_no.strip(), (self.start, self.end - 1))
+        return range(start + 1, end + 2)
+
+
+def page_header(page_index: int) -> str:
+    return f"\n\n### PAGE {page_index + 1}\n"
+
+
+def segment_page_ranges(segments: Iterable[PositionSegment]) -> Dict[str, Tuple[int, int]]:
+    """First and last page of every segment, a heading only covers the page of its title line"""
+    ranges: Dict[str, Tuple[int, int]] = {}
+    for segment in segments:
+        end_page = segment.end_page if segment.has_quantity else segment.start_page
+        start, end = ranges.get(segment.ref_no, (segment.start_page, end_page))
+        ranges[segment.ref_no] = (min(start, segment.start_page), max(end, end_page))
+    return ranges
+
+
+def position_page_ranges(pages: Iterable[Tuple[int, str]]) -> Dict[str, Tuple[int, int]]:
+    """Segment the (page_index, text) pages of a window, see segment_page_ranges"""
+    segmenter = PositionSegmenter()
+    segments: List[PositionSegment] = []
+    for page_index, page in pages:
+        segments.extend(segmenter.feed(page_index, page))
+    segments.extend(segmenter.flush())
+    return segment_page_ranges(segments)
+
+
+class WindowBuilder(ABC):
+    """
+    Builds page windows incrementally.
+
+    Pages are fed one at a time in document order and every call returns the
+    windows that are complete with that page, so the parser can start before
+    the whole document is extracted. `flush` returns the rest at the end.
+    """
+
+    @abstractmethod
+    def feed(self, page_index: int, page: str) -> List[PageWindow]:
+        ...
+
+    @abstractmethod
+    def flush(self) -> List[PageWindow]:
+        ...
+
+
+class PageCountWindowBuilder(WindowBuilder):
+    """
+    Windows of `window_size` pages that move forward by `stride` pages, so
+    consecutive windows share `window_size - stride` pages at the boundary.
+    For example with window_size=3, stride=2: [Page 1-3], [Page 3-5], ...
+    The last window always reaches the last page, even for documents
+    shorter than one window. Windows start counting at `first_page`.
+    """
+
+    def __init__(self, window_size: int, stride: int = 1, first_page: int = 0):
+        if window_size < 1 or stride < 1:
+            raise ValueError("window_size and stride must be at least 1")
+        self.window_size = window_size
+        self.stride = min(stride, window_size)
+        self.pages: List[Tuple[int, str]] = []
+        self.start = first_page
+        self.last_end = first_page
+
+    def feed(self, page_index: int, page: str) -> List[PageWindow]:
+        self.pages.append((page_index, page))
+        windows = []
+        while page_index + 1 >= self.start + self.window_size:
+            windows.append(self._window(self.start, self.start + self.window_size))
+            self.start += self.stride
+            self.pages = [(i, text) for i, text in self.pages if i >= self.start]
+        return windows
+
+    def flush(self) -> List[PageWindow]:
+        if not self.pages or self.pages[-1][0] + 1 <= self.last_end:
+            return []
+        return [self._window(self.start, self.pages[-1][0] + 1)]
+
+    def _window(self, start: int, end: int) -> PageWindow:
+        pages = [(i, page) for i, page in self.pages if start <= i < end]
+        text = "".join(f"{page_header(i)}{page}" for i, page in pages)
+        self.last_end = end
+        return PageWindow(start=start, end=end, text=text, position_pages=position_page_ranges(pages))
+
+
+class TokenBudgetWindowBuilder(WindowBuilder):
+    """
+    Windows of whole pages, each filled up to `token_budget` input tokens.
+
+    Every page is counted once including its `### PAGE n` header. Consecutive
+    windows share `overlap` pages at the boundary, unless the overlap leaves no
+    room for the next page. A single page above the budget gets a window of
+    its own, pages are never split.
+    """
+
+    def __init__(self, token_budget: int, count_tokens: Callable[[str], int], overlap: int = 1):
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens
+        self.overlap = overlap
+        # (page_index, text with header, tokens) of the window being filled
+        self.pages: List[Tuple[int, str, int]] = []
+        self.last_end = 0
+
+    def feed(self, page_index: int, page: str) -> List[PageWindow]:
+        text = f"{page_header(page_index)}{page}"
+        tokens = self.count_tokens(text)
+        windows = []
+        if self.pages and sum(p[2] for p in self.pages) + tokens > self.token_budget:
+            windows.append(self._window())
+            carry = self.pages[-self.overlap:] if 0 < self.overlap < len(self.pages) else []
+            if sum(p[2] for p in carry) + tokens > self.token_budget:
+                carry = []
+            self.pages = list(carry)
+        self.pages.append((page_index, text, tokens))
+        return windows
+
+    def flush(self) -> List[PageWindow]:
+        if not self.pages or self.pages[-1][0] + 1 <= self.last_end:
+            return []
+        return [self._window()]
+
+    def _window(self) -> PageWindow:
+        total = sum(p[2] for p in self.pages)
+        if total > self.token_budget:
+            logger.warning(
+                f"Page {self.pages[0][0] + 1} alone has {total} tokens, above the window budget of {self.token_budget}"
+            )
+        self.last_end = self.pages[-1][0] + 1
+        return PageWindow(
+            start=self.pages[0][0],
+            end=self.last_end,
+            text="".join(p[1] for p in self.pages),
+            position_pages=position_page_ranges((p[0], p[1]) for p in self.pages),
+        )
+
+
+class SegmentWindowBuilder(WindowBuilder):
+    """
+    Windows of whole positions found by the PositionSegmenter, each filled up
+    to `token_budget` input tokens.
+
+    A `### PAGE n` marker is written whenever a position starts on a new page,
+    so the parser still sees where it is in the document. Positions are never
+    cut at a window edge, so windows need no overlap. Until the first position
+    with a quantity shows up the pages are kept, and if the document ends
+    without one they are handed to the `fallback` builder instead.
+    """
+
+    def __init__(self, token_budget: int, count_tokens: Callable[[str], int], fallback: WindowBuilder):
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens
+        self.fallback = fallback
+        self.segmenter = PositionSegmenter()
+        self.found_positions = False
+        self.buffered_pages: List[Tuple[int, str]] = []
+        self.pages_seen = 0
+        self.covered_pages = set()
+        self.segment_count = 0
+
+        self.window_segments: List[PositionSegment] = []
+        self.window_text = ""
+        self.window_tokens = 0
+        self.last_page: Optional[int] = None
+
+    def feed(self, page_index: int, page: str) -> List[PageWindow]:
+        self.pages_seen += 1
+        if not self.found_positions:
+            self.buffered_pages.append((page_index, page))
+        return self._pack(self.segmenter.feed(page_index, page))
+
+    def flush(self) -> List[PageWindow]:
+        windows = self._pack(self.segmenter.flush())
+        if not self.found_positions:
+            logger.info("No positions found by the segmenter, falling back to page windows")
+            windows = []
+            for page_index, page in self.buffered_pages:
+                windows.extend(self.fallback.feed(page_index, page))
+            return windows + self.fallback.flush()
+
+        if self.window_segments:
+            windows.append(self._window())
+        logger.info(
+            f"Segmented {self.segment_count} candidate positions, "
+            f"{self.pages_seen - len(self.covered_pages)} / {self.pages_seen} pages hold no position and are skipped"
+        )
+        return windows
+
+    def _pack(self, segments: List[PositionSegment]) -> List[PageWindow]:
+        windows = []
+        for segment in segments:
+            self.segment_count += 1
+            self.covered_pages.update(range(segment.start_page, segment.end_page + 1))
+            if segment.has_quantity and not self.found_positions:
+                self.found_positions = True
+                self.buffered_pages = []
+
+            chunk = ""
+            if segment.start_page != self.last_page:
+                chunk += page_header(segment.start_page)
+            chunk += f"{segment.text}\n"
+            chunk_tokens = self.count_tokens(chunk)
+
+            if self.window_segments and self.window_tokens + chunk_tokens > self.token_budget:
+                windows.append(self._window())
+                # The new window needs its own page marker
+                chunk = f"{page_header(segment.start_page)}{segment.text}\n"
+                chunk_tokens = self.count_tokens(chunk)
+
+            self.window_segments.append(segment)
+            self.window_text += chunk
+            self.window_tokens += chunk_tokens
+            self.last_page = segment.start_page
+        return windows
+
+    def _window(self) -> PageWindow:
+        window = PageWindow(
+            start=self.window_segments[0].start_page,
+            end=self.window_segments[-1].end_page + 1,
+            text=self.window_text,
+            position_pages=segment_page_ranges(self.window_segments),
+        )
+        self.window_segments, self.window_text, self.window_tokens = [], "", 0
+        return window
+
+
+def build_windows(builder: WindowBuilder, pages: List[str]) -> List[PageWindow]:
+    """Run a builder over a complete list of pages"""
+    windows = []
+    for page_index, page in enumerate(pages):
+        windows.extend(builder.feed(page_index, page))
+    windows.extend(builder.flush())
+    return windows
@@ -0,0 +1,76 @@
+import logging
+import time
+from typing import Callable, Optional
+from uuid import UUID
+
+from app.envirnoment import config
+from app.services.mongo_db import MongoDBService
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressReporter:
+    """
+    Coalesces the progress updates of a task into a bounded number of writes.
+
+    `report` only keeps the latest progress. It is written to the task with
+    one update_one when `min_interval` seconds passed since the last write,
+    when the progress moved by `min_step` of the total since then, or when
+    the stage is done. Call `flush` at the end of a stage so the last update
+    is not left behind. A failing write is logged and does not fail the task.
+    """
+
+    def __init__(
+        self,
+        mongo_db_service: MongoDBService,
+        task_id: Optional[str],
+        min_interval: Optional[float] = None,
+        min_step: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            mongo_db_service: Service the progress is written with
+            task_id: Task the progress belongs to, nothing is written without one
+            min_interval: Seconds between two writes, PROGRESS_FLUSH_INTERVAL_S by default
+            min_step: Share of the total that is written right away, PROGRESS_FLUSH_STEP by default
+            clock: Monotonic time in seconds
+        """
+        self.mongo_db_service = mongo_db_service
+        self.task_id = UUID(str(task_id)) if task_id else None
+        self.min_interval = min_interval if min_interval is not None else float(config.get("PROGRESS_FLUSH_INTERVAL_S", 1.0))
+        self.min_step = min_step if min_step is not None else float(config.get("PROGRESS_FLUSH_STEP", 0.1))
+        self.clock = clock
+        self.writes = 0
+        self._pending: Optional[tuple] = None
+        self._flushed_at: Optional[float] = None
+        self._flushed_done = 0
+
+    def report(self, done: int, total: int, description: Optional[str] = None):
+        """Record the progress of the current stage, written now or with a later report or flush"""
+        if self.task_id is None:
+            return
+        self._pending = (done, total, description)
+        if (
+            self._flushed_at is None
+            or done >= total
+            or self.clock() - self._flushed_at >= self.min_interval
+            or (total and (done - self._flushed_done) / total >= self.min_step)
+        ):
+            self.flush()
+
+    def flush(self):
+        """Write the pending progress, if any"""
+        if self._pending is None:
+            return
+        done, total, description = self._pending
+        self._pending = None
+        self._flushed_at = self.clock()
+        self._flushed_done = done
+        try:
+            self.mongo_db_service.update_task_progress(
+                task_id=self.task_id, done=done, total=total, description=description
+            )
+            self.writes += 1
+        except Exception as e:
+            logger.warning(f"Could not store the progress of task {self.task_id}: {e}")
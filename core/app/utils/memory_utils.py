@@ -0,0 +1,68 @@
+import os
+import resource
+import sys
+import threading
+from typing import Optional
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of the whole process lifetime, ru_maxrss is in KB on Linux and bytes on macOS"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> int:
+    """Current resident set size, falls back to the lifetime peak where /proc is not available"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return peak_rss_bytes()
+
+
+class RssSampler:
+    """
+    Samples the resident memory of the process in a background thread.
+
+    ru_maxrss only knows the peak of the whole worker process, which serves
+    many tasks, so the peak of a single task is taken from samples of the
+    current RSS while the task runs. Use as a context manager or with start/stop.
+    """
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self):
+        self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self) -> "RssSampler":
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sample()
+
+    def __enter__(self) -> "RssSampler":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak_bytes / (1024 * 1024), 1)
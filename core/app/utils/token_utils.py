@@ -0,0 +1,24 @@
+from functools import lru_cache
+
+import tiktoken
+
+DEFAULT_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = None):
+    """
+    Tokenizer for a model name, OpenRouter style names like "openai/gpt-4o-mini"
+    are accepted. Unknown models fall back to the gpt-4o encoding.
+    """
+    if model:
+        try:
+            return tiktoken.encoding_for_model(model.split("/")[-1])
+        except KeyError:
+            pass
+    return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    """Number of tokens of a text for the given model"""
+    return len(get_encoding(model).encode(text, disallowed_special=()))
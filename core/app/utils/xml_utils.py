@@ -0,0 +1,33 @@
+from typing import Iterable, Iterator, List
+from xml.sax.saxutils import escape
+
+from app.models.models import ItemDto
+
+
+def iter_items_xml(items: Iterable[ItemDto]) -> Iterator[str]:
+    """
+    Build the catalog XML for classified items part by part, one part per item,
+    so a large catalog can be written out without holding it in memory.
+    """
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<catalog>\n'
+    for item in items:
+        yield (
+            "  <item>\n"
+            f"    <sku>{escape(str(item.sku))}</sku>\n"
+            f"    <name>{escape(str(item.name))}</name>\n"
+            f"    <text>{escape(str(item.text))}</text>\n"
+            f"    <quantity>{item.quantity}</quantity>\n"
+            f"    <quantityUnit>{escape(str(item.quantityunit))}</quantityUnit>\n"
+            f"    <price>{item.price}</price>\n"
+            f"    <priceUnit>{escape(str(item.priceunit))}</priceUnit>\n"
+            f"    <commission>{escape(str(item.commission))}</commission>\n"
+            "  </item>\n"
+        )
+    yield "</catalog>"
+
+
+def build_items_xml(items: List[ItemDto]) -> str:
+    """
+    Build the catalog XML for classified items.
+    """
+    return "".join(iter_items_xml(items))
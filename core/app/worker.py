@@ -2,8 +2,11 @@ import os
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
 from dotenv import dotenv_values
 
+from app.services.mongo_client import close_mongo_client, open_mongo_client
+
 config = {
     **dotenv_values(".env"),
     **os.environ,
@@ -29,8 +32,16 @@ app.conf.update(
 app.conf.update(
     broker_transport_options={
         'polling_interval': 1.0, 
+        # Longer than the longest file task, otherwise unacked tasks are delivered again
+        'visibility_timeout': int(config.get('CELERY_VISIBILITY_TIMEOUT', 6 * 3600)),
     },
 )
+# A worker reserves one file at a time, so queued files are taken in dispatch order (largest first)
+# by whichever worker is free instead of piling up behind a long file in one prefetch buffer.
+app.conf.update(
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+)
 
 app.conf.beat_schedule = {
     'delete-old-interaction-logs-every-day': {
@@ -43,6 +54,23 @@ app.conf.beat_scheduler = 'celery.beat.PersistentScheduler'
 app.conf.beat_scheduler = 'celery.beat.PersistentScheduler'
 app.conf.beat_schedule_filename = 'celerybeat-schedule'
 
+# Every worker process opens its own pooled MongoDB client after the fork and closes it on exit
+@worker_process_init.connect
+def open_worker_mongo_client(**kwargs):
+    open_mongo_client()
+
+
+@worker_process_shutdown.connect
+def close_worker_mongo_client(**kwargs):
+    close_mongo_client()
+
+
+@worker_shutdown.connect
+def close_main_mongo_client(**kwargs):
+    # Solo and thread pools run the tasks in the main process
+    close_mongo_client()
+
+
 @app.task
 def check_worker_status():
     print("Checking worker status...")
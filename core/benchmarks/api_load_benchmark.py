@@ -0,0 +1,79 @@
+"""
+Load test of the read endpoints of a running API.
+
+Sends `--requests` GET requests per concurrency level and reports the
+throughput and latency percentiles. With a non-blocking data layer the
+throughput grows with the concurrency until Mongo or the worker CPU is
+saturated; with blocking calls on the event loop it stays flat at the
+single-request rate while the latency grows with the concurrency.
+
+Needs httpx (the client FastAPI's TestClient uses), which is not a runtime
+dependency of the service. Run from the core directory against a started
+server, e.g.:
+    python -m benchmarks.api_load_benchmark --url http://localhost:8000 --paths /files/ /tasks/ --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Tuple
+
+import httpx
+
+
+async def run_level(client: httpx.AsyncClient, paths: List[str], requests: int, concurrency: int) -> Tuple[float, List[float], int]:
+    """Send `requests` requests with at most `concurrency` in flight, returns the wall time, latencies and errors"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def send(index: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.get(paths[index % len(paths)])
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(index) for index in range(requests)))
+    return time.perf_counter() - started, latencies, errors
+
+
+def percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+async def main(url: str, paths: List[str], requests: int, levels: List[int], timeout: float):
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+        # Warm up connections and the server side caches
+        await run_level(client, paths, min(requests, max(levels)), max(levels))
+        baseline = None
+        for concurrency in levels:
+            seconds, latencies, errors = await run_level(client, paths, requests, concurrency)
+            throughput = requests / seconds
+            baseline = baseline or throughput
+            print(
+                f"concurrency {concurrency:4d}: {throughput:8.1f} req/s ({throughput / baseline:5.2f}x)  "
+                f"p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+                f"p95 {percentile(latencies, 0.95) * 1000:7.1f} ms  "
+                f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+                f"errors {errors}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--paths", nargs="+", default=["/files/", "/tasks/"])
+    parser.add_argument("--requests", type=int, default=500, help="requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.paths, args.requests, args.concurrency, args.timeout))
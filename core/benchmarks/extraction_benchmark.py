@@ -0,0 +1,70 @@
+"""
+Benchmark of the PDF extraction modes.
+
+Extracts every given PDF once per mode and reports pages per second next to
+the item recall of the mode, measured against the full layout analysis: the
+share of positions with a quantity found by the segmenter in layout mode that
+are found in the other mode as well. The sampled choice of the "auto" mode is
+printed per document.
+
+Run from the core directory:
+    python -m benchmarks.extraction_benchmark path/to/lv.pdf [more.pdf ...]
+"""
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+from app.services.processing.pdf_extraction import (
+    choose_extraction_mode,
+    extraction_similarity,
+    iter_pages,
+)
+from app.services.processing.segmenter import segment_positions
+
+
+def timed_extract(pdf_path: str, mode: str, tables: bool) -> Tuple[List[str], float]:
+    started = time.perf_counter()
+    pages = list(iter_pages(pdf_path, mode=mode, tables=tables))
+    return pages, time.perf_counter() - started
+
+
+def positions_with_quantity(pages: List[str]) -> set:
+    return {segment.ref_no for segment in segment_positions(pages) if segment.has_quantity}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--sample-pages", type=int, default=3)
+    parser.add_argument("--tables", action="store_true", help="rebuild table rows as PDF_TABLE_EXTRACTION does")
+    args = parser.parse_args()
+
+    totals: Dict[str, List[float]] = {"layout": [0, 0.0], "fast": [0, 0.0]}
+    for pdf_path in args.pdfs:
+        layout_pages, layout_seconds = timed_extract(pdf_path, "layout", args.tables)
+        fast_pages, fast_seconds = timed_extract(pdf_path, "fast", args.tables)
+        reference = positions_with_quantity(layout_pages)
+        found = positions_with_quantity(fast_pages)
+        recall = len(reference & found) / len(reference) if reference else 1.0
+        auto_mode = choose_extraction_mode(pdf_path, sample_pages=args.sample_pages, tables=args.tables)
+
+        pages = len(layout_pages)
+        print(
+            f"{pdf_path}: {pages} pages, {len(reference)} positions\n"
+            f"  layout {pages / layout_seconds:8.1f} pages/s\n"
+            f"  fast   {pages / fast_seconds:8.1f} pages/s  "
+            f"speedup {layout_seconds / fast_seconds:.2f}x  recall {recall:.3f}  "
+            f"similarity {extraction_similarity(layout_pages, fast_pages):.3f}\n"
+            f"  auto   chooses {auto_mode}"
+        )
+        totals["layout"][0] += pages
+        totals["layout"][1] += layout_seconds
+        totals["fast"][0] += pages
+        totals["fast"][1] += fast_seconds
+
+    for mode, (pages, seconds) in totals.items():
+        print(f"total {mode:6} {pages / seconds:8.1f} pages/s over {int(pages)} pages")
+
+
+if __name__ == "__main__":
+    main()
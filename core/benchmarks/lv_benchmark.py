@@ -0,0 +1,312 @@
+"""
+Benchmark suite of the processing stages on synthetic LVs with ground truth.
+
+Runs the entry points of DataProcessingService on PDFs written by
+benchmarks.lv_generator, with the LLM parser replaced by an oracle, and
+reports per stage the pages per second, the memory the stage added and the
+recall against the ground truth JSON next to the PDF:
+
+    extract:<mode>  extract_pages_as_text, positions with their quantity in the page text
+    boilerplate     the configured boilerplate filter, positions still found afterwards
+    windows         get_windows, positions with their quantity in at least one window
+    process         process_data over the pages, items with the right quantity and unit
+    references      resolve_references, share of "wie Pos."/"wie vor" resolved to the right position
+
+`text` is the mean share of the ground truth description words found for the
+recalled positions. Positions are located by their known ref_no at the start
+of a line and run until the next ref_no of the ground truth, so the scoring
+does not depend on the segmenter under test. The oracle parser reads every
+position of a window the same way, so process and references measure the
+windowing and merge logic and not the LLM. The extraction cache is not used.
+
+`added MB` is the peak resident memory while the stage ran minus the resident
+memory at its start, the earlier stages' output is still held.
+
+Run from the core directory with the settings of local.env:
+    python -m benchmarks.lv_generator benchmarks/data --pages 10 200 2000
+    python -m benchmarks.lv_benchmark benchmarks/data/lv_*.pdf
+or generate and benchmark in one go:
+    python -m benchmarks.lv_benchmark --generate 10 200 --directory benchmarks/data
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.models.models import ItemChunkDto
+from app.services.processing.data_processing import DataProcessingService
+from app.services.processing.pdf_extraction import sample_page_numbers
+from app.services.processing.reference_resolver import resolve_references
+from app.services.processing.windowing import PageWindow
+from app.utils.memory_utils import RssSampler, current_rss_bytes
+from benchmarks.lv_generator import PLACEHOLDER, generate_lv, ground_truth_path
+
+WORD_PATTERN = re.compile(r"\w+")
+NUMBER_PATTERN = r"\d{1,3}(?:\.\d{3})*(?:,\d+)?"
+PAGE_MARKER = "### PAGE"
+
+
+@dataclass
+class StageResult:
+    document: str
+    stage: str
+    pages: int
+    seconds: float
+    added_mb: float
+    recall: float
+    text: Optional[float] = None
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.seconds if self.seconds else float("inf")
+
+    def __str__(self):
+        text = f"{self.text:6.3f}" if self.text is not None else "     -"
+        return (
+            f"  {self.stage:16} {self.pages_per_second:10.1f} pages/s {self.seconds:8.2f}s "
+            f"{self.added_mb:8.1f} added MB  recall {self.recall:6.3f}  text {text}"
+        )
+
+
+@dataclass
+class LocatedPosition:
+    """Lines of a ground truth position in some text, from its ref_no line to the next ref_no"""
+    ref_no: str
+    lines: List[str]
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+def words(text: str) -> Counter:
+    return Counter(WORD_PATTERN.findall(text.lower()))
+
+
+def word_recall(truth: Counter, found: Counter) -> float:
+    total = sum(truth.values())
+    return sum((truth & found).values()) / total if total else 1.0
+
+
+def measure(document: str, stage: str, pages: int, run: Callable):
+    """Run a stage under the RSS sampler, returns its output and a StageResult without the recall"""
+    baseline = current_rss_bytes()
+    with RssSampler(interval=0.01) as sampler:
+        started = time.perf_counter()
+        output = run()
+        seconds = time.perf_counter() - started
+    added_mb = max(0, sampler.peak_bytes - baseline) / (1024 * 1024)
+    return output, StageResult(document, stage, pages, seconds, added_mb, recall=0.0)
+
+
+def locate_positions(ref_nos: Iterable[str], text: str) -> List[LocatedPosition]:
+    """
+    Split text at the lines that start with one of the ground truth ref_nos
+    (groups and positions). Text before the first one and `### PAGE` markers
+    are dropped.
+    """
+    known = set(ref_nos)
+    located: List[LocatedPosition] = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith(PAGE_MARKER):
+            continue
+        first = stripped.split(None, 1)[0].rstrip(".")
+        if first in known:
+            located.append(LocatedPosition(first, []))
+        if located:
+            located[-1].lines.append(stripped)
+    return located
+
+
+def has_quantity(text: str, quantity: float, unit: str) -> bool:
+    """Whether the German formatted quantity is written in the text, followed by its unit"""
+    pattern = rf"(?<![\w.,])({NUMBER_PATTERN})\s*{re.escape(unit)}(?!\w)"
+    return any(
+        abs(float(match.group(1).replace(".", "").replace(",", ".")) - quantity) < 1e-6
+        for match in re.finditer(pattern, text)
+    )
+
+
+def all_ref_nos(truth: Dict) -> List[str]:
+    return [g["ref_no"] for g in truth["groups"]] + [p["ref_no"] for p in truth["positions"]]
+
+
+def text_recall(truth: Dict, texts: Iterable[str]) -> Tuple[float, float]:
+    """
+    Share of positions found with their quantity in one of the texts, and the
+    mean description recall of those, the best text counts for every position
+    """
+    positions = {p["ref_no"]: p for p in truth["positions"]}
+    ref_nos = all_ref_nos(truth)
+    best: Dict[str, float] = {}
+    for text in texts:
+        for located in locate_positions(ref_nos, text):
+            position = positions.get(located.ref_no)
+            if position is None or not has_quantity(located.text, position["quantity"], position["unit"]):
+                continue
+            recall = word_recall(words(position["description"]), words(located.text))
+            best[located.ref_no] = max(recall, best.get(located.ref_no, 0.0))
+    return summarize(truth, best)
+
+
+def item_recall(truth: Dict, items: List[ItemChunkDto]) -> Tuple[float, float]:
+    """Share of positions parsed with the right quantity and unit, and the mean description recall of those"""
+    positions = {p["ref_no"]: p for p in truth["positions"]}
+    found: Dict[str, float] = {}
+    for item in items:
+        position = positions.get(item.ref_no)
+        if position is None or item.unit != position["unit"] or abs(item.quantity - position["quantity"]) >= 1e-6:
+            continue
+        found[item.ref_no] = word_recall(words(position["description"]), words(item.description))
+    return summarize(truth, found)
+
+
+def summarize(truth: Dict, found: Dict[str, float]) -> Tuple[float, float]:
+    positions = truth["positions"]
+    recall = len(found) / len(positions) if positions else 1.0
+    return recall, sum(found.values()) / len(found) if found else 0.0
+
+
+def oracle_parse(truth: Dict, window: PageWindow) -> List[ItemChunkDto]:
+    """
+    Stand-in for the LLM parser: every ground truth position of the window is
+    one item with the text of the window. The quantity is only set when the
+    window holds it, so a position cut at a window edge is parsed like the
+    LLM would see it.
+    """
+    positions = {p["ref_no"]: p for p in truth["positions"]}
+    items = []
+    for located in locate_positions(all_ref_nos(truth), window.text):
+        position = positions.get(located.ref_no)
+        if position is None:
+            continue
+        text = located.text[len(located.ref_no):].replace(PLACEHOLDER, " ")
+        quantity, unit = 0.0, ""
+        if has_quantity(text, position["quantity"], position["unit"]):
+            quantity, unit = position["quantity"], position["unit"]
+        items.append(ItemChunkDto(ref_no=located.ref_no, description=" ".join(text.split()), quantity=quantity, unit=unit))
+    return items
+
+
+class OracleProcessingService(DataProcessingService):
+    """DataProcessingService with the LLM parser replaced by oracle_parse"""
+
+    def __init__(self, truth: Dict):
+        super().__init__()
+        self.truth = truth
+        self.extraction_cache = None
+
+    async def parse_window(self, window: PageWindow, semaphore: asyncio.Semaphore) -> List[ItemChunkDto]:
+        async with semaphore:
+            return oracle_parse(self.truth, window)
+
+
+def reference_accuracy(truth: Dict, items: List[ItemChunkDto]) -> float:
+    resolved = {item.ref_no: item.references_id for item in items}
+    expected = {p["ref_no"]: p["references"] for p in truth["positions"] if p["references"]}
+    if not expected:
+        return 1.0
+    return sum(1 for ref_no, target in expected.items() if resolved.get(ref_no) == target) / len(expected)
+
+
+def benchmark_document(pdf_path: str, modes: List[str], tables: bool, token_budget: Optional[int]) -> List[StageResult]:
+    with open(ground_truth_path(pdf_path), encoding="utf-8") as f:
+        truth = json.load(f)
+    document = os.path.basename(pdf_path)
+    page_count = truth["page_count"]
+    service = OracleProcessingService(truth)
+    service.table_extraction = tables
+    if token_budget is not None:
+        service.window_token_budget = token_budget
+    results = []
+
+    extracted: Dict[str, List[str]] = {}
+    for mode in modes:
+        service.extraction_mode = mode
+        pages, result = measure(document, f"extract:{mode}", page_count, lambda: service.extract_pages_as_text(pdf_path))
+        result.recall, result.text = text_recall(truth, ["\n".join(pages)])
+        extracted[mode] = pages
+        results.append(result)
+    pages = extracted[modes[0]]
+
+    def remove_boilerplate():
+        # Fitted and fed like process_data does
+        boilerplate_filter = service.create_boilerplate_filter()
+        if boilerplate_filter is None:
+            return list(pages)
+        boilerplate_filter.fit([pages[i] for i in sample_page_numbers(len(pages), service.boilerplate_sample_pages)])
+        cleaned = []
+        for page_index, page in enumerate(pages):
+            cleaned.extend(text for _, text in boilerplate_filter.feed(page_index, page))
+        cleaned.extend(text for _, text in boilerplate_filter.flush())
+        return cleaned
+
+    cleaned, result = measure(document, "boilerplate", page_count, remove_boilerplate)
+    result.recall, result.text = text_recall(truth, ["\n".join(cleaned)])
+    results.append(result)
+
+    windows, result = measure(document, "windows", page_count, lambda: service.get_windows(cleaned))
+    result.recall, result.text = text_recall(truth, [window.text for window in windows])
+    results.append(result)
+
+    def process():
+        return asyncio.run(service.process_data(pages, collection_id=None, task_id=None))
+
+    items, result = measure(document, "process", page_count, process)
+    result.recall, result.text = item_recall(truth, items)
+    results.append(result)
+
+    resolved, result = measure(document, "references", page_count, lambda: resolve_references(items))
+    result.recall = reference_accuracy(truth, resolved)
+    results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="generated PDFs with their ground truth JSON next to them")
+    parser.add_argument("--generate", type=int, nargs="+", default=[], help="page counts of documents to generate first")
+    parser.add_argument("--directory", default="benchmarks/data", help="where generated documents are written")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--modes", nargs="+", default=["layout", "fast"], help="extraction modes, the first feeds the later stages")
+    parser.add_argument("--no-tables", action="store_true", help="extract without rebuilding table rows")
+    parser.add_argument("--token-budget", type=int, help="window token budget, WINDOW_TOKEN_BUDGET by default")
+    parser.add_argument("--json", help="write all stage results to this file")
+    args = parser.parse_args()
+
+    pdfs = list(args.pdfs)
+    if args.generate:
+        os.makedirs(args.directory, exist_ok=True)
+    for pages in args.generate:
+        pdf_path = os.path.join(args.directory, f"lv_{pages}.pdf")
+        generate_lv(pdf_path, pages, seed=args.seed)
+        pdfs.append(pdf_path)
+    if not pdfs:
+        parser.error("give PDFs or --generate page counts")
+
+    results: List[StageResult] = []
+    for pdf_path in pdfs:
+        document_results = benchmark_document(
+            pdf_path,
+            modes=args.modes,
+            tables=not args.no_tables,
+            token_budget=args.token_budget,
+        )
+        print(f"{pdf_path}: {document_results[0].pages} pages")
+        for result in document_results:
+            print(result)
+        results.extend(document_results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([{**asdict(r), "pages_per_second": r.pages_per_second} for r in results], f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
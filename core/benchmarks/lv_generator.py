@@ -0,0 +1,522 @@
+"""
+Generator of synthetic Leistungsverzeichnis PDFs with ground truth.
+
+Customer documents cannot be shared, so the benchmarks run on generated ones.
+A document has a cover page and preliminary remarks without Ordnungszahlen,
+then Lose, Titel and Untertitel with positions laid out as a table (OZ, text,
+quantity, unit price and total price fields). Positions run over page breaks,
+carry "wie Pos." and "wie vor" references, Wahlpositionen, Bedarfspositionen
+and Zulagen, hyphenated words and door lists as inner tables. Every page has
+a repeated header and footer.
+
+Next to every PDF a JSON file of the same name holds the ground truth: all
+groups and positions with their ref_no, description, quantity, unit, kind,
+referenced position and 1-based pages.
+
+The PDF is written by a minimal writer with the standard Helvetica fonts, so
+no dependency is needed beyond the standard library.
+
+Run from the core directory:
+    python -m benchmarks.lv_generator benchmarks/data --pages 10 200 2000
+"""
+import argparse
+import json
+import os
+import random
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+FONT_SIZE = 9
+LINE_HEIGHT = 11
+BODY_TOP = 780
+BODY_BOTTOM = 70
+# x of the columns: Ordnungszahl, text, quantity, unit price, total price
+COLUMNS = (50, 110, 400, 470, 530)
+TEXT_WIDTH = 56
+# The short text shares its row with the quantity column
+SHORT_TEXT_WIDTH = 50
+PLACEHOLDER = "........"
+
+PROJECT = "Neubau Verwaltungsgebäude Musterstadt, Bauabschnitt II"
+TABLE_HEAD = tuple(zip(COLUMNS, ("OZ", "Leistungsbeschreibung", "Menge ME", "EP", "GP")))
+
+SENTENCES = (
+    "Liefern und fachgerecht einbauen, einschließlich aller Neben- und Befestigungsmaterialien.",
+    "Ausführung gemäß DIN {din} sowie den Verarbeitungsrichtlinien des Herstellers.",
+    "Oberfläche {surface}, Farbton nach Wahl des Auftraggebers aus der Standardpalette.",
+    "Einbauort: {floor}, Achse {axis}, gemäß Ausführungsplanung des Architekten.",
+    "Die Leistung ist einschließlich Transport, Abladen und Lagern auf der Baustelle anzubieten.",
+    "Anschlussfugen dauerelastisch verschließen, Materialverträglichkeit ist nachzuweisen.",
+    "Abrechnung nach tatsächlich ausgeführten Mengen gemäß Aufmaß.",
+    "Schutzmaßnahmen für angrenzende Bauteile während der Ausführung sind einzukalkulieren.",
+    "Sämtliche Prüfzeugnisse und Verwendbarkeitsnachweise sind vor Ausführung vorzulegen.",
+    "Arbeitshöhe bis {height} m über Fußbodenoberkante, erforderliche Gerüste gesondert.",
+    "Brandschutzanforderungen entsprechend Brandschutzkonzept, Feuerwiderstandsklasse {fire}.",
+    "Untergrund vor Beginn der Arbeiten auf Eignung prüfen, Bedenken schriftlich anmelden.",
+    "Die Leistung umfasst auch das Herstellen sämtlicher Aussparungen und Durchdringungen.",
+    "Toleranzen im Hochbau nach DIN 18202 sind einzuhalten.",
+    "Entsorgung von Verpackungsmaterial und Reststoffen einschließlich Deponiegebühren.",
+)
+
+# Gewerk -> (Titel, [(Kurztext, unit choices, (min, max) quantity, decimals)])
+TRADES: Tuple[Tuple[str, Tuple[str, ...], Tuple[Tuple[str, Tuple[str, ...], Tuple[float, float], int], ...]], ...] = (
+    ("Rohbau", ("Erdarbeiten", "Mauerarbeiten", "Stahlbetonarbeiten"), (
+        ("Oberboden abtragen, Dicke bis {depth} cm", ("m²",), (50, 2500), 2),
+        ("Baugrubenaushub Bodenklasse {soil}", ("m³",), (20, 1800), 3),
+        ("Mauerwerk Kalksandstein, Wanddicke {thickness} cm", ("m²", "m³"), (10, 900), 2),
+        ("Stahlbeton C25/30 für Wände, Dicke {thickness} cm", ("m³",), (5, 400), 3),
+        ("Schalung für Stahlbetonwände, glatt", ("m²",), (20, 1500), 2),
+        ("Betonstahl B500B liefern, schneiden, biegen und verlegen", ("t",), (1, 80), 3),
+        ("Sturz aus Stahlbeton, Länge bis {length} m", ("Stk", "St"), (2, 60), 0),
+    )),
+    ("Türen", ("Holztüren", "Stahltüren", "Beschläge"), (
+        ("Innentür Holz, Türblatt {door_width} x {door_height} mm", ("Stk",), (1, 40), 0),
+        ("Stahlzarge als Umfassungszarge für Wanddicke {thickness} cm", ("Stk",), (1, 40), 0),
+        ("Stahltür T30-1-RS, lichte Durchgangsbreite {door_width} mm", ("Stk",), (1, 12), 0),
+        ("Drückergarnitur Edelstahl, Rosettengarnitur", ("Stk", "Paar"), (1, 60), 0),
+        ("Obentürschließer mit Gleitschiene EN 1154", ("Stk",), (1, 30), 0),
+        ("Türstopper Edelstahl, Bodenmontage", ("Stk",), (1, 60), 0),
+    )),
+    ("Trockenbau", ("Ständerwände", "Unterdecken"), (
+        ("Metallständerwand, Wanddicke {wall} mm, doppelt beplankt", ("m²",), (10, 1200), 2),
+        ("Unterdecke aus Gipskartonplatten, abgehängt", ("m²",), (10, 1500), 2),
+        ("Revisionsöffnung {opening} x {opening} mm", ("Stk",), (1, 40), 0),
+        ("Anschlussprofil an Massivbauteile", ("m", "lfm"), (5, 600), 2),
+    )),
+    ("Malerarbeiten", ("Innenanstriche", "Lackierungen"), (
+        ("Dispersionsanstrich auf Putz, zweifach", ("m²",), (50, 5000), 2),
+        ("Tiefengrund auf saugenden Untergründen", ("m²",), (50, 5000), 2),
+        ("Lackierung Stahlzarge, Farbton RAL {ral}", ("Stk",), (1, 80), 0),
+        ("Abdeckarbeiten an Fenstern und Böden", ("psch",), (1, 1), 0),
+    )),
+    ("Bodenbeläge", ("Estricharbeiten", "Linoleum"), (
+        ("Zementestrich CT-C25-F4, Dicke {screed} mm", ("m²",), (20, 2500), 2),
+        ("Linoleumbelag {lino} mm, vollflächig verklebt", ("m²",), (20, 2500), 2),
+        ("Sockelleiste Hartholz, Höhe 60 mm", ("m", "lfm"), (10, 900), 2),
+        ("Trennschiene Edelstahl an Belagswechseln", ("m",), (1, 60), 2),
+    )),
+    ("Elektro", ("Leitungsanlagen", "Beleuchtung"), (
+        ("Mantelleitung NYM-J 3x1,5 mm², auf Putz verlegt", ("m",), (50, 4000), 0),
+        ("Kabelrinne Stahl verzinkt, Breite {tray} mm", ("m",), (10, 600), 2),
+        ("LED-Einbauleuchte, Lichtstrom {lumen} lm", ("Stk",), (1, 200), 0),
+        ("Schalterprogramm reinweiß, Wechselschalter", ("Stk",), (1, 120), 0),
+        ("Inbetriebnahme und Einweisung des Betreiberpersonals", ("psch", "h"), (1, 24), 0),
+    )),
+)
+
+VARIATIONS = (
+    "jedoch Wanddicke {thickness} cm",
+    "jedoch Oberfläche {surface}",
+    "jedoch Einbauort {floor}",
+    "jedoch Ausführung in RAL {ral}",
+    "jedoch Höhe bis {height} m",
+    "jedoch Feuerwiderstandsklasse {fire}",
+)
+
+ATTRIBUTES = {
+    "din": ("18340", "18352", "18355", "18357", "18363", "18365", "4102", "1053"),
+    "surface": ("glatt gespachtelt", "feinstrukturiert", "geschliffen und lackiert", "pulverbeschichtet", "matt"),
+    "floor": ("Erdgeschoss", "1. Obergeschoss", "2. Obergeschoss", "Untergeschoss", "Dachgeschoss"),
+    "axis": ("A-C", "C-F", "1-4", "4-9", "B-D"),
+    "height": ("3,5", "4,0", "6,5", "8,0"),
+    "fire": ("F30", "F60", "F90", "EI 30", "EI 90"),
+    "depth": ("20", "30", "40"),
+    "soil": ("3", "4", "5"),
+    "thickness": ("11,5", "17,5", "24", "30", "36,5"),
+    "length": ("1,5", "2,0", "2,5", "3,5"),
+    "door_width": ("885", "1.010", "1.135", "1.260"),
+    "door_height": ("2.135", "2.260"),
+    "wall": ("100", "125", "150", "205"),
+    "opening": ("300", "400", "600"),
+    "ral": ("9010", "9016", "7016", "7035"),
+    "screed": ("45", "50", "65"),
+    "lino": ("2,5", "3,2", "4,0"),
+    "tray": ("100", "200", "300"),
+    "lumen": ("1.800", "2.500", "3.600"),
+}
+
+
+@dataclass
+class GroundTruthPosition:
+    ref_no: str
+    short_text: str
+    description: str
+    quantity: float
+    unit: str
+    # "normal", "alternative" (Wahlposition), "contingency" (Bedarfsposition) or "supplement" (Zulage)
+    kind: str = "normal"
+    # ref_no of the position a "wie Pos." or "wie vor" reference points to
+    references: Optional[str] = None
+    # ref_no of the base position of an alternative or supplement
+    base_ref_no: Optional[str] = None
+    table: List[List[str]] = field(default_factory=list)
+    pages: List[int] = field(default_factory=list)
+
+
+@dataclass
+class GroundTruthGroup:
+    ref_no: str
+    title: str
+    page: int
+
+
+def pdf_string(text: str) -> bytes:
+    """Text as a PDF literal string in WinAnsiEncoding"""
+    raw = text.encode("cp1252", "replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class PdfWriter:
+    """
+    Minimal PDF writer for pages of positioned text.
+
+    Pages are written to the file as they are added, only their object numbers
+    are kept, so documents of thousands of pages need little memory. Fonts are
+    the standard Helvetica and Helvetica-Bold, which every reader has built in.
+    """
+
+    CATALOG, PAGES, FONT, BOLD_FONT = 1, 2, 3, 4
+
+    def __init__(self, path: str):
+        self.file = open(path, "wb")
+        self.offsets: Dict[int, int] = {}
+        self.page_objects: List[int] = []
+        self.next_object = 5
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _object(self, number: int, body: bytes):
+        self.offsets[number] = self.file.tell()
+        self.file.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    def add_page(self, content: bytes):
+        stream, page = self.next_object, self.next_object + 1
+        self.next_object += 2
+        compressed = zlib.compress(content)
+        self._object(
+            stream,
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(compressed) + compressed + b"\nendstream",
+        )
+        self._object(
+            page,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> >>"
+            % (self.PAGES, PAGE_WIDTH, PAGE_HEIGHT, stream, self.FONT, self.BOLD_FONT),
+        )
+        self.page_objects.append(page)
+
+    def close(self):
+        for number, name in ((self.FONT, b"Helvetica"), (self.BOLD_FONT, b"Helvetica-Bold")):
+            self._object(number, b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % name)
+        kids = b" ".join(b"%d 0 R" % number for number in self.page_objects)
+        self._object(self.PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.page_objects)))
+        self._object(self.CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGES)
+
+        xref = self.file.tell()
+        self.file.write(b"xref\n0 %d\n0000000000 65535 f \n" % self.next_object)
+        for number in range(1, self.next_object):
+            self.file.write(b"%010d 00000 n \n" % self.offsets[number])
+        self.file.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self.next_object, self.CATALOG, xref)
+        )
+        self.file.close()
+
+
+class PageLayout:
+    """
+    Places text lines top to bottom and breaks pages.
+
+    Page content is kept as encoded text operators until the document is
+    finished, then every page gets its header and the "Seite n von m" footer.
+    """
+
+    def __init__(self):
+        self.pages: List[List[bytes]] = []
+        self.y = 0.0
+        self.new_page()
+
+    @property
+    def page_number(self) -> int:
+        return len(self.pages)
+
+    def new_page(self):
+        self.pages.append([])
+        self.y = BODY_TOP
+
+    def keep(self, lines: int):
+        """Break the page unless `lines` more lines fit, e.g. to keep a heading with its first position"""
+        if self.y - lines * LINE_HEIGHT < BODY_BOTTOM:
+            self.new_page()
+
+    def gap(self, lines: float = 1):
+        self.y -= lines * LINE_HEIGHT
+
+    def line(self, cells: List[Tuple[float, str]], bold: bool = False, size: int = FONT_SIZE) -> int:
+        """Write one row of (x, text) cells, returns the 1-based page it landed on"""
+        if self.y < BODY_BOTTOM:
+            self.new_page()
+        self.pages[-1].append(text_operators(cells, self.y, bold, size))
+        self.y -= max(LINE_HEIGHT, size + 2)
+        return self.page_number
+
+    def write(self, path: str, stand: str):
+        writer = PdfWriter(path)
+        total = len(self.pages)
+        for number, operators in enumerate(self.pages, start=1):
+            header = [
+                text_operators([(COLUMNS[0], PROJECT), (470, "Leistungsverzeichnis")], 815, False, 8),
+                text_operators(list(TABLE_HEAD), 800, True, 8),
+            ]
+            footer = [
+                text_operators([(COLUMNS[0], f"Stand: {stand}"), (250, f"Seite {number} von {total}")], 45, False, 8),
+                text_operators([(COLUMNS[0], "Stempel und Unterschrift des Bieters: ........................")], 33, False, 8),
+            ]
+            writer.add_page(b"".join(header + operators + footer))
+        writer.close()
+
+
+def text_operators(cells: List[Tuple[float, str]], y: float, bold: bool, size: int) -> bytes:
+    font = b"/F2" if bold else b"/F1"
+    return b"".join(
+        b"BT %s %d Tf %.1f %.1f Td %s Tj ET\n" % (font, size, x, y, pdf_string(text)) for x, text in cells if text
+    )
+
+
+def format_quantity(quantity: float, decimals: int) -> str:
+    """German number format, 1.250,500"""
+    formatted = f"{quantity:,.{decimals}f}"
+    return formatted.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+class LvGenerator:
+    """
+    Produces the content of one document with a seeded random generator, so a
+    seed and a page count always give the same PDF and ground truth.
+    """
+
+    def __init__(self, pages: int, seed: int = 7, hyphenation: float = 0.3):
+        self.target_pages = pages
+        self.rng = random.Random(seed)
+        self.hyphenation = hyphenation
+        self.layout = PageLayout()
+        self.positions: List[GroundTruthPosition] = []
+        self.groups: List[GroundTruthGroup] = []
+
+    def fill(self, template: str) -> str:
+        return template.format(**{key: self.rng.choice(values) for key, values in ATTRIBUTES.items()})
+
+    def wrap(self, text: str, width: int = TEXT_WIDTH) -> List[str]:
+        """Greedy line wrap that sometimes hyphenates a long word at the line end, like a typesetter would"""
+        lines: List[str] = []
+        line = ""
+        for word in text.split():
+            candidate = f"{line} {word}" if line else word
+            if len(candidate) <= width:
+                line = candidate
+                continue
+            room = width - len(line) - 2
+            if line and len(word) >= 10 and word.isalpha() and room >= 4 and self.rng.random() < self.hyphenation:
+                cut = self.rng.randint(4, min(room, len(word) - 4))
+                lines.append(f"{line} {word[:cut]}-")
+                line = word[cut:]
+            else:
+                if line:
+                    lines.append(line)
+                line = word
+        if line:
+            lines.append(line)
+        return lines
+
+    def generate(self) -> Dict:
+        self.cover()
+        los = 0
+        while self.layout.page_number < self.target_pages:
+            los += 1
+            self.lot(los)
+        return {
+            "project": PROJECT,
+            "page_count": self.layout.page_number,
+            "groups": [asdict(group) for group in self.groups],
+            "positions": [asdict(position) for position in self.positions],
+        }
+
+    def cover(self):
+        layout = self.layout
+        layout.gap(6)
+        layout.line([(COLUMNS[0], "Leistungsverzeichnis")], bold=True, size=18)
+        layout.gap()
+        for text in (PROJECT, "Bauherr: Stadtwerke Musterstadt GmbH", "Architekt: Planungsbüro Beispiel und Partner", "Vergabenummer: VG-2025-0417"):
+            layout.line([(COLUMNS[0], text)], size=11)
+        layout.new_page()
+
+        layout.line([(COLUMNS[0], "Vorbemerkungen")], bold=True, size=12)
+        layout.gap()
+        remarks = max(1, min(6, self.target_pages // 50))
+        for _ in range(remarks * 8):
+            paragraph = " ".join(self.fill(self.rng.choice(SENTENCES)) for _ in range(self.rng.randint(3, 6)))
+            for text in self.wrap(paragraph, width=95):
+                layout.line([(COLUMNS[0], text)])
+            layout.gap(0.5)
+        layout.new_page()
+
+    def heading(self, ref_no: str, title: str):
+        self.layout.gap()
+        self.layout.keep(6)
+        page = self.layout.line([(COLUMNS[0], ref_no), (COLUMNS[1], title)], bold=True)
+        self.groups.append(GroundTruthGroup(ref_no=ref_no, title=title, page=page))
+        self.layout.gap(0.5)
+
+    def lot(self, los: int):
+        name, titles, templates = TRADES[(los - 1) % len(TRADES)]
+        lot_ref = f"{los:02d}"
+        self.layout.keep(8)
+        self.layout.line([(COLUMNS[0], f"Los {lot_ref} {name}")], bold=True, size=11)
+        for titel, title in enumerate(titles, start=1):
+            titel_ref = f"{lot_ref}.{titel:02d}"
+            self.heading(titel_ref, title)
+            if self.rng.random() < 0.3:
+                for untertitel in range(1, self.rng.randint(2, 3) + 1):
+                    group_ref = f"{titel_ref}.{untertitel:02d}"
+                    self.heading(group_ref, f"{title}, Bauteil {untertitel}")
+                    self.title_positions(group_ref, templates)
+            else:
+                self.title_positions(titel_ref, templates)
+            self.layout.gap()
+            self.layout.line([(COLUMNS[0], f"Summe {titel_ref} {title}"), (COLUMNS[4], PLACEHOLDER)], bold=True)
+            if self.layout.page_number >= self.target_pages:
+                return
+
+    def title_positions(self, group_ref: str, templates):
+        in_group: List[GroundTruthPosition] = []
+        for number in range(1, self.rng.randint(6, 18) + 1):
+            if self.layout.page_number >= self.target_pages:
+                return
+            ref_no = f"{group_ref}.{number * 10:04d}"
+            in_group.append(self.position(ref_no, templates, in_group))
+
+    def position(self, ref_no: str, templates, in_group: List[GroundTruthPosition]) -> GroundTruthPosition:
+        rng = self.rng
+        short_template, units, (low, high), decimals = rng.choice(templates)
+        short_text = self.fill(short_template)
+        kind, references, base, marker = "normal", None, None, None
+
+        roll = rng.random()
+        if in_group and roll < 0.10:
+            target = rng.choice(in_group)
+            # Short references name the position within the group only
+            label = target.ref_no.rsplit(".", 1)[1] if rng.random() < 0.5 else target.ref_no
+            short_text = f"wie Pos. {label}, {self.fill(rng.choice(VARIATIONS))}"
+            references = target.ref_no
+        elif in_group and roll < 0.13:
+            short_text = f"wie vor, {self.fill(rng.choice(VARIATIONS))}"
+            references = in_group[-1].ref_no
+        elif in_group and roll < 0.18:
+            base = rng.choice(in_group)
+            kind, base = "alternative", base.ref_no
+            marker = f"Wahlposition zu Pos. {base}, nur Einheitspreis."
+        elif roll < 0.22:
+            kind, marker = "contingency", "Bedarfsposition, nur Einheitspreis, Ausführung nur auf Anordnung."
+        elif in_group and roll < 0.26:
+            base = rng.choice(in_group).ref_no
+            kind = "supplement"
+            short_text = f"Zulage zu Pos. {base} für {self.fill(rng.choice(VARIATIONS))[7:]}"
+
+        if decimals:
+            quantity = round(rng.uniform(low, high), decimals)
+        else:
+            quantity = float(rng.randint(int(low), int(high)))
+        unit = rng.choice(units)
+        price_cells = (PLACEHOLDER, "nur EP") if kind in ("alternative", "contingency") else (PLACEHOLDER, PLACEHOLDER)
+
+        long_text = " ".join(self.fill(sentence) for sentence in rng.sample(SENTENCES, rng.randint(2, 9)))
+        if marker:
+            long_text = f"{marker} {long_text}"
+        table = self.door_list() if "Tür" in short_template and rng.random() < 0.4 else []
+
+        layout = self.layout
+        layout.keep(3)
+        short_lines = self.wrap(short_text, SHORT_TEXT_WIDTH)
+        pages = {layout.line([
+            (COLUMNS[0], ref_no),
+            (COLUMNS[1], short_lines[0]),
+            (COLUMNS[2], f"{format_quantity(quantity, decimals)} {unit}"),
+            (COLUMNS[3], price_cells[0]),
+            (COLUMNS[4], price_cells[1]),
+        ])}
+        for text in short_lines[1:] + self.wrap(long_text):
+            pages.add(layout.line([(COLUMNS[1], text)]))
+        if table:
+            pages.add(layout.line([(COLUMNS[1], "Türliste:")]))
+            for row in table:
+                pages.add(layout.line([(x, cell) for x, cell in zip((COLUMNS[1], 170, 230, 290, 350), row)]))
+        if rng.random() < 0.5:
+            pages.add(layout.line([(COLUMNS[1], "Angebotenes Fabrikat/Typ: ................................")]))
+        layout.gap(0.5)
+
+        description = " ".join([short_text, long_text] + ([" ".join(" ".join(row) for row in table)] if table else []))
+        position = GroundTruthPosition(
+            ref_no=ref_no,
+            short_text=short_text,
+            description=description,
+            quantity=quantity,
+            unit=unit,
+            kind=kind,
+            references=references,
+            base_ref_no=base,
+            table=table,
+            pages=sorted(pages),
+        )
+        self.positions.append(position)
+        return position
+
+    def door_list(self) -> List[List[str]]:
+        rows = [["Tür-Nr.", "Breite", "Höhe", "Anschlag", "Anzahl"]]
+        for _ in range(self.rng.randint(2, 8)):
+            rows.append([
+                f"T{self.rng.randint(0, 3)}.{self.rng.randint(1, 40):02d}",
+                f"{self.rng.choice(ATTRIBUTES['door_width'])} mm",
+                f"{self.rng.choice(ATTRIBUTES['door_height'])} mm",
+                self.rng.choice(("DIN links", "DIN rechts")),
+                f"{self.rng.randint(1, 4)} Stk",
+            ])
+        return rows
+
+
+def ground_truth_path(pdf_path: str) -> str:
+    return f"{os.path.splitext(pdf_path)[0]}.json"
+
+
+def generate_lv(pdf_path: str, pages: int, seed: int = 7, hyphenation: float = 0.3) -> Dict:
+    """
+    Write a synthetic LV of about `pages` pages to `pdf_path` and its ground
+    truth next to it, see ground_truth_path. Positions are added until the
+    page is reached, the last one may run a page further. Returns the ground truth.
+    """
+    generator = LvGenerator(pages=pages, seed=seed, hyphenation=hyphenation)
+    truth = generator.generate()
+    truth["seed"] = seed
+    generator.layout.write(pdf_path, stand="14.03.2025")
+    with open(ground_truth_path(pdf_path), "w", encoding="utf-8") as f:
+        json.dump(truth, f, ensure_ascii=False, indent=1)
+    return truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 200, 2000])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--hyphenation", type=float, default=0.3, help="share of long words hyphenated at a line end")
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    for pages in args.pages:
+        pdf_path = os.path.join(args.directory, f"lv_{pages}.pdf")
+        truth = generate_lv(pdf_path, pages, seed=args.seed, hyphenation=args.hyphenation)
+        print(f"{pdf_path}: {truth['page_count']} pages, {len(truth['positions'])} positions, {len(truth['groups'])} groups")
+
+
+if __name__ == "__main__":
+    main()
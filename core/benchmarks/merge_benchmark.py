@@ -0,0 +1,127 @@
+"""
+Benchmark of the ref_no merge step of DataProcessingService.process_data.
+
+Builds a synthetic stream of parsed window items in which every position is
+split over overlapping windows, then merges it once with the legacy
+substring/concatenation merge and once with the ItemMerger.
+
+Run from the core directory:
+    python -m benchmarks.merge_benchmark --positions 5000
+    python -m benchmarks.merge_benchmark --positions 5000 --words 1200 --fragments 240
+
+Both outputs are checked against the descriptions the stream was cut from:
+the ItemMerger has to rebuild every description exactly, the legacy merge
+its known output, every distinct fragment appended with the overlapping
+words repeated. Both have to agree on the positions, their order and
+quantities.
+
+The legacy merge rescans and copies the whole description for every
+fragment, so its time grows with the square of the fragments per position,
+while the ItemMerger only looks at the last fragment. With few fragments per
+position the legacy merge is ahead on constant factors, the ItemMerger also
+searches the overlap of every fragment and records the pages of every
+position, and wins from about 120 fragments on.
+"""
+import argparse
+import random
+import time
+from typing import Dict, List, Tuple
+
+from app.models.models import ItemChunkDto
+from app.services.processing.item_merger import ItemMerger
+
+WORDS = (
+    "Holztür Stahlzarge Türblatt Drückergarnitur Edelstahl Obentürschließer Bänder "
+    "Schallschutz Rauchschutz Beschichtung Lieferung Montage Einbau Oberfläche Furnier "
+    "Buche Eiche lackiert Zargenfalz Dichtung Schloss Profilzylinder Wandanschluss"
+).split()
+
+
+def build_windows(
+    positions: int, words_per_position: int, fragments: int, seed: int
+) -> Tuple[List[Tuple[List[ItemChunkDto], range]], Dict[str, Tuple[str, str]]]:
+    """
+    Items per window. Every description is cut into `fragments` pieces that overlap
+    by a few words, and every piece is seen twice as the overlap page repeats it.
+
+    Also returns, per ref_no, the full description and the legacy merge result.
+    """
+    rng = random.Random(seed)
+    windows = []
+    expected = {}
+    for index in range(positions):
+        ref_no = f"{index // 1000 + 1}.{index // 100 % 10 + 1}.{index % 100 + 1}0"
+        words = [rng.choice(WORDS) for _ in range(words_per_position)]
+        step = max(1, words_per_position // fragments)
+        page = index // 8 + 1
+        pieces = []
+        for number, cut in enumerate(range(0, words_per_position, step)):
+            overlap = rng.randint(3, 8) if cut else 0
+            piece = " ".join(words[max(0, cut - overlap) : cut + step])
+            pages = range(page + number, page + number + 2)
+            for _ in range(2):
+                windows.append(([ItemChunkDto(ref_no=ref_no, description=piece, quantity=1, unit="Stk")], pages))
+            legacy_text = " ".join(pieces)
+            if piece not in legacy_text:
+                pieces.append(piece)
+        expected[ref_no] = (" ".join(words), " ".join(pieces))
+    return windows, expected
+
+
+def check(name: str, items: List[ItemChunkDto], descriptions: Dict[str, str]):
+    """Compare the merged items with the expected descriptions per ref_no, in order"""
+    assert [item.ref_no for item in items] == list(descriptions), f"{name}: positions differ"
+    assert all(item.quantity == 1 and item.unit == "Stk" for item in items), f"{name}: quantities differ"
+    wrong = [item.ref_no for item in items if item.description != descriptions[item.ref_no]]
+    assert not wrong, f"{name}: {len(wrong)} descriptions differ, first {wrong[0]}"
+
+
+def legacy_merge(windows) -> List[ItemChunkDto]:
+    seen = {}
+    final_items = []
+    for items, _ in windows:
+        for item in items:
+            ref = item.ref_no.strip()
+            desc = item.description.strip()
+            if ref not in seen:
+                seen[ref] = ItemChunkDto(ref_no=ref, description=desc, quantity=item.quantity, unit=item.unit)
+                final_items.append(seen[ref])
+            else:
+                existing_desc = seen[ref].description
+                if desc not in existing_desc:
+                    seen[ref].description = f"{existing_desc.strip()} {desc}".strip()
+    return final_items
+
+
+def merger_merge(windows) -> List[ItemChunkDto]:
+    merger = ItemMerger()
+    for items, pages in windows:
+        merger.add(items, pages=pages)
+    return merger.items()
+
+
+def run(positions: int, words_per_position: int, fragments: int, seed: int):
+    # Column of the expected descriptions, the legacy merge repeats the overlapping words
+    for name, merge, column in (("legacy", legacy_merge, 1), ("item_merger", merger_merge, 0)):
+        windows, expected = build_windows(positions, words_per_position, fragments, seed)
+        started = time.perf_counter()
+        items = merge(windows)
+        elapsed = time.perf_counter() - started
+        check(name, items, {ref_no: texts[column] for ref_no, texts in expected.items()})
+        total_chars = sum(len(item.description) for item in items)
+        print(
+            f"{name:12s} positions={len(items):6d} time={elapsed:8.3f}s "
+            f"description_chars={total_chars:10d}"
+        )
+    source_chars = sum(len(description) for description, _ in expected.values())
+    print(f"{'source':12s} positions={len(expected):6d} {'':15s} description_chars={source_chars:10d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=120, help="words per position description")
+    parser.add_argument("--fragments", type=int, default=6, help="windows a position is split over")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.positions, args.words, args.fragments, args.seed)
@@ -5,7 +5,9 @@ from fastapi.concurrency import asynccontextmanager
 from app.handlers.files import fileRouter
 from app.handlers.data import dataRouter
 from app.handlers.task import taskRouter
-from app.services.mongo_db import MongoDBService
+from app.handlers.collections import collectionRouter
+from app.services.async_mongo_db import get_db_service
+from app.services.mongo_client import close_async_mongo_client, close_mongo_client, open_async_mongo_client
 from app.envirnoment import config
 
 
@@ -17,21 +19,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-# Create a dependency for the MongoDB service
-def get_db_service():
-    """Dependency to get MongoDB service instance"""
-    return MongoDBService()
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # STARTUP tasks
     logger.info("Starting Document Processing API")
     try:
-        # Example: Check and set up DB
+        # One pooled async client for all requests of this process
+        open_async_mongo_client()
         db = get_db_service()
-        db._setup_indexes()
+        await db._setup_indexes()
         logger.info("MongoDB indexes created")
+        # Files written before items had their own collection
+        await db.migrate_embedded_items()
 
         # You could also initialize redis/rabbitmq here
         # await redis.ping()
@@ -44,6 +43,9 @@ async def lifespan(app: FastAPI):
 
     # SHUTDOWN tasks
     logger.info("Shutting down Document Processing API")
+    await close_async_mongo_client()
+    # Opened on demand when a request used a sync service
+    close_mongo_client()
     # Cleanup logic if needed
     # await redis.close()
     # await rabbitmq.disconnect()
@@ -64,11 +66,14 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Cursor of the next page of GET /tasks/
+        expose_headers=["X-Next-Cursor"],
     )
 
     app.include_router(fileRouter)
     app.include_router(dataRouter)
     app.include_router(taskRouter)
+    app.include_router(collectionRouter)
 
     return app
 
@@ -0,0 +1,28 @@
+from app.services.processing.boilerplate import BoilerplateFilter
+
+
+def body_page(number: int) -> str:
+    return "\n".join(
+        [
+            "Leistungsverzeichnis Neubau Schule",
+            f"1.{number}0 Holztür einflügelig",
+            f"Türblatt Röhrenspan, Breite {number}0 cm",
+            f"{number} Stk",
+            f"12.03.2024 Projekt Neubau Schule Seite {number} von 20",
+        ]
+    )
+
+
+def test_dated_footer_is_removed():
+    pages = [body_page(number) for number in range(1, 9)]
+    boilerplate_filter = BoilerplateFilter(sample_pages=8)
+    boilerplate_filter.fit(pages)
+    cleaned = boilerplate_filter.clean(pages[2])
+    assert cleaned.splitlines() == ["1.30 Holztür einflügelig", "Türblatt Röhrenspan, Breite 30 cm", "3 Stk"]
+
+
+def test_fitted_filter_releases_pages_right_away():
+    boilerplate_filter = BoilerplateFilter(sample_pages=8)
+    boilerplate_filter.fit([body_page(number) for number in range(5, 13)])
+    assert boilerplate_filter.feed(0, "Deckblatt\nAusschreibung Türen") == [(0, "Deckblatt\nAusschreibung Türen")]
+    assert boilerplate_filter.flush() == []
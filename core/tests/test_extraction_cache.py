@@ -0,0 +1,32 @@
+import os
+import time
+
+from app.services.processing.extraction_cache import ExtractionCache
+
+
+def test_store_and_read(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=1024 * 1024)
+    pages = ["Seite 1", "Seite 2"]
+
+    assert list(cache.store("abc", iter(pages))) == pages
+
+    meta = cache.get_metadata("abc")
+    assert meta.page_count == 2
+    assert list(cache.iter_pages("abc")) == pages
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_evict_removes_stale_tmp_files(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=1024 * 1024, max_tmp_age_s=60)
+    stale = tmp_path / "dead.pages.jsonl.gz.123.tmp"
+    running = tmp_path / "live.pages.jsonl.gz.456.tmp"
+    stale.write_text("x")
+    running.write_text("x")
+    old = time.time() - 120
+    os.utime(stale, (old, old))
+
+    list(cache.store("abc", iter(["Seite 1"])))
+
+    assert not stale.exists()
+    assert running.exists()
+    assert cache.get_metadata("abc") is not None
@@ -0,0 +1,45 @@
+from app.models.models import ItemChunkDto
+from app.services.processing.item_merger import ItemMerger, normalize_whitespace, suffix_prefix_overlap
+
+
+def chunk(ref_no: str, description: str, quantity: float = 0) -> ItemChunkDto:
+    return ItemChunkDto(ref_no=ref_no, description=description, quantity=quantity, unit="Stk" if quantity else "")
+
+
+def test_suffix_prefix_overlap():
+    assert suffix_prefix_overlap("Holztür mit Stahlzarge", "Stahlzarge und Drücker", min_overlap=5) == len("Stahlzarge")
+    assert suffix_prefix_overlap("Holztür", "Stahlzarge", min_overlap=3) == 0
+
+
+def test_normalize_whitespace():
+    for text in ("Holztür mit Zarge", " Holztür", "Holztür ", "Holztür  mit", "Holztür\nmit", "Holztür\xa0mit", ""):
+        assert normalize_whitespace(text) == " ".join(text.split())
+
+
+def test_overlapping_fragments_are_joined_once():
+    merger = ItemMerger(min_overlap=8)
+    merger.add([chunk("1.10", "Holztür einflügelig mit Stahlzarge")], pages=range(1, 3))
+    merger.add([chunk("1.10", "mit Stahlzarge, Oberfläche CPL weiß", quantity=3)], pages=range(2, 4))
+    item = merger.get("1.10")
+    assert item.description == "Holztür einflügelig mit Stahlzarge, Oberfläche CPL weiß"
+    assert item.quantity == 3
+    assert item.source_pages == [1, 2, 3]
+
+
+def test_replaced_fragment_overlaps_with_the_one_before():
+    merger = ItemMerger(min_overlap=8)
+    merger.add([chunk("1.10", "Holztür einflügelig mit Stahlzarge")], pages=[1])
+    merger.add([chunk("1.10", "Oberfläche CPL weiß")], pages=[2])
+    # A later window saw the second fragment with the overlapping text in front of it
+    merger.add([chunk("1.10", "mit Stahlzarge Oberfläche CPL weiß, Drücker Edelstahl")], pages=[2])
+    merger.add([chunk("1.10", "Drücker Edelstahl, Türstopper")], pages=[3])
+    assert merger.get("1.10").description == (
+        "Holztür einflügelig mit Stahlzarge Oberfläche CPL weiß, Drücker Edelstahl, Türstopper"
+    )
+
+
+def test_verbatim_repeat_only_adds_pages():
+    merger = ItemMerger()
+    assert merger.add([chunk("1.10", "Holztür")], pages=[1]) == ["1.10"]
+    assert merger.add([chunk("1.10", "Holztür")], pages=[2]) == []
+    assert merger.get("1.10").source_pages == [1, 2]
@@ -0,0 +1,11 @@
+from app.services.processing.pdf_extraction import iter_pages, iter_pages_parallel
+from benchmarks.lv_generator import generate_lv
+
+
+def test_parallel_extraction_matches_sequential(tmp_path):
+    pdf_path = str(tmp_path / "lv.pdf")
+    generate_lv(pdf_path, 4, seed=3)
+    sequential = list(iter_pages(pdf_path, mode="fast", tables=True))
+    parallel = list(iter_pages_parallel(pdf_path, workers=2, chunks_per_worker=2, mode="fast", tables=True))
+    assert len(sequential) >= 4
+    assert parallel == sequential
@@ -0,0 +1,102 @@
+from app.models.models import ItemChunkDto
+from app.services.processing.reference_resolver import (
+    ReferenceResolver,
+    resolve_reference_stream,
+    resolve_references,
+)
+
+
+def item(ref_no: str, description: str) -> ItemChunkDto:
+    return ItemChunkDto(ref_no=ref_no, description=description, quantity=1, unit="Stk")
+
+
+def test_sibling_in_the_same_group_wins_over_the_top_level_position():
+    references = ReferenceResolver().resolve([
+        ("10", "Mauerwerk"),
+        ("2.10", "Stahlbetonwand"),
+        ("2.20", "wie Pos. 10, jedoch Dicke 30 cm"),
+    ])
+    assert references == [None, None, 1]
+
+
+def test_short_reference_falls_back_to_the_top_level_position():
+    references = ReferenceResolver().resolve([
+        ("10", "Mauerwerk"),
+        ("2.10", "Stahlbetonwand"),
+        ("3.20", "wie Pos. 10, jedoch Dicke 30 cm"),
+    ])
+    assert references == [None, None, 0]
+
+
+def test_full_reference_across_groups():
+    references = ReferenceResolver().resolve([
+        ("01.02.0010", "Innentür Holz"),
+        ("01.03.0010", "Stahltür"),
+        ("01.03.0020", "wie Pos. 01.02.0010, jedoch 1010 mm breit"),
+    ])
+    assert references == [None, None, 0]
+
+
+def test_chained_references_carry_the_full_description():
+    items = resolve_references([
+        item("1.10", "Innentür Holz, Röhrenspan"),
+        item("1.20", "wie Pos. 10, jedoch 885 mm"),
+        item("1.30", "wie Pos. 20, jedoch Oberfläche CPL"),
+    ])
+    assert [i.references_id for i in items] == [None, "1.10", "1.20"]
+    assert "Röhrenspan" in items[2].description
+    assert "885 mm" in items[2].description
+
+
+def test_supplements_get_no_reference():
+    references = ReferenceResolver().resolve([
+        ("1.10", "Sichtbetonwand"),
+        ("1.20", "Zulage wie Pos. 10 für Sichtbetonklasse SB3"),
+        ("1.30", "Zulage, Ausführung wie vor."),
+    ])
+    assert references == [None, None, None]
+
+
+def test_wie_vor_references_the_previous_position():
+    references = ReferenceResolver().resolve([
+        ("1.10", "Stahlzarge"),
+        ("1.20", "wie vor, jedoch für Wanddicke 24 cm"),
+        ("1.30", "Stahlzarge für Brandschutztür, sonst wie vor."),
+        ("1.40", "Drückergarnitur wie vorbeschrieben, jedoch Edelstahl"),
+    ])
+    assert references == [None, 0, 1, 2]
+
+
+def test_wie_vor_ort_is_no_reference():
+    references = ReferenceResolver().resolve([
+        ("1.10", "Stahlzarge"),
+        ("1.20", "Fensterbank, Maße wie vor Ort aufgenommen"),
+        ("1.30", "wie vor Ort aufmessen und liefern"),
+    ])
+    assert references == [None, None, None]
+
+
+def test_stream_resolves_across_batches_with_lookup():
+    stored = {}
+    lookups = []
+
+    def lookup(ref_no):
+        lookups.append(ref_no)
+        return stored.get(ref_no)
+
+    batches = [
+        [item("1.10", "Innentür Holz, Röhrenspan")],
+        [item("1.20", "wie Pos. 10, jedoch 885 mm")],
+        [item("1.30", "wie Pos. 20, jedoch Oberfläche CPL"), item("1.40", "wie vor, jedoch 1010 mm")],
+    ]
+    resolved = []
+    for batch in resolve_reference_stream(batches, lookup):
+        # The caller persists every batch before the next one is resolved
+        stored.update({i.ref_no: i.model_copy() for i in batch})
+        resolved.extend(batch)
+
+    assert [i.references_id for i in resolved] == [None, "1.10", "1.20", "1.30"]
+    # Earlier batches come from the lookup, the same batch from memory
+    assert lookups == ["1.10", "1.20"]
+    assert "Röhrenspan" in resolved[2].description
+    assert "Oberfläche CPL" in resolved[3].description
@@ -0,0 +1,51 @@
+from app.models.models import ItemDto
+from app.services.processing.revision import plan_revision
+
+
+def item(commission: str, pages: range) -> ItemDto:
+    return ItemDto(
+        sku="620001",
+        name=commission,
+        text=commission,
+        quantity=1,
+        quantityunit="Stk",
+        price=0,
+        priceunit="EUR",
+        commission=commission,
+        confidence=1.0,
+        source_pages=list(pages),
+    )
+
+
+def test_unchanged_revision_reuses_everything():
+    hashes = [f"page{number}" for number in range(6)]
+    plan = plan_revision(hashes, hashes, [item("1.10", range(1, 4)), item("1.20", range(4, 7))], neighbours=1)
+    assert plan.dirty_runs == []
+    assert [reused.commission for reused in plan.reused_items] == ["1.10", "1.20"]
+
+
+def test_chained_items_are_parsed_again_as_a_whole():
+    old_hashes = [f"page{number}" for number in range(14)]
+    new_hashes = list(old_hashes)
+    new_hashes[8] = "page8 revised"
+    old_items = [
+        item("1.10", range(1, 6)),
+        item("1.20", range(5, 10)),
+        item("1.30", range(9, 13)),
+        item("1.40", range(13, 15)),
+    ]
+    plan = plan_revision(old_hashes, new_hashes, old_items, neighbours=0)
+    # Page 9 hits 1.20 and 1.30, 1.20 shares page 5 with 1.10
+    assert plan.dirty_runs == [(0, 12)]
+    assert [reused.commission for reused in plan.reused_items] == ["1.40"]
+
+
+def test_inserted_page_moves_reused_items():
+    old_hashes = ["a", "b", "c", "d"]
+    new_hashes = ["a", "b", "new", "c", "d"]
+    plan = plan_revision(old_hashes, new_hashes, [item("1.10", range(1, 3)), item("1.20", range(4, 5))], neighbours=0)
+    assert plan.dirty_runs == [(2, 3)]
+    assert [(reused.commission, reused.source_pages) for reused in plan.reused_items] == [
+        ("1.10", [1, 2]),
+        ("1.20", [5]),
+    ]
@@ -0,0 +1,43 @@
+import pytest
+
+from app.services.processing.segmenter import ORDINAL_PATTERN, segment_positions
+
+
+@pytest.mark.parametrize(
+    "line, ref_no",
+    [
+        ("1.10 Holztür", "1.10"),
+        ("04.01.2 Innentüren", "04.01.2"),
+        ("01.02.0010 Stahlzarge", "01.02.0010"),
+        ("12.03.2024 Projekt Neubau Schule Seite 2", None),
+        ("1.2.2024", None),
+        ("2024.1 Fortschreibung", None),
+    ],
+)
+def test_ordinal(line, ref_no):
+    match = ORDINAL_PATTERN.match(line)
+    assert (match.group(1) if match else None) == ref_no
+
+
+def test_footer_date_does_not_split_a_position():
+    pages = [
+        "1.10 Holztür einflügelig\nTürblatt Röhrenspan\n12.03.2024 Projekt Neubau Schule Seite 1",
+        "Oberfläche CPL weiß\n3 Stk\n1.20 Stahlzarge\n2 Stk",
+    ]
+    segments = segment_positions(pages)
+    assert [segment.ref_no for segment in segments] == ["1.10", "1.20"]
+    position = segments[0]
+    assert position.has_quantity
+    assert (position.start_page, position.end_page) == (0, 1)
+    assert "Oberfläche CPL weiß" in position.text
+    assert "3 Stk" in position.text
+
+
+def test_position_without_quantity_is_a_heading():
+    pages = ["1.1 Innentüren\nAllgemeine Vorbemerkungen zu den Türen\n1.1.10 Holztür\n4 Stk"]
+    heading, position = segment_positions(pages)
+    assert heading.ref_no == "1.1"
+    assert not heading.has_quantity
+    assert heading.text == "1.1 Innentüren"
+    assert position.ref_no == "1.1.10"
+    assert position.has_quantity
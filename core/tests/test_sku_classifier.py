@@ -0,0 +1,72 @@
+import pytest
+
+from app.models.models import ItemChunkDto
+from app.services.llm.prompts import SKU_OFFER_LIST_MARKER, build_categorization_prompt
+from app.services.processing.sku_classifier import SkuClassifier, load_catalog, render_sku_offer_list
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return SkuClassifier()
+
+
+@pytest.mark.parametrize(
+    "description, sku",
+    [
+        # The door wins over accessories, frames and incidental services
+        ("Holztür 1-flügelig, wartungsfreie Bänder", "620001"),
+        ("Holztür mit Stahlzarge, Abrechnung nach Aufmaß", "620001"),
+        ("Stahltür nach Bemusterung durch AG", "670001"),
+        ("Holztürblatt mit Drückergarnitur und Einsteckschloss", "620001"),
+        # Services on their own
+        ("Wartung der Türanlagen, 2 Termine pro Jahr", "DL8110016"),
+        ("Aufmaß der Türöffnungen vor Ort", "DL5019990"),
+        ("Bemusterung von drei Oberflächen", "DL5019990"),
+        ("Stundenlohnarbeiten Facharbeiter", "DL5010008"),
+        # Accessories on their own
+        ("Türdrücker Edelstahl, Rosettengarnitur", "240001"),
+        ("Türstopper Boden, Edelstahl", "330001"),
+    ],
+)
+def test_match(classifier, description, sku):
+    sku_match = classifier.match(description)
+    assert sku_match is not None
+    assert sku_match.sku == sku
+
+
+@pytest.mark.parametrize(
+    "description",
+    [
+        # Accessory of a door the catalog does not classify
+        "Innentür T30 mit Obentürschließer",
+        "Türblatt mit Drückergarnitur",
+        "Element 2-flügelig mit Türschließer und Bändern",
+        # Nothing in the catalog
+        "Entsorgung des Verpackungsmaterials",
+    ],
+)
+def test_left_to_llm(classifier, description):
+    assert classifier.match(description) is None
+
+
+def test_split(classifier):
+    entries = [
+        ItemChunkDto(ref_no="1.10", description="Holztür mit Stahlzarge", quantity=3, unit="Stk"),
+        ItemChunkDto(ref_no="1.20", description="Innentür T30 mit Obentürschließer", quantity=1, unit="Stk"),
+    ]
+    results, ambiguous = classifier.split(entries)
+    assert results[0].sku == "620001"
+    assert results[0].quantity == 3
+    assert results[1] is None
+    assert ambiguous == [1]
+
+
+def test_prompt_offer_list_covers_catalog():
+    catalog = load_catalog()
+    offer_list = render_sku_offer_list(catalog)
+    prompt = build_categorization_prompt(offer_list)
+
+    assert SKU_OFFER_LIST_MARKER not in prompt
+    assert offer_list in prompt
+    for rule in catalog["rules"]:
+        assert f"`{rule['sku']}`" in offer_list
@@ -0,0 +1,86 @@
+from app.services.processing.table_extraction import TextCell, group_rows, rows_to_text
+
+LINE = 11
+FONT = 9
+
+
+def cell(text: str, x0: float, top: float, lines: int = 1) -> TextCell:
+    """A cell at column x0 whose first line has its top at `top`, PDF coordinates grow upwards"""
+    return TextCell(text=text, x0=x0, x1=x0 + 5 * len(text), y0=top - (lines - 1) * LINE - FONT, y1=top)
+
+
+def table_text(cells) -> str:
+    return rows_to_text(group_rows(cells))
+
+
+def test_multi_line_description_next_to_a_single_line_quantity():
+    cells = [
+        cell("01.0010", 50, 700),
+        cell("Innentür Holz, Türblatt Röhrenspan, Oberfläche CPL", 110, 700, lines=3),
+        # Bottom aligned with the description
+        cell("12 Stk", 400, 678),
+        cell("01.0020", 50, 667),
+        cell("Stahlzarge", 110, 667),
+        cell("4 Stk", 400, 667),
+    ]
+    rows = group_rows(cells)
+    assert [[c.text for c in row] for row in rows] == [
+        ["01.0010", "Innentür Holz, Türblatt Röhrenspan, Oberfläche CPL", "12 Stk"],
+        ["01.0020", "Stahlzarge", "4 Stk"],
+    ]
+    assert table_text(cells) == (
+        "01.0010 | Innentür Holz, Türblatt Röhrenspan, Oberfläche CPL | 12 Stk\n"
+        "01.0020 | Stahlzarge | 4 Stk"
+    )
+
+
+def test_description_lines_as_separate_cells():
+    cells = [
+        cell("01.0010", 50, 700),
+        cell("Mauerwerk Kalksandstein,", 110, 700),
+        cell("237,610 m³", 400, 700),
+        cell("Wanddicke 30 cm", 110, 689),
+        cell("einschließlich Stürze", 110, 678),
+        cell("01.0020", 50, 667),
+        cell("Schalung", 110, 667),
+        cell("20,00 m²", 400, 667),
+    ]
+    assert table_text(cells) == (
+        "01.0010 | Mauerwerk Kalksandstein, Wanddicke 30 cm einschließlich Stürze | 237,610 m³\n"
+        "01.0020 | Schalung | 20,00 m²"
+    )
+
+
+def test_wrapped_quantity_keeps_its_unit():
+    cells = [
+        cell("01.0010", 50, 700),
+        cell("Oberboden abtragen", 110, 700),
+        cell("1.250,500", 400, 700),
+        cell("Dicke bis 30 cm", 110, 689),
+        cell("m²", 400, 689),
+    ]
+    assert table_text(cells) == "01.0010 | Oberboden abtragen Dicke bis 30 cm | 1.250,500 m²"
+
+
+def test_placeholder_only_rows_are_dropped():
+    cells = [
+        cell("........", 470, 720),
+        cell("01.0010", 50, 700),
+        cell("Drückergarnitur", 110, 700),
+        cell("6 Paar", 400, 700),
+        cell("........", 470, 689),
+        cell("........", 530, 689),
+        cell("Seite 3 von 30", 50, 600),
+    ]
+    assert table_text(cells) == "01.0010 | Drückergarnitur | 6 Paar\nSeite 3 von 30"
+
+
+def test_text_before_the_first_position_stays_plain():
+    cells = [
+        cell("Vorbemerkungen", 50, 760),
+        cell("Die Leistung umfasst", 50, 749),
+        cell("01.0010", 50, 700),
+        cell("Sturz", 110, 700),
+        cell("3 St", 400, 700),
+    ]
+    assert table_text(cells) == "Vorbemerkungen\nDie Leistung umfasst\n01.0010 | Sturz | 3 St"
@@ -0,0 +1,17 @@
+from app.services.processing.windowing import PageCountWindowBuilder, build_windows
+
+PAGES = [
+    "Vorbemerkungen",
+    "1.10 Holztür\nTürblatt Röhrenspan",
+    "Oberfläche CPL\n3 Stk\n1.20 Stahlzarge\n2 Stk",
+    "1.30 Drückergarnitur\n4 Stk",
+]
+
+
+def test_windows_record_the_pages_of_their_positions():
+    window = build_windows(PageCountWindowBuilder(window_size=4), PAGES)[0]
+    assert window.position_pages == {"1.10": (1, 2), "1.20": (2, 2), "1.30": (3, 3)}
+    assert list(window.item_pages("1.10")) == [2, 3]
+    assert list(window.item_pages("1.30")) == [4]
+    # Items the segmenter did not see are on the whole window
+    assert list(window.item_pages("9.99")) == [1, 2, 3, 4]